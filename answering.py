@@ -0,0 +1,121 @@
+"""Answering a question: cache lookup, streamed generation, parsing, caching.
+
+Shared by the API (``app.py``) and the CLI (``qa_agent.py``), so both use
+the same cache keys, the same persistent QA cache and the same retrieval,
+prompt and model for each source mode (all built by ``pipeline.py``).
+"""
+
+import asyncio
+from typing import AsyncIterator
+
+import pipeline
+from qa_cache import cache_key
+from telemetry import StageTimer
+
+SOURCES_MARKER = "=== Sources ==="
+
+
+def parse_answer(raw: str) -> dict:
+    """Split raw model output into the answer text and its source bullets"""
+    raw = raw.strip()
+    if SOURCES_MARKER in raw:
+        answer_text, sources_block = raw.split(SOURCES_MARKER, 1)
+    else:
+        answer_text, sources_block = raw, ""
+
+    sources = [
+        line[2:].strip()
+        for line in sources_block.splitlines()
+        if line.strip().startswith("- ")
+    ]
+    return {"answer": answer_text.strip(), "sources": sources}
+
+
+async def semantic_lookup(mode: str, question: str, timeout: float):
+    """Find an answer cached for a similar question.
+
+    Returns the answer (or None), the question embedding (to index the
+    answer once it has been generated) and ``"semantic"`` or ``"miss"``.
+    Questions citing a verse or paragraph skip it: retrieval answers them
+    without an embedding, and "John 3:16" and "John 3:17" embed alike.
+    """
+    semantic_cache = pipeline.get_semantic_cache()
+    if semantic_cache is None:
+        return None, None, "miss"
+    keyword_index = pipeline.get_keyword_index()
+    if keyword_index is not None and keyword_index.references_in(question):
+        return None, None, "miss"
+    try:
+        vector = await asyncio.wait_for(semantic_cache.aembed(question), timeout)
+        similar = semantic_cache.nearest(mode, vector)
+    except Exception as e:
+        # A broken semantic cache only costs the paraphrase hit
+        print(f"Semantic cache lookup failed: {e}")
+        return None, None, "miss"
+    if similar:
+        # Cache backends block, so they run in a thread
+        cached = await asyncio.to_thread(pipeline.get_answer_cache().get, similar)
+        if cached:
+            return cached, vector, "semantic"
+        await asyncio.to_thread(semantic_cache.discard, mode, similar)
+    return None, vector, "miss"
+
+
+async def lookup(mode: str, question: str, timeout: float = 60):
+    """Find a cached answer by exact key, then by question similarity."""
+    cached = await asyncio.to_thread(
+        pipeline.get_answer_cache().get, cache_key(mode, question)
+    )
+    if cached:
+        return cached, None, "exact"
+    return await semantic_lookup(mode, question, timeout)
+
+
+def save_answer(mode: str, question: str, resp: dict, vector=None) -> None:
+    """Store an answer in the QA cache and index its question embedding.
+
+    Blocks on the cache backend; call it from a thread in async code.
+    """
+    key = cache_key(mode, question)
+    pipeline.get_answer_cache().set(key, resp)
+    if vector is not None:
+        pipeline.get_semantic_cache().add(mode, key, vector)
+
+
+async def stream_answer(
+    mode: str, question: str, timer: StageTimer
+) -> AsyncIterator[tuple[str, dict]]:
+    """Retrieve and generate an answer, yielding ``(event, data)`` pairs.
+
+    ``sources`` carries the retrieved references, ``token`` answer text as
+    it is generated, and the final ``done`` the parsed answer. Stage times
+    and token usage are recorded on ``timer``. Nothing is cached here.
+    """
+    mode_chain = pipeline.get_chains().get(mode)
+    docs = await mode_chain.retriever.ainvoke(question, config={"callbacks": [timer]})
+    yield "sources", {"references": [doc.metadata.get("reference", "") for doc in docs]}
+
+    prompt = mode_chain.prompt.format(
+        context="\n\n".join(doc.page_content for doc in docs),
+        question=question,
+    )
+
+    # Hold back enough text to never emit part of the sources marker;
+    # everything after the marker is delivered in the final event.
+    raw, sent = "", 0
+    async for chunk in pipeline.get_llm().astream(prompt, config={"callbacks": [timer]}):
+        raw += str(chunk.content)
+        cut = raw.find(SOURCES_MARKER)
+        limit = cut if cut != -1 else len(raw) - len(SOURCES_MARKER) + 1
+        if limit > sent:
+            yield "token", {"text": raw[sent:limit]}
+            sent = limit
+
+    cut = raw.find(SOURCES_MARKER)
+    limit = cut if cut != -1 else len(raw)
+    if limit > sent:
+        yield "token", {"text": raw[sent:limit]}
+
+    with timer.time("parse"):
+        resp = parse_answer(raw)
+    yield "done", resp
@@ -1,73 +1,69 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from enum import Enum
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 import os
 import json
-from pathlib import Path
-import hashlib
 import secrets
 import jwt
 from datetime import datetime, timedelta
-import random
+import asyncio
+import math
+import time
+import answering
+import pipeline
+import rate_limit
+from user_store import make_user_store
+from subscribers import SyncWorker, make_mailchimp_client, make_subscriber_store
+import passwords
+from answering import parse_answer
 
 # JWT secret key
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24 * 30  # 30 days
 
-# User storage file
-USERS_FILE = Path("users.json")
-if USERS_FILE.exists():
-    try:
-        with USERS_FILE.open("r") as f:
-            users = json.load(f)
-    except Exception:
-        users = {}
-else:
-    users = {}
+# Upstream (OpenAI) call limits shared by all LLM-backed endpoints
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
-# Cache file setup
-CACHE_FILE = Path("qa_cache.json")
-if CACHE_FILE.exists():
-    try:
-        with CACHE_FILE.open("r") as f:
-            cache = json.load(f)
-    except Exception:
-        cache = {}
-else:
-    cache = {}
+# Per-client limits (0 disables each): all LLM-backed requests, requests that
+# miss the cache and call the LLM, and LLM tokens per UTC day
+request_limiter = rate_limit.make_limiter(
+    "requests", float(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "60"))
+)
+llm_limiter = rate_limit.make_limiter(
+    "llm", float(os.getenv("RATE_LIMIT_LLM_PER_MINUTE", "10"))
+)
+token_budget = rate_limit.make_budget(int(os.getenv("DAILY_TOKEN_BUDGET", "200000")))
+TRUST_PROXY = os.getenv("TRUST_PROXY", "0") == "1"
 
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
-from langchain.chains import RetrievalQA
-from templates import prompt_for_mode
-import metrics
+# User accounts (SQLite, imports a legacy users.json once)
+users = make_user_store()
 
-# 1) Read API key
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise RuntimeError(
-        "OPENAI_API_KEY environment variable not set. Please provide your OpenAI API key."
-    )
+# QA answer cache (SQLite by default, see qa_cache.make_cache)
+cache = pipeline.get_answer_cache()
 
-# 2) Load the Chroma vector store
-vectorstore = Chroma(
-    persist_directory="veritas_ai_chroma_db",
-    embedding_function=OpenAIEmbeddings(openai_api_key=api_key)
+import verse_store
+import metrics
+import telemetry
+from singleflight import SingleFlight
+from verse_calendar import (
+    CALENDAR_FILE,
+    VerseCalendar,
+    generate_entry,
+    refresh_forever,
+    today as verse_today,
 )
 
-# 3) Build retriever
-retriever = vectorstore.as_retriever(search_kwargs={"k": 8})
-
-# 4) Initialize the Chat model
-llm = ChatOpenAI(
-    model_name="gpt-4-turbo",
-    temperature=0.0,
-    openai_api_key=api_key
-)
+# 1-4) The embeddings, vector store, keyword index, chat model and QA chains
+# are built on first use, or ahead of it by the startup warmup (pipeline.py)
+WARMUP = os.getenv("WARMUP", "1") == "1"
 
 # 5) Create FastAPI app and enable CORS
 app = FastAPI(title="Veritas AI QA API")
@@ -107,6 +103,9 @@ class SubscribeRequest(BaseModel):
 class LogEvent(BaseModel):
     event: str
 
+class QABatchRequest(BaseModel):
+    requests: list[QARequest]
+
 class AuthRequest(BaseModel):
     email: str
     password: str
@@ -115,9 +114,25 @@ class AuthResponse(BaseModel):
     token: str
     email: str
 
-def hash_password(password: str) -> str:
-    """Hash password with salt"""
-    return hashlib.sha256(password.encode()).hexdigest()
+def require_admin(credentials: HTTPBasicCredentials = Depends(security)):
+    if not admin_password:
+        raise HTTPException(status_code=500, detail="ADMIN_PASSWORD not set")
+    correct = credentials.username == "admin" and secrets.compare_digest(credentials.password, admin_password)
+    if not correct:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unauthorized",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+
+async def ensure_pipeline():
+    """Build the QA pipeline off the event loop if warmup has not done it yet"""
+    if pipeline.ready():
+        return
+    try:
+        await run_in_threadpool(pipeline.warmup)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Service not ready: {e}")
 
 def create_jwt_token(email: str) -> str:
     """Create JWT token for user"""
@@ -128,46 +143,113 @@ def create_jwt_token(email: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def save_users():
-    """Save users to file"""
+async def wait_for_disconnect(request: Request, interval: float = 0.25):
+    """Return once the client behind ``request`` has gone away"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+async def limited(coro):
+    """Await ``coro`` in an ``llm_semaphore`` slot, bounded by the timeout"""
+    async with llm_semaphore:
+        return await asyncio.wait_for(coro, LLM_TIMEOUT_SECONDS)
+
+async def until_disconnect(request: Request, coro, endpoint: str = "qa"):
+    """Await ``coro`` unless the client disconnects first (then raise 499)"""
+    task = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher}, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+    if task not in done:
+        telemetry.UPSTREAM_ERRORS.inc(endpoint=endpoint, kind="disconnect")
+        raise HTTPException(status_code=499, detail="Client disconnected")
     try:
-        with USERS_FILE.open("w") as f:
-            json.dump(users, f)
+        return task.result()
+    except asyncio.TimeoutError:
+        telemetry.UPSTREAM_ERRORS.inc(endpoint=endpoint, kind="timeout")
+        raise HTTPException(status_code=504, detail="Upstream request timed out")
     except Exception:
-        pass
+        telemetry.UPSTREAM_ERRORS.inc(endpoint=endpoint, kind="error")
+        raise
+
+def client_key(request: Request) -> str:
+    """Rate-limit key: the signed-in user's email, else the client IP"""
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(auth[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM])
+            return f"user:{payload['email']}"
+        except (jwt.PyJWTError, KeyError):
+            pass
+    forwarded = request.headers.get("x-forwarded-for") if TRUST_PROXY else None
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def rate_limited(endpoint: str, budget: str, retry_after: float) -> HTTPException:
+    telemetry.RATE_LIMITED.inc(endpoint=endpoint, budget=budget)
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Rate limit exceeded ({budget})",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+async def enforce_limit(limiter: rate_limit.Limiter, key: str, endpoint: str):
+    """Take one request from ``key``'s bucket or raise 429"""
+    if not limiter.enabled:
+        return
+    wait = await run_in_threadpool(limiter.take, key)
+    if wait:
+        raise rate_limited(endpoint, limiter.name, wait)
+
+async def enforce_llm_limits(key: str, endpoint: str):
+    """Limits for a request about to call the LLM (a cache miss)"""
+    await enforce_limit(llm_limiter, key, endpoint)
+    if token_budget.enabled:
+        wait = await run_in_threadpool(token_budget.check, key)
+        if wait:
+            raise rate_limited(endpoint, "daily_tokens", wait)
 
 # Authentication endpoints
+# Passwords are hashed with scrypt on a dedicated, bounded pool (passwords.py)
 @app.post("/auth/signup", response_model=AuthResponse)
-def signup(request: AuthRequest):
+async def signup(request: AuthRequest):
     email = request.email.lower().strip()
     
-    # Check if user already exists
-    if email in users:
+    # Create new user; the unique email index rejects duplicates atomically
+    password_hash = await passwords.ahash(request.password)
+    if not await run_in_threadpool(users.create, email, password_hash):
         raise HTTPException(status_code=400, detail="User already exists")
     
-    # Create new user
-    users[email] = {
-        "password_hash": hash_password(request.password),
-        "created_at": datetime.utcnow().isoformat()
-    }
-    save_users()
-    
     # Create token
     token = create_jwt_token(email)
     return AuthResponse(token=token, email=email)
 
 @app.post("/auth/signin", response_model=AuthResponse)
-def signin(request: AuthRequest):
+async def signin(request: AuthRequest):
     email = request.email.lower().strip()
     
-    # Check if user exists
-    if email not in users:
+    # Check if user exists (unknown emails still pay for one hash)
+    user = await run_in_threadpool(users.get, email)
+    if user is None:
+        await passwords.averify_unknown(request.password)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Verify password
-    if users[email]["password_hash"] != hash_password(request.password):
+    matches, rehash = await passwords.averify(request.password, user["password_hash"])
+    if not matches:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Upgrade legacy SHA-256 hashes and hashes made with an older cost
+    if rehash:
+        password_hash = await passwords.ahash(request.password)
+        await run_in_threadpool(users.set_password_hash, email, password_hash)
+    
     # Create token
     token = create_jwt_token(email)
     return AuthResponse(token=token, email=email)
@@ -179,98 +261,80 @@ class VerseOfTheDayResponse(BaseModel):
     explanation: str
     catechism_references: list[str]
 
-# Load meaningful verses for daily selection
-MEANINGFUL_VERSES = [
-    {"book": "Matthew", "chapter": "5", "verse": "8", "theme": "purity"},
-    {"book": "John", "chapter": "3", "verse": "16", "theme": "love"},
-    {"book": "Psalms", "chapter": "23", "verse": "1", "theme": "trust"},
-    {"book": "Romans", "chapter": "8", "verse": "28", "theme": "providence"},
-    {"book": "1 Corinthians", "chapter": "13", "verse": "13", "theme": "love"},
-    {"book": "Philippians", "chapter": "4", "verse": "13", "theme": "strength"},
-    {"book": "Isaiah", "chapter": "40", "verse": "31", "theme": "hope"},
-    {"book": "Proverbs", "chapter": "3", "verse": "5", "theme": "trust"},
-    {"book": "Matthew", "chapter": "6", "verse": "33", "theme": "priorities"},
-    {"book": "James", "chapter": "1", "verse": "5", "theme": "wisdom"},
-    {"book": "Ephesians", "chapter": "2", "verse": "8", "theme": "grace"},
-    {"book": "Hebrews", "chapter": "11", "verse": "1", "theme": "faith"},
-    {"book": "Jeremiah", "chapter": "29", "verse": "11", "theme": "hope"},
-    {"book": "Matthew", "chapter": "11", "verse": "28", "theme": "rest"},
-    {"book": "John", "chapter": "14", "verse": "6", "theme": "truth"},
-]
-
-# Cache for verse of the day
+# Verse of the day: served from the precomputed calendar (verse_calendar.py);
+# a day missing from it is generated on demand and stored
+verse_calendar = VerseCalendar(os.getenv("VERSE_CALENDAR_PATH", str(CALENDAR_FILE)))
+VERSE_CALENDAR_DAYS = int(os.getenv("VERSE_CALENDAR_DAYS", "7"))
+VERSE_REFRESH_SECONDS = float(os.getenv("VERSE_REFRESH_SECONDS", "3600"))
+
+# Per-process memo of the calendar (only today's entry is kept)
 verse_of_day_cache = {}
 
+# Concurrent misses for the same key share one upstream computation
+inflight = SingleFlight()
+
+@app.on_event("startup")
+async def start_warmup():
+    # Serve /healthz at once; /readyz reports ready when warmup is done
+    if WARMUP:
+        app.state.warmup = asyncio.create_task(warm_up())
+    if VERSE_REFRESH_SECONDS > 0:
+        app.state.verse_refresh = asyncio.create_task(refresh_verses())
+
+async def warm_up():
+    try:
+        seconds = await run_in_threadpool(pipeline.warmup)
+    except Exception as e:
+        print(f"Warmup failed: {e}")
+        return
+    # Prime the in-process memo with today's verse
+    today = verse_today()
+    entry = await run_in_threadpool(verse_calendar.get, today)
+    if entry:
+        verse_of_day_cache.clear()
+        verse_of_day_cache[today] = entry
+    print(f"Warmup finished in {seconds:.1f}s")
+
+async def refresh_verses():
+    # Keep the upcoming days generated so the rollover never waits on OpenAI.
+    # Never build the pipeline here: start once warmup (or, with WARMUP=0,
+    # the first request that needs it) has built it.
+    while not pipeline.ready():
+        await asyncio.sleep(5)
+    await refresh_forever(
+        verse_calendar,
+        pipeline.get_chains().retriever("catechism", k=3),
+        pipeline.get_llm(),
+        days=VERSE_CALENDAR_DAYS,
+        interval=VERSE_REFRESH_SECONDS,
+        limit=limited,
+    )
+
 @app.get("/verse-of-the-day", response_model=VerseOfTheDayResponse)
-def get_verse_of_the_day():
+async def get_verse_of_the_day(raw_request: Request):
+    await enforce_limit(request_limiter, client_key(raw_request), "verse_of_the_day")
+
     # Use current date as key for consistent daily verse
-    today = datetime.utcnow().date().isoformat()
+    today = verse_today()
     
-    # Check cache first
+    # Check the in-process memo, then the calendar
     if today in verse_of_day_cache:
         return VerseOfTheDayResponse(**verse_of_day_cache[today])
+    entry = await run_in_threadpool(verse_calendar.get, today)
+    if entry:
+        verse_of_day_cache.clear()
+        verse_of_day_cache[today] = entry
+        return VerseOfTheDayResponse(**entry)
     
-    # Select verse based on day of year for consistency
-    day_of_year = datetime.utcnow().timetuple().tm_yday
-    verse_index = day_of_year % len(MEANINGFUL_VERSES)
-    selected_verse = MEANINGFUL_VERSES[verse_index]
-    
-    # Load Bible data to get the verse text
     try:
-        with open("EntireBible-DR.json", "r", encoding="utf-8") as f:
-            bible_data = json.load(f)
-        
-        verse_text = bible_data.get(selected_verse["book"], {}).get(
-            selected_verse["chapter"], {}
-        ).get(selected_verse["verse"], "Verse not found")
-        
-        verse_reference = f"{selected_verse['book']} {selected_verse['chapter']}:{selected_verse['verse']}"
-        
-        # Generate explanation using the LLM with Catechism context
-        prompt = f"""Given this Bible verse: "{verse_text}" ({verse_reference})
-
-Please provide a brief Catholic explanation (2-3 sentences) that:
-1. Explains the spiritual meaning of this verse
-2. Connects it to Catholic teaching from the Catechism
-3. Offers a practical application for daily life
-
-Keep the explanation concise and accessible."""
-
-        # Search for relevant Catechism passages
-        theme_filter = {"source": "CCC"}
-        catechism_retriever = vectorstore.as_retriever(
-            search_kwargs={"k": 3, "filter": theme_filter}
+        await ensure_pipeline()
+        result, shared = await until_disconnect(
+            raw_request,
+            inflight.do(f"verse|{today}", lambda: make_verse_of_the_day(today)),
+            endpoint="verse_of_the_day",
         )
-        
-        # Get relevant CCC passages based on the verse theme
-        search_query = f"{selected_verse['theme']} {verse_text[:50]}"
-        relevant_docs = catechism_retriever.get_relevant_documents(search_query)
-        
-        # Extract CCC references
-        catechism_refs = []
-        for doc in relevant_docs:
-            ref = doc.metadata.get("reference", "")
-            if ref and ref not in catechism_refs:
-                catechism_refs.append(ref)
-        
-        # Generate explanation
-        try:
-            response = llm.invoke(prompt)
-            explanation = str(response.content).strip() if hasattr(response, 'content') else str(response).strip()
-        except Exception as e:
-            explanation = "This verse reminds us of God's infinite love and mercy. The Catechism teaches us that Scripture is the living Word of God, speaking to us today. Let us meditate on this verse and apply its wisdom to our daily lives."
-        
-        # Prepare response
-        result = {
-            "verse_text": verse_text,
-            "verse_reference": verse_reference,
-            "explanation": explanation,
-            "catechism_references": catechism_refs[:2]  # Limit to 2 references
-        }
-        
-        # Cache the result
-        verse_of_day_cache[today] = result
-        
+        if shared:
+            telemetry.COALESCED.inc(endpoint="verse_of_the_day")
         return VerseOfTheDayResponse(**result)
         
     except Exception as e:
@@ -282,137 +346,402 @@ Keep the explanation concise and accessible."""
             catechism_references=["CCC 457", "CCC 458"]
         )
 
+async def make_verse_of_the_day(today) -> dict:
+    """Generate and cache a day missing from the calendar (shared by concurrent requests)"""
+    result, complete = await generate_entry(
+        today,
+        pipeline.get_chains().retriever("catechism", k=3),
+        pipeline.get_llm(),
+        limit=limited,
+    )
+    if complete:
+        await run_in_threadpool(verse_calendar.put, today, result)
+    
+    # Cache the result, dropping previous days
+    verse_of_day_cache.clear()
+    verse_of_day_cache[today] = result
+    return result
+
+class Verse(BaseModel):
+    reference: str
+    text: str
+
+class VerseLookupResponse(BaseModel):
+    reference: str
+    verses: list[Verse]
+
+@app.get("/verse/{ref}", response_model=VerseLookupResponse)
+def get_verse(ref: str):
+    """Look up a verse, range or chapter, e.g. ``John 3:16-18``"""
+    if verse_store.parse_reference(ref) is None:
+        raise HTTPException(status_code=400, detail="Invalid verse reference")
+    verses = verse_store.get_store().lookup(ref)
+    if not verses:
+        raise HTTPException(status_code=404, detail="Verse not found")
+    return VerseLookupResponse(
+        reference=ref.strip(),
+        verses=[Verse(reference=r, text=t) for r, t in verses],
+    )
+
 # 7) /qa endpoint
-@app.post("/qa", response_model=QAResponse)
-def qa(request: QARequest):
-    key = f"{request.mode.value}|{request.question.strip()}"
-    cached = cache.get(key)
+# Cache keys, lookups, generation and parsing are shared with the CLI (answering.py)
+def cache_key(request: QARequest) -> str:
+    return answering.cache_key(request.mode.value, request.question)
+
+async def lookup_answer(request: QARequest):
+    """Find a cached answer by exact key, then by question similarity.
+
+    Returns the answer (or None) and the question embedding, which is used
+    to index the answer for similar questions once it has been generated.
+    """
+    mode = request.mode.value
+    with telemetry.STAGE_SECONDS.time(stage="cache_lookup", mode=mode):
+        cached, vector, result = await _lookup_answer(request)
+    telemetry.CACHE_LOOKUPS.inc(mode=mode, result=result)
+    return cached, vector
+
+async def _lookup_answer(request: QARequest):
+    # Cache backends block (SQLite, or a socket round trip to cache_server.py)
+    cached = await run_in_threadpool(cache.get, cache_key(request))
     if cached:
-        return QAResponse(**cached)
-    # Build retriever with optional source filter
-    filter_opt = None
-    if request.mode == SourceMode.bible:
-        filter_opt = {"source": "Bible"}
-    elif request.mode == SourceMode.catechism:
-        filter_opt = {"source": "CCC"}
-
-    local_retriever = vectorstore.as_retriever(
-        search_kwargs={"k": 8, **({"filter": filter_opt} if filter_opt else {})}
+        return cached, None, "exact"
+    await ensure_pipeline()
+    return await answering.semantic_lookup(
+        request.mode.value, request.question, LLM_TIMEOUT_SECONDS
     )
 
-    chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=local_retriever,
-        chain_type_kwargs={"prompt": prompt_for_mode(request.mode.value)},
+def save_answer(request: QARequest, resp: dict, vector=None):
+    """Store an answer in the QA cache and index its question embedding"""
+    with telemetry.STAGE_SECONDS.time(stage="cache_write", mode=request.mode.value):
+        try:
+            answering.save_answer(request.mode.value, request.question, resp, vector)
+        except Exception as e:
+            print(f"QA cache write failed: {e}")
+
+@app.post("/qa", response_model=QAResponse)
+async def qa(request: QARequest, raw_request: Request):
+    mode = request.mode.value
+    with telemetry.REQUEST_SECONDS.time(endpoint="qa", mode=mode):
+        client = client_key(raw_request)
+        await enforce_limit(request_limiter, client, "qa")
+        cached, vector = await lookup_answer(request)
+        if cached:
+            return QAResponse(**cached)
+
+        # Identical questions already being answered wait for that answer,
+        # which costs the waiting client no LLM budget
+        flight = f"qa|{cache_key(request)}"
+        if flight not in inflight:
+            await enforce_llm_limits(client, "qa")
+        try:
+            resp, shared = await until_disconnect(
+                raw_request,
+                inflight.do(flight, lambda: generate_answer(request, vector, client)),
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if shared:
+            telemetry.COALESCED.inc(endpoint="qa")
+        return QAResponse(**resp)
+
+async def generate_answer(request: QARequest, vector, client: str) -> dict:
+    """Run the QA chain and cache its answer (shared by concurrent requests).
+
+    The tokens used are charged to ``client``, the request that started it.
+    """
+    mode = request.mode.value
+    chain = pipeline.get_chains().get(mode).chain
+    # Times retrieval, prompt stuffing and the LLM call inside the chain
+    timer = telemetry.StageTimer(mode)
+    res = await limited(
+        chain.ainvoke({"query": request.question}, config={"callbacks": [timer]})
     )
+    await run_in_threadpool(token_budget.add, client, timer.tokens)
+    with telemetry.STAGE_SECONDS.time(stage="parse", mode=mode):
+        resp = parse_answer(res["result"])
+    await run_in_threadpool(save_answer, request, resp, vector)
+    return resp
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/qa/stream")
+async def qa_stream(request: QARequest, raw_request: Request):
+    """Stream an answer as Server-Sent Events.
+
+    Emits a ``sources`` event with the retrieved passages, ``token`` events
+    with answer text as it is generated, and a final ``done`` event carrying
+    the same ``answer``/``sources`` payload as ``/qa``.
+
+    The stream holds an ``llm_semaphore`` slot while generating. Concurrent
+    streams of the same question share one generation and each receive all
+    of its events. Starlette cancels the generator when the client
+    disconnects; the generation stops once no client is left.
+
+    Rate limits and the cache are checked before the stream starts, so an
+    exhausted budget is a plain 429 response.
+    """
+    mode = request.mode.value
+    started = time.perf_counter()
+    client = client_key(raw_request)
+    try:
+        await enforce_limit(request_limiter, client, "qa_stream")
+        cached, vector = await lookup_answer(request)
+        flight = f"stream|{cache_key(request)}"
+        if not cached and flight not in inflight:
+            await enforce_llm_limits(client, "qa_stream")
+    except BaseException:
+        telemetry.REQUEST_SECONDS.observe(
+            time.perf_counter() - started, endpoint="qa_stream", mode=mode
+        )
+        raise
+
+    async def events():
+        try:
+            if cached:
+                yield sse_event("done", cached)
+                return
+
+            first = True
+            async for event, shared in inflight.stream(flight, lambda: produce(vector)):
+                if first and shared:
+                    telemetry.COALESCED.inc(endpoint="qa_stream")
+                first = False
+                yield event
+        except asyncio.CancelledError:
+            telemetry.UPSTREAM_ERRORS.inc(endpoint="qa_stream", kind="disconnect")
+            raise
+        finally:
+            telemetry.REQUEST_SECONDS.observe(
+                time.perf_counter() - started, endpoint="qa_stream", mode=mode
+            )
+
+    async def produce(vector):
+        try:
+            async with llm_semaphore, asyncio.timeout(LLM_TIMEOUT_SECONDS):
+                async for event in generate(request, vector):
+                    yield event
+        except TimeoutError:
+            telemetry.UPSTREAM_ERRORS.inc(endpoint="qa_stream", kind="timeout")
+            yield sse_event("error", {"detail": "Upstream request timed out"})
+        except Exception as e:
+            telemetry.UPSTREAM_ERRORS.inc(endpoint="qa_stream", kind="error")
+            yield sse_event("error", {"detail": str(e)})
+
+    async def generate(request: QARequest, vector):
+        timer = telemetry.StageTimer(mode)
+        async for event, data in answering.stream_answer(mode, request.question, timer):
+            if event == "done":
+                await run_in_threadpool(token_budget.add, client, timer.tokens)
+                await run_in_threadpool(save_answer, request, data, vector)
+            yield sse_event(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Bulk answering (e.g. to precompute FAQ answers), admin only
+QA_BATCH_MAX_QUESTIONS = int(os.getenv("QA_BATCH_MAX_QUESTIONS", "5000"))
+QA_BATCH_CONCURRENCY = int(os.getenv("QA_BATCH_CONCURRENCY", "4"))
+
+def batch_line(index: int, request: QARequest, **fields) -> str:
+    """One NDJSON result line of /qa/batch"""
+    return json.dumps({
+        "index": index,
+        "question": request.question,
+        "mode": request.mode.value,
+        **fields,
+    }) + "\n"
+
+@app.post("/qa/batch", dependencies=[Depends(require_admin)])
+async def qa_batch(batch: QABatchRequest):
+    """Answer many questions, streaming one NDJSON line per question.
+
+    Lines arrive as answers complete, cache hits first, each carrying the
+    question's ``index`` in the request and either ``answer``/``sources``
+    and ``cached`` or an ``error``. The questions that miss the exact cache
+    are embedded together in one call, which also primes the embeddings
+    used by retrieval. At most ``QA_BATCH_CONCURRENCY`` answers are generated
+    at once, within the shared ``llm_semaphore``.
+    """
+    if len(batch.requests) > QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {QA_BATCH_MAX_QUESTIONS} questions per batch",
+        )
+    requests = batch.requests
+
+    async def results():
+        hits = await run_in_threadpool(lambda: [cache.get(cache_key(r)) for r in requests])
+        misses = []
+        for i, (request, cached) in enumerate(zip(requests, hits)):
+            if cached:
+                telemetry.CACHE_LOOKUPS.inc(mode=request.mode.value, result="exact")
+                yield batch_line(i, request, cached=True, **cached)
+            else:
+                misses.append(i)
+        if not misses:
+            return
 
+        try:
+            await ensure_pipeline()
+        except HTTPException as e:
+            for i in misses:
+                yield batch_line(i, requests[i], error=e.detail)
+            return
+
+        vectors = await embed_batch([requests[i].question for i in misses])
+        semantic_cache = pipeline.get_semantic_cache()
+        todo = []
+        for i, vector in zip(misses, vectors):
+            request = requests[i]
+            mode = request.mode.value
+            similar = semantic_cache.nearest(mode, vector) if vector is not None else None
+            cached = await run_in_threadpool(cache.get, similar) if similar else None
+            telemetry.CACHE_LOOKUPS.inc(mode=mode, result="semantic" if cached else "miss")
+            if cached:
+                yield batch_line(i, request, cached=True, **cached)
+            else:
+                todo.append((i, vector))
+
+        gate = asyncio.Semaphore(QA_BATCH_CONCURRENCY)
+
+        async def answer(i, vector):
+            request = requests[i]
+            async with gate:
+                try:
+                    resp, _ = await inflight.do(
+                        f"qa|{cache_key(request)}",
+                        lambda: generate_answer(request, vector, "batch"),
+                    )
+                except asyncio.TimeoutError:
+                    telemetry.UPSTREAM_ERRORS.inc(endpoint="qa_batch", kind="timeout")
+                    return batch_line(i, request, error="Upstream request timed out")
+                except Exception as e:
+                    telemetry.UPSTREAM_ERRORS.inc(endpoint="qa_batch", kind="error")
+                    return batch_line(i, request, error=str(e))
+            return batch_line(i, request, cached=False, **resp)
+
+        tasks = [asyncio.ensure_future(answer(i, vector)) for i, vector in todo]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client went away: stop generating the rest
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+async def embed_batch(questions: list[str]) -> list:
+    """Semantic-cache vectors for ``questions`` from one embedding call.
+
+    Returns None for every question when the semantic cache is disabled
+    (the query embeddings are still memoized for retrieval) or on failure.
+    """
+    semantic_cache = pipeline.get_semantic_cache()
     try:
-        res = chain.invoke({"query": request.question})
+        if semantic_cache is not None:
+            return await asyncio.wait_for(
+                semantic_cache.aembed_many(questions), LLM_TIMEOUT_SECONDS
+            )
+        await asyncio.wait_for(
+            pipeline.get_embeddings().aembed_queries(questions), LLM_TIMEOUT_SECONDS
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    raw = res["result"].strip()
-
-    if "=== Sources ===" in raw:
-        answer_text, sources_block = raw.split("=== Sources ===", 1)
-    else:
-        answer_text, sources_block = raw, ""
-
-    sources = [
-        line[2:].strip()
-        for line in sources_block.splitlines()
-        if line.strip().startswith("- ")
-    ]
-
-    answer = answer_text.strip()
-    resp = {"answer": answer, "sources": sources}
-    cache[key] = resp
-    try:
-        with CACHE_FILE.open("w") as f:
-            json.dump(cache, f)
-    except Exception:
-        pass
-    return QAResponse(**resp)
+        print(f"Batch embedding failed: {e}")
+    return [None] * len(questions)
 
 # 8) /subscribe endpoint to capture emails
-@app.post("/subscribe")
-def subscribe(req: SubscribeRequest):
-    import csv
-    import hashlib
-    import requests
+# Emails are stored locally and pushed to Mailchimp in the background
+# (subscribers.py), so the request never waits on Mailchimp
+subscribers = make_subscriber_store()
+mailchimp = make_mailchimp_client()
+subscriber_sync = None
+if mailchimp is not None:
+    subscriber_sync = SyncWorker(
+        subscribers,
+        mailchimp,
+        batch_size=int(os.getenv("MAILCHIMP_BATCH_SIZE", "100")),
+        interval=float(os.getenv("MAILCHIMP_SYNC_SECONDS", "60")),
+        retry_delay=float(os.getenv("MAILCHIMP_RETRY_SECONDS", "30")),
+    )
 
-    email = req.email.strip().lower()
-    csv_fname = "subscribers.csv"
-
-    def ensure_csv():
-        if not os.path.isfile(csv_fname):
-            with open(csv_fname, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(["email"])
-
-    def email_in_csv() -> bool:
-        if not os.path.isfile(csv_fname):
-            return False
-        with open(csv_fname, "r", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get("email", "").strip().lower() == email:
-                    return True
-        return False
-
-    mc_key = os.getenv("MAILCHIMP_API_KEY")
-    mc_server = os.getenv("MAILCHIMP_SERVER_PREFIX")
-    mc_list = os.getenv("MAILCHIMP_LIST_ID")
-
-    if mc_key and mc_server and mc_list:
-        auth = ("anystring", mc_key)
-        member_hash = hashlib.md5(email.encode()).hexdigest()
-        base_url = f"https://{mc_server}.api.mailchimp.com/3.0"
-        member_url = f"{base_url}/lists/{mc_list}/members/{member_hash}"
-        try:
-            r = requests.get(member_url, auth=auth, timeout=10)
-            if r.status_code == 200:
-                return {"status": "already_subscribed"}
-            if r.status_code != 404:
-                raise Exception(f"GET {r.status_code}: {r.text}")
-
-            data = {"email_address": email, "status": "subscribed"}
-            r = requests.put(member_url, auth=auth, json=data, timeout=10)
-            if 200 <= r.status_code < 300:
-                return {"status": "ok"}
-            raise Exception(f"PUT {r.status_code}: {r.text}")
-        except Exception as e:
-            print(f"Mailchimp error: {e}")
+@app.on_event("startup")
+async def start_subscriber_sync():
+    if subscriber_sync is not None:
+        app.state.subscriber_sync = asyncio.create_task(subscriber_sync.run_forever())
 
-    ensure_csv()
-    if email_in_csv():
+@app.post("/subscribe")
+async def subscribe(req: SubscribeRequest):
+    email = req.email.strip().lower()
+    if not await run_in_threadpool(subscribers.add, email):
         return {"status": "already_subscribed"}
-    with open(csv_fname, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([email])
+    if subscriber_sync is not None:
+        subscriber_sync.wake()
     return {"status": "ok"}
 
-# 9) /metrics endpoint with basic auth
-@app.get("/metrics")
-def get_metrics(credentials: HTTPBasicCredentials = Depends(security)):
-    if not admin_password:
-        raise HTTPException(status_code=500, detail="ADMIN_PASSWORD not set")
-    import secrets
-    correct = credentials.username == "admin" and secrets.compare_digest(credentials.password, admin_password)
-    if not correct:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Unauthorized",
-            headers={"WWW-Authenticate": "Basic"},
+# 9) /metrics endpoints with basic auth
+@app.get("/metrics", dependencies=[Depends(require_admin)])
+def get_metrics(start: datetime | None = None, end: datetime | None = None):
+    counts = metrics.get_counts(start=start, end=end)
+    counts.update({f"qa_cache_{k}": v for k, v in cache.stats().items()})
+    if pipeline.ready():
+        semantic_cache = pipeline.get_semantic_cache()
+        if semantic_cache is not None:
+            counts.update(
+                {f"semantic_cache_{k}": v for k, v in semantic_cache.stats().items()}
+            )
+        counts.update(
+            {f"embedding_cache_{k}": v for k, v in pipeline.get_embeddings().stats().items()}
         )
-    return metrics.get_counts()
+    counts.update({f"inflight_{k}": v for k, v in inflight.stats().items()})
+    counts.update(
+        {f"password_cache_{k}": v for k, v in passwords.verify_cache.stats().items()}
+    )
+    for limiter in (request_limiter, llm_limiter):
+        counts.update(
+            {f"rate_limit_{limiter.name}_{k}": v for k, v in limiter.stats().items()}
+        )
+    counts.update({f"token_budget_{k}": v for k, v in token_budget.stats().items()})
+    counts.update({f"subscribers_{k}": v for k, v in subscribers.stats().items()})
+    if subscriber_sync is not None:
+        counts.update(
+            {f"mailchimp_{k}": v for k, v in subscriber_sync.stats().items()}
+        )
+    return counts
+
+@app.get("/metrics/prometheus", dependencies=[Depends(require_admin)])
+def get_prometheus_metrics():
+    """QA pipeline latency, cache, token and error metrics for Prometheus"""
+    return PlainTextResponse(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
 
 # 10) /log_event endpoint to record frontend events
 @app.post("/log_event")
 def log_event(evt: LogEvent):
     metrics.log_event(evt.event)
     return {"status": "ok"}
-# 11) (optional) serve your UI if it exists
+# 11) Liveness and readiness probes
+@app.get("/healthz")
+def healthz():
+    """The process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """The QA pipeline is built, so requests will not wait for it"""
+    if pipeline.ready():
+        return {"status": "ready"}
+    error = pipeline.error()
+    body = {"status": "error", "detail": error} if error else {"status": "starting"}
+    return JSONResponse(status_code=503, content=body)
+
+# 12) (optional) serve your UI if it exists
 ui_path = "graceguide-ui/dist"
 if os.path.isdir(ui_path):
     app.mount("/static", StaticFiles(directory=ui_path, html=False), name="static")
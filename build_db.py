@@ -1,76 +1,325 @@
 # build_db.py
+"""Build or update the Chroma store in ./veritas_ai_chroma_db.
 
+Every chunk gets an id hashed from (source, reference, chunk_index, text).
+Re-running the script only embeds chunks whose id is not in the store yet
+and deletes chunks that no longer exist, so a text fix re-embeds just the
+affected passages. Batches are written to Chroma as soon as they are
+embedded, which makes the store itself the checkpoint: an interrupted run
+picks up where it stopped.
+
+Chunk ids do not depend on the embedding model, so the model is recorded in
+the collection metadata instead. A run with another model stops with an
+error; ``--rebuild`` deletes the store and embeds everything again.
+
+    python build_db.py                      # embed with OpenAI
+    python build_db.py --embeddings local   # local CPU sentence-transformers model
+    python build_db.py --fake-embeddings    # offline, for tests/benchmarks
+    python build_db.py --numpy-index int8   # also export the NumPy index
+    python build_db.py --rebuild --embeddings local   # switch embedding models
+
+``--numpy-index`` exports the finished store to ``numpy_index/`` inside it,
+the memory-mapped index served with ``VECTOR_BACKEND=numpy``.
+"""
+
+import argparse
+import hashlib
 import os
 import json
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma 
-
-# 1) Load the JSON files (they live in the same folder as this script)
-with open("EntireBible-DR.json", "r", encoding="utf-8") as f:
-    bible_data = json.load(f)
-
-with open("ccc.json", "r", encoding="utf-8") as f:
-    raw_ccc = json.load(f)
-
-# 2) Normalize the Catechism data
-if isinstance(raw_ccc, list):
-    catechism_items = raw_ccc
-elif isinstance(raw_ccc, dict):
-    catechism_items = [{"id": k, "text": v} for k, v in raw_ccc.items()]
-else:
-    raise RuntimeError("Unknown structure in ccc.json")
-
-# 3) Flatten Bible into chunks
-bible_chunks = []
-for book, chapters in bible_data.items():
-    for chap, verses in chapters.items():
-        for verse, text in verses.items():
-            bible_chunks.append({
-                "source": "Bible",
-                "reference": f"{book} {chap}:{verse}",
-                "text": text.strip()
-            })
+from langchain_chroma import Chroma
+
+import ccc_parser
+import verse_store
+from embedding import make_embeddings, model_name
+from keyword_index import BM25Index, INDEX_FILENAME
+from vector_index import (
+    EMBEDDING_MODEL_KEY,
+    NUMPY_INDEX_DIRNAME,
+    check_model,
+    export_chroma,
+    stored_model,
+)
+
+PERSIST_DIRECTORY = "veritas_ai_chroma_db"
+
+# Characters per chunk. Catechism paragraphs (median ~400, p99 ~1,140 chars)
+# are kept whole where possible; long ones are split with some overlap.
+CHUNK_SIZES = {"Bible": (300, 20), "CCC": (1200, 100)}
+
+
+def load_entries() -> list[dict]:
+    """Return one entry per Bible verse and Catechism item."""
+    # 1) Load the JSON files (they live in the same folder as this script)
+    bible = verse_store.get_store()
 
-# 4) Flatten Catechism, handling list vs string
-ccc_chunks = []
-for item in catechism_items:
-    ref = item.get("id", item.get("number", ""))
-    raw_text = item["text"]
-    if isinstance(raw_text, list):
-        text_str = " ".join(str(chunk) for chunk in raw_text)
+    with open("ccc.json", "r", encoding="utf-8") as f:
+        raw_ccc = json.load(f)
+
+    # 2) Normalize the Catechism data
+    if isinstance(raw_ccc, list):
+        catechism_items = raw_ccc
+    elif isinstance(raw_ccc, dict) and "page_nodes" in raw_ccc:
+        catechism_items = [
+            {
+                "id": p["number"],
+                "text": p["text"],
+                "metadata": {
+                    "section": p["section"],
+                    "footnotes": ",".join(str(n) for n in p["footnotes"]),
+                    "citations": "; ".join(p["citations"]),
+                },
+            }
+            for p in ccc_parser.iter_paragraphs(raw_ccc)
+        ]
+    elif isinstance(raw_ccc, dict):
+        catechism_items = [{"id": k, "text": v} for k, v in raw_ccc.items()]
     else:
-        text_str = str(raw_text)
-    ccc_chunks.append({
-        "source": "CCC",
-        "reference": f"CCC {ref}",
-        "text": text_str.strip()
-    })
-
-# 5) Combine all chunks
-combined = bible_chunks + ccc_chunks
-
-# 6) Split into manageable pieces
-splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=20)
-docs, metadatas = [], []
-for entry in combined:
-    for i, chunk in enumerate(splitter.split_text(entry["text"])):
-        docs.append(chunk)
-        metadatas.append({
-            "source": entry["source"],
-            "reference": entry["reference"],
-            "chunk_index": i
+        raise RuntimeError("Unknown structure in ccc.json")
+
+    # 3) Flatten Bible into chunks
+    bible_chunks = []
+    for book, chap, verse, text in bible:
+        bible_chunks.append({
+            "source": "Bible",
+            "reference": f"{book} {chap}:{verse}",
+            "text": text
         })
 
-# 7) Embed & save to Chroma using texts + metadata
-api_key = os.getenv("OPENAI_API_KEY")
-embeddings = OpenAIEmbeddings(openai_api_key=api_key)
-db = Chroma.from_texts(
-    texts=docs,
-    embedding=embeddings,
-    metadatas=metadatas,
-    persist_directory="veritas_ai_chroma_db"
-)
-db.persist()
+    # 4) Flatten Catechism, handling list vs string
+    ccc_chunks = []
+    for item in catechism_items:
+        ref = item.get("id", item.get("number", ""))
+        raw_text = item["text"]
+        if isinstance(raw_text, list):
+            text_str = " ".join(str(chunk) for chunk in raw_text)
+        else:
+            text_str = str(raw_text)
+        ccc_chunks.append({
+            "source": "CCC",
+            "reference": f"CCC {ref}",
+            "text": text_str.strip(),
+            "metadata": item.get("metadata", {}),
+        })
+
+    # 5) Combine all chunks
+    return bible_chunks + ccc_chunks
+
+
+def chunk_id(source: str, reference: str, chunk_index: int, text: str) -> str:
+    key = json.dumps([source, reference, chunk_index, text])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def split_entries(entries: list[dict]) -> list[dict]:
+    """Split entries into chunks with metadata and a content-hash id."""
+    splitters = {
+        source: RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=overlap)
+        for source, (size, overlap) in CHUNK_SIZES.items()
+    }
+    chunks = []
+    for entry in entries:
+        splitter = splitters[entry["source"]]
+        for i, text in enumerate(splitter.split_text(entry["text"])):
+            chunks.append({
+                "id": chunk_id(entry["source"], entry["reference"], i, text),
+                "text": text,
+                "metadata": {
+                    **entry.get("metadata", {}),
+                    "source": entry["source"],
+                    "reference": entry["reference"],
+                    "chunk_index": i
+                },
+            })
+    return chunks
+
+
+# Exception names (OpenAI, httpx, requests) that are worth retrying
+TRANSIENT_ERRORS = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "Timeout", "TimeoutException", "ConnectTimeout", "ReadTimeout", "ConnectError",
+}
+
+
+def is_transient(error: Exception) -> bool:
+    """Rate limits, 5xx responses, timeouts and dropped connections."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError)) or any(
+        cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__
+    )
+
+
+def embed_with_backoff(embeddings, texts: list[str], max_retries: int = 6):
+    """Embed a batch, retrying rate limits and transient errors.
+
+    Other errors (bad request, authentication) are raised at once.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == max_retries or not is_transient(e):
+                raise
+            delay = min(60, 2 ** attempt) + random.random()
+            print(f"Embedding failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def claim_store(db: Chroma, embeddings, where: str) -> None:
+    """Record the embedding model on the store, or raise if it has another.
+
+    Stores built before the model was recorded are checked by vector size.
+    """
+    collection = db._collection
+    stored = stored_model(db)
+    check_model(stored, embeddings, where)
+    if stored is not None:
+        return
+    sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+    if len(sample):
+        size = len(embeddings.embed_query("vector size check"))
+        if len(sample[0]) != size:
+            raise RuntimeError(
+                f"{where} holds {len(sample[0])}-d vectors but {model_name(embeddings)} "
+                f"makes {size}-d ones; rebuild it with --rebuild"
+            )
+    metadata = {
+        k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")
+    }
+    collection.modify(metadata={**metadata, EMBEDDING_MODEL_KEY: model_name(embeddings)})
+
+
+def sync_chunks(
+    db: Chroma,
+    chunks: list[dict],
+    embeddings,
+    batch_size: int = 256,
+    workers: int = 4,
+) -> dict[str, int]:
+    """Make the store contain exactly ``chunks``.
+
+    Embeds missing chunks in parallel batches, writing each batch as it
+    completes, then deletes stored chunks that are no longer wanted. At most
+    two batches per worker are queued, so when one fails for good only the
+    batches already being embedded are lost; a re-run resumes from there.
+    """
+    collection = db._collection
+    existing = set(collection.get(include=[])["ids"])
+    wanted = {chunk["id"]: chunk for chunk in chunks}
+    todo = [chunk for cid, chunk in wanted.items() if cid not in existing]
+    stale = [cid for cid in existing if cid not in wanted]
+    print(f"{len(wanted)} chunks: {len(todo)} to embed, {len(stale)} stale")
+
+    batches = iter([todo[i:i + batch_size] for i in range(0, len(todo), batch_size)])
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+
+        def submit() -> None:
+            batch = next(batches, None)
+            if batch is not None:
+                texts = [c["text"] for c in batch]
+                futures[pool.submit(embed_with_backoff, embeddings, texts)] = batch
+
+        for _ in range(2 * workers):
+            submit()
+        try:
+            # Chroma writes stay on this thread; only embedding runs in parallel
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = futures.pop(future)
+                    collection.upsert(
+                        ids=[c["id"] for c in batch],
+                        embeddings=future.result(),
+                        documents=[c["text"] for c in batch],
+                        metadatas=[c["metadata"] for c in batch],
+                    )
+                    done += len(batch)
+                    print(f"  embedded {done}/{len(todo)}")
+                    submit()
+        except BaseException:
+            # Don't pay for queued batches whose results would be dropped
+            for future in futures:
+                future.cancel()
+            raise
+
+    for i in range(0, len(stale), batch_size):
+        collection.delete(ids=stale[i:i + batch_size])
+
+    return {"total": len(wanted), "embedded": len(todo), "deleted": len(stale)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Chroma vector store.")
+    parser.add_argument("--persist-dir", default=PERSIST_DIRECTORY)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--embeddings",
+        choices=["openai", "local", "fake"],
+        help="embeddings provider (default: $EMBEDDING_PROVIDER or openai)",
+    )
+    parser.add_argument(
+        "--fake-embeddings",
+        action="store_true",
+        help="use deterministic offline embeddings (same as --embeddings fake)",
+    )
+    parser.add_argument(
+        "--numpy-index",
+        nargs="?",
+        const="float32",
+        choices=["float32", "int8"],
+        help="also export the store for VECTOR_BACKEND=numpy (int8 quarters its size)",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="delete the store and embed everything again (to switch embedding models)",
+    )
+    args = parser.parse_args()
+
+    # 6) Split into manageable pieces
+    chunks = split_entries(load_entries())
+
+    # 7) Embed & save to Chroma using texts + metadata
+    embeddings = make_embeddings("fake" if args.fake_embeddings else args.embeddings)
+    db = Chroma(persist_directory=args.persist_dir, embedding_function=embeddings)
+    if args.rebuild:
+        db.delete_collection()
+        db = Chroma(persist_directory=args.persist_dir, embedding_function=embeddings)
+    try:
+        claim_store(db, embeddings, args.persist_dir)
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+    start = time.perf_counter()
+    stats = sync_chunks(
+        db, chunks, embeddings, batch_size=args.batch_size, workers=args.workers
+    )
+    BM25Index.from_chunks(chunks).save(os.path.join(args.persist_dir, INDEX_FILENAME))
+    if args.numpy_index:
+        count = export_chroma(
+            db,
+            os.path.join(args.persist_dir, NUMPY_INDEX_DIRNAME),
+            quantize=args.numpy_index == "int8",
+        )
+        print(f"Exported {count} chunks to a {args.numpy_index} NumPy index")
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ Chroma DB at ./{args.persist_dir}: {stats['total']} chunks, "
+        f"{stats['embedded']} embedded, {stats['deleted']} deleted in {elapsed:.1f}s"
+    )
+
 
-print("✅ Chroma DB built at ./veritas_ai_chroma_db")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Shared QA cache server for the uvicorn workers on one host.
+
+Holds the QA cache in memory (or in front of the SQLite file) and serves it
+to every worker over a Unix socket, so a question answered by one worker is
+a hit in all of them at in-memory speed. Workers connect with
+``qa_cache.SocketCache`` (``QA_CACHE_BACKEND=socket``).
+
+The protocol is one JSON object per line. Requests carry an ``op`` (``get``,
+``set``, ``delete``, ``clear``, ``len``, ``stats``) and get one reply line
+each. A connection that sends ``subscribe`` instead receives an
+``{"invalidate": key}`` line whenever another worker changes ``key``
+(``null`` after ``clear``), which keeps the workers' near caches coherent.
+
+    python cache_server.py --socket qa_cache.sock --max-entries 50000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+
+from qa_cache import CacheBackend, MemoryCache, SQLiteCache
+
+# A subscriber this far behind is dropped; it clears its near cache and
+# reconnects rather than serving stale answers
+MAX_SUBSCRIBER_BUFFER = 1024 * 1024
+
+
+class CacheServer:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._subscribers: dict[asyncio.StreamWriter, str | None] = {}
+
+    async def serve(self, path: str) -> None:
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        reply = {"error": "Expected a JSON object"}
+                    elif request.get("op") == "subscribe":
+                        self._subscribers[writer] = request.get("origin")
+                        reply = {"ok": True}
+                    else:
+                        reply = self.execute(request)
+                except Exception as e:
+                    # A bad request gets an error reply; the connection stays up
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.pop(writer, None)
+            writer.close()
+
+    def execute(self, request: dict) -> dict:
+        op, key = request.get("op"), request.get("key")
+        origin = request.get("origin")
+        if op == "get":
+            return {"value": self.backend.get(key)}
+        if op == "set":
+            self.backend.set(key, request["value"])
+            self._broadcast(key, origin)
+            return {"ok": True}
+        if op == "delete":
+            self.backend.delete(key)
+            self._broadcast(key, origin)
+            return {"ok": True}
+        if op == "clear":
+            self.backend.clear()
+            self._broadcast(None, origin)
+            return {"ok": True}
+        if op == "len":
+            return {"value": len(self.backend)}
+        if op == "stats":
+            return {"value": self.backend.stats()}
+        return {"error": f"Unknown op: {op}"}
+
+    def _broadcast(self, key: str | None, origin: str | None) -> None:
+        message = json.dumps({"invalidate": key}).encode() + b"\n"
+        for writer, subscriber in list(self._subscribers.items()):
+            if origin is not None and subscriber == origin:
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BUFFER:
+                self._subscribers.pop(writer, None)
+                writer.close()
+                continue
+            writer.write(message)
+
+
+def in_use(path: str) -> bool:
+    """True if a server is already listening on ``path``."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the QA cache to all workers on this host.")
+    parser.add_argument("--socket", default=os.getenv("QA_CACHE_SOCKET", "qa_cache.sock"))
+    parser.add_argument(
+        "--backend",
+        choices=["memory", "sqlite"],
+        default="memory",
+        help="sqlite keeps entries in QA_CACHE_PATH across restarts",
+    )
+    parser.add_argument("--path", default=os.getenv("QA_CACHE_PATH", "qa_cache.db"))
+    parser.add_argument(
+        "--max-entries", type=int, default=int(os.getenv("QA_CACHE_MAX_ENTRIES", "10000"))
+    )
+    parser.add_argument(
+        "--ttl", type=float, default=float(os.getenv("QA_CACHE_TTL_SECONDS", "0"))
+    )
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        if in_use(args.socket):
+            raise SystemExit(f"A cache server is already listening on {args.socket}")
+        os.unlink(args.socket)
+
+    if args.backend == "sqlite":
+        backend = SQLiteCache(args.path, max_entries=args.max_entries, ttl=args.ttl)
+    else:
+        backend = MemoryCache(max_entries=args.max_entries, ttl=args.ttl)
+    print(f"QA cache server ({args.backend}) listening on {args.socket}")
+    try:
+        asyncio.run(CacheServer(backend).serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Parse the numbered paragraphs out of ccc.json.
+
+``ccc.json`` stores the Catechism as pages (``page_nodes``) keyed by table of
+contents id. Each page is a list of paragraphs made of typed elements; a
+numbered CCC paragraph starts with a ``ref-ccc`` element and may continue over
+the following paragraphs until the next number or heading. ``ref`` elements
+point at the page's footnotes.
+
+Headings are bold, except the subheadings between numbered paragraphs: those
+are short plain lines that either stand right before the next number or are
+in capitals ("II. THE INCARNATION"). Continuations never look like that; they
+are indented, italic, cite a footnote or end like a sentence.
+
+:func:`iter_paragraphs` walks the pages in table-of-contents order and yields
+one dict per CCC paragraph number, so callers can process the ~2,865
+paragraphs one at a time.
+"""
+
+import re
+from typing import Iterator
+
+# Endings of a wrapped line or sentence, but not of "A hard battle. . ."
+_CONTINUED_RE = re.compile(r"[,;:]$|[^.\s]\.$")
+
+
+def section_paths(ccc: dict) -> dict[str, list[str]]:
+    """Map every TOC id to the titles from the root down to that node."""
+    titles = {tid: node.get("text", "").strip() for tid, node in ccc["toc_nodes"].items()}
+    paths: dict[str, list[str]] = {}
+
+    def walk(nodes: list[dict], parent: list[str]):
+        for node in nodes:
+            path = parent + [titles.get(node["id"], "")]
+            paths[node["id"]] = path
+            walk(node.get("children", []), path)
+
+    walk(ccc["toc_link_tree"], [])
+    return paths
+
+
+def toc_order(ccc: dict) -> list[str]:
+    """TOC ids in reading order (depth-first over ``toc_link_tree``)."""
+    order: list[str] = []
+
+    def walk(nodes: list[dict]):
+        for node in nodes:
+            order.append(node["id"])
+            walk(node.get("children", []))
+
+    walk(ccc["toc_link_tree"])
+    return order
+
+
+def _is_heading(elements: list[dict]) -> bool:
+    texts = [e for e in elements if e["type"] == "text"]
+    return bool(texts) and all(e.get("attrs", {}).get("b") for e in texts)
+
+
+def _text(elements: list[dict]) -> str:
+    return "".join(e["text"] for e in elements if e["type"] == "text").strip()
+
+
+def _is_subheading(para: dict, before_number: bool) -> bool:
+    """A plain, unbolded section title such as "Risen with Christ"."""
+    elements = para["elements"]
+    if para.get("attrs", {}).get("indent"):
+        return False
+    if not all(e["type"] == "text" and not e.get("attrs", {}).get("i") for e in elements):
+        return False
+    text = _text(elements)
+    if not text or len(text) > 100 or _CONTINUED_RE.search(text):
+        return False
+    if not (text[0].isupper() or text[0] in '".'):
+        return False
+    return before_number or text == text.upper()
+
+
+def iter_paragraphs(ccc: dict) -> Iterator[dict]:
+    """Yield ``{"number", "text", "section", "footnotes", "citations"}``.
+
+    ``section`` is the TOC path joined with `` > ``, ``footnotes`` the
+    footnote numbers referenced by the paragraph and ``citations`` the text of
+    those footnotes (e.g. ``"Mt 28:19-20"``).
+    """
+    paths = section_paths(ccc)
+    pages = ccc["page_nodes"]
+    for toc_id in toc_order(ccc):
+        page = pages.get(toc_id)
+        if page is None:
+            continue
+        footnotes = page.get("footnotes", {})
+        section = list(paths.get(toc_id, []))
+        current = None
+
+        def finish(paragraph):
+            refs = []
+            for n in paragraph["footnotes"]:
+                for ref in footnotes.get(str(n), {}).get("refs", []):
+                    refs.append(ref["text"].replace("⇒", "").strip())
+            return {
+                "number": paragraph["number"],
+                "text": "\n".join(paragraph["lines"]),
+                "section": " > ".join(p for p in paragraph["section"] if p),
+                "footnotes": paragraph["footnotes"],
+                "citations": refs,
+            }
+
+        paragraphs = [
+            para
+            for para in page["paragraphs"]
+            if not all(e["type"] == "spacer" for e in para["elements"])
+        ]
+        for i, para in enumerate(paragraphs):
+            elements = para["elements"]
+            before_number = (
+                i + 1 == len(paragraphs)
+                or paragraphs[i + 1]["elements"][0]["type"] == "ref-ccc"
+            )
+            if elements[0]["type"] == "ref-ccc":
+                if current:
+                    yield finish(current)
+                current = {
+                    "number": elements[0]["ref_number"],
+                    "lines": [],
+                    "section": section,
+                    "footnotes": [],
+                }
+            elif _is_heading(elements) or (
+                current and _is_subheading(para, before_number)
+            ):
+                if current:
+                    yield finish(current)
+                    current = None
+                heading = _text(elements)
+                if heading and heading not in section:
+                    section = paths.get(toc_id, [])[:] + [heading]
+                continue
+            elif current is None:
+                # Epigraphs and other text outside a numbered paragraph
+                continue
+            line = _text(elements)
+            if line:
+                current["lines"].append(line)
+            current["footnotes"].extend(
+                e["number"] for e in elements if e["type"] == "ref"
+            )
+        if current:
+            yield finish(current)
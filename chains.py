@@ -0,0 +1,115 @@
+"""Prebuilt retrievers and RetrievalQA chains, one set per source mode.
+
+Building a retriever and a ``RetrievalQA`` chain is cheap once but adds up
+when done on every request, so the API builds them at startup and looks them
+up by mode. Call :meth:`ChainRegistry.rebuild` after changing ``k`` or the
+prompt to swap in fresh chains. Retrieved chunks are compressed to each
+mode's context budget (see ``context.py``) before they reach the prompt.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from langchain.chains import RetrievalQA
+from langchain_core.prompts import BasePromptTemplate
+
+from context import CompressedRetriever, ContextBudget, budget_for_mode
+from hybrid import HybridRetriever
+from templates import prompt_for_mode
+
+# Metadata filter applied to the vector store for each source mode
+MODE_FILTERS = {
+    "bible": {"source": "Bible"},
+    "both": None,
+    "catechism": {"source": "CCC"},
+}
+
+
+@dataclass(frozen=True)
+class ModeChain:
+    """Everything needed to answer a question in one source mode."""
+
+    mode: str
+    retriever: Any
+    prompt: BasePromptTemplate
+    chain: RetrievalQA
+
+
+class ChainRegistry:
+    """Holds one :class:`ModeChain` per source mode."""
+
+    def __init__(
+        self,
+        vectorstore,
+        llm,
+        k: int = 8,
+        prompt_factory: Callable[[str], BasePromptTemplate] = prompt_for_mode,
+        keyword_index=None,
+        context_budget: Callable[[str], ContextBudget] = budget_for_mode,
+    ):
+        self.vectorstore = vectorstore
+        self.llm = llm
+        self.keyword_index = keyword_index
+        self.k = k
+        self.prompt_factory = prompt_factory
+        self.context_budget = context_budget
+        self._chains: dict[str, ModeChain] = {}
+        self._retrievers: dict[tuple[str, int], Any] = {}
+        self.rebuild()
+
+    def make_retriever(self, mode: str, k: int):
+        filter_opt = MODE_FILTERS[mode]
+        retriever = self.vectorstore.as_retriever(
+            search_kwargs={"k": k, **({"filter": filter_opt} if filter_opt else {})}
+        )
+        if self.keyword_index is not None:
+            retriever = HybridRetriever(
+                vector_retriever=retriever,
+                index=self.keyword_index,
+                k=k,
+                source=filter_opt["source"] if filter_opt else None,
+            )
+        budget = self.context_budget(mode)
+        if not budget.enabled:
+            return retriever
+        return CompressedRetriever(retriever=retriever, budget=budget)
+
+    def build(self, mode: str) -> ModeChain:
+        retriever = self.make_retriever(mode, self.k)
+        prompt = self.prompt_factory(mode)
+        chain = RetrievalQA.from_chain_type(
+            llm=self.llm,
+            chain_type="stuff",
+            retriever=retriever,
+            chain_type_kwargs={"prompt": prompt},
+        )
+        return ModeChain(mode=mode, retriever=retriever, prompt=prompt, chain=chain)
+
+    def rebuild(
+        self,
+        k: int | None = None,
+        prompt_factory: Callable[[str], BasePromptTemplate] | None = None,
+    ) -> None:
+        """Rebuild every mode's chain, optionally with a new ``k`` or prompt.
+
+        The new chains replace the old ones in a single assignment, so
+        requests already in flight finish on the chain they started with.
+        """
+        if k is not None:
+            self.k = k
+        if prompt_factory is not None:
+            self.prompt_factory = prompt_factory
+        self._chains = {mode: self.build(mode) for mode in MODE_FILTERS}
+        self._retrievers = {}
+
+    def get(self, mode: str) -> ModeChain:
+        return self._chains[mode]
+
+    def retriever(self, mode: str, k: int | None = None):
+        """Return a cached retriever for ``mode`` with a custom ``k``."""
+        if k is None or k == self.k:
+            return self._chains[mode].retriever
+        key = (mode, k)
+        if key not in self._retrievers:
+            self._retrievers[key] = self.make_retriever(mode, k)
+        return self._retrievers[key]
@@ -0,0 +1,119 @@
+"""Chat models shared by the API and the benchmarks."""
+
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DEFAULT_MODEL = "gpt-4-turbo"
+
+_WORDS = (
+    "grace faith hope charity God Christ Church Scripture mercy love truth "
+    "salvation prayer spirit covenant kingdom light life peace wisdom"
+).split()
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline chat model for tests and benchmarks.
+
+    Replies with ``tokens`` words picked from a seed derived from the prompt,
+    followed by a ``=== Sources ===`` block, so the same prompt always gets
+    the same answer. ``latency`` seconds are spent per reply; streaming
+    spreads them evenly over the tokens.
+    """
+
+    latency: float = 0.0
+    tokens: int = 200
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _pieces(self, messages: list[BaseMessage]) -> list[str]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        seed = hashlib.blake2b(prompt.encode(), digest_size=8).digest()
+        rng = random.Random(seed)
+        words = [rng.choice(_WORDS) for _ in range(self.tokens)]
+        return (
+            ["=== Answer ===\n\n"]
+            + [f"{w} " for w in words]
+            + ["\n\n=== Sources ===\n", "- John 3:16\n", "- CCC 1996\n"]
+        )
+
+    def _result(self, messages: list[BaseMessage], text: str) -> ChatResult:
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": self.tokens,
+            "total_tokens": prompt_tokens + self.tokens,
+        }
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=text))],
+            llm_output={"token_usage": usage, "model_name": self._llm_type},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages, "".join(self._pieces(messages)))
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages, "".join(self._pieces(messages)))
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        pieces = self._pieces(messages)
+        for piece in pieces:
+            if self.latency:
+                time.sleep(self.latency / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        pieces = self._pieces(messages)
+        for piece in pieces:
+            if self.latency:
+                await asyncio.sleep(self.latency / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+def make_llm(provider: str | None = None) -> BaseChatModel:
+    """Build the chat model selected by ``LLM_PROVIDER``.
+
+    ``openai`` (default) uses ``ChatOpenAI`` with gpt-4-turbo; ``fake`` uses
+    :class:`FakeChatModel` tuned by ``FAKE_LLM_LATENCY`` (seconds per reply)
+    and ``FAKE_LLM_TOKENS`` (words per reply).
+    """
+    provider = provider or os.getenv("LLM_PROVIDER", "openai")
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model_name=DEFAULT_MODEL,
+            temperature=0.0,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+        )
+    if provider == "fake":
+        return FakeChatModel(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0")),
+            tokens=int(os.getenv("FAKE_LLM_TOKENS", "200")),
+        )
+    raise RuntimeError(f"Unknown LLM_PROVIDER: {provider}")
@@ -0,0 +1,245 @@
+"""Context assembly for the QA prompt: dedupe, merge, re-rank, fit a budget.
+
+The "stuff" chain puts every retrieved document into the prompt, so prompt
+size (and, because the prompt asks for passages to be quoted, completion
+size) grows with ``k`` and chunk length. :func:`assemble` turns retrieved
+chunks into a bounded context:
+
+1. chunks of the same entry are stitched back together, dropping the text
+   repeated by the splitter's ``chunk_overlap``;
+2. adjacent verses of the same chapter become one passage (``John 3:16-18``);
+3. passages are re-ranked by their retrieval ranks (summed over merged
+   chunks) fused with question term coverage;
+4. passages are added best first until ``ContextBudget.max_tokens`` (counted
+   with tiktoken) is reached, truncating the last one if enough room is left.
+
+Each passage is labelled with its reference so the model can cite it.
+:class:`CompressedRetriever` applies this to any retriever; ``ChainRegistry``
+wraps every mode's retriever with the budget from :func:`budget_for_mode`.
+"""
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from keyword_index import tokenize
+from telemetry import DEFAULT_MODEL, count_tokens, encoding
+
+_VERSE_RE = re.compile(r"^(.+?) (\d+):(\d+)(?:-(\d+))?$")
+
+# Default token budget per source mode; CONTEXT_TOKEN_BUDGET overrides all
+# of them and CONTEXT_TOKEN_BUDGET_<MODE> one mode (0 disables compression)
+DEFAULT_BUDGETS = {"bible": 1000, "both": 1500, "catechism": 1500}
+
+
+@dataclass(frozen=True)
+class ContextBudget:
+    max_tokens: int = 1500
+    # Smallest truncated passage worth adding when the next one does not fit
+    min_fragment: int = 40
+    model: str = DEFAULT_MODEL
+    rrf_k: int = 60
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tokens > 0
+
+
+def budget_for_mode(mode: str) -> ContextBudget:
+    default = os.getenv("CONTEXT_TOKEN_BUDGET", str(DEFAULT_BUDGETS.get(mode, 1500)))
+    return ContextBudget(
+        max_tokens=int(os.getenv(f"CONTEXT_TOKEN_BUDGET_{mode.upper()}", default))
+    )
+
+
+@dataclass
+class Passage:
+    """One or more retrieved chunks merged into a single piece of context."""
+
+    reference: str
+    text: str
+    metadata: dict
+    score: float
+
+    def label(self) -> str:
+        return f"[{self.reference}] {self.text}" if self.reference else self.text
+
+    def document(self) -> Document:
+        return Document(
+            page_content=self.label(),
+            metadata={**self.metadata, "reference": self.reference},
+        )
+
+
+def stitch(left: str, right: str, max_overlap: int = 200) -> str:
+    """Join consecutive chunks, dropping the words they share."""
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        # The splitter overlaps whole words, so only accept word boundaries
+        if (
+            left.endswith(right[:size])
+            and (size == len(right) or right[size].isspace())
+            and (size == len(left) or left[-size - 1].isspace())
+        ):
+            return left + right[size:]
+    return f"{left} {right}"
+
+
+def merge_chunks(docs: list[Document], rrf_k: int = 60) -> list[Passage]:
+    """One passage per (source, reference), chunks stitched in order."""
+    groups: dict[tuple, dict[int, tuple[str, float]]] = {}
+    first: dict[tuple, Document] = {}
+    for rank, doc in enumerate(docs, start=1):
+        meta = doc.metadata
+        key = (meta.get("source"), meta.get("reference") or doc.page_content)
+        first.setdefault(key, doc)
+        chunks = groups.setdefault(key, {})
+        index = meta.get("chunk_index", 0)
+        _, score = chunks.get(index, (None, 0.0))
+        # The same chunk retrieved twice counts once, at its best rank
+        chunks[index] = doc.page_content, max(score, 1.0 / (rrf_k + rank))
+
+    passages = []
+    for key, chunks in groups.items():
+        order = sorted(chunks)
+        text = chunks[order[0]][0]
+        for prev, index in zip(order, order[1:]):
+            part = chunks[index][0]
+            text = stitch(text, part) if index == prev + 1 else f"{text} … {part}"
+        meta = first[key].metadata
+        passages.append(Passage(
+            reference=meta.get("reference", ""),
+            text=text,
+            metadata={k: v for k, v in meta.items() if k != "chunk_index"},
+            score=sum(score for _, score in chunks.values()),
+        ))
+    return passages
+
+
+def merge_verses(passages: list[Passage]) -> list[Passage]:
+    """Merge Bible passages that are consecutive verses of one chapter."""
+    verses: dict[tuple, list[tuple[int, int, Passage]]] = {}
+    merged = []
+    for passage in passages:
+        match = _VERSE_RE.match(passage.reference)
+        if passage.metadata.get("source") != "Bible" or not match:
+            merged.append(passage)
+            continue
+        book, chapter, start, end = match.groups()
+        verses.setdefault((book, chapter), []).append(
+            (int(start), int(end or start), passage)
+        )
+
+    for (book, chapter), found in verses.items():
+        found.sort(key=lambda v: v[0])
+        run_start, run_end, run = found[0]
+        runs = []
+        for start, end, passage in found[1:]:
+            if start <= run_end + 1:
+                if end > run_end:
+                    run = Passage(
+                        reference="",
+                        text=f"{run.text} {passage.text}",
+                        metadata=run.metadata,
+                        score=run.score + passage.score,
+                    )
+                    run_end = end
+                else:
+                    run.score += passage.score
+                continue
+            runs.append((run_start, run_end, run))
+            run_start, run_end, run = start, end, passage
+        runs.append((run_start, run_end, run))
+        for start, end, passage in runs:
+            passage.reference = (
+                f"{book} {chapter}:{start}" + (f"-{end}" if end != start else "")
+            )
+            merged.append(passage)
+    return merged
+
+
+def rerank(question: str, passages: list[Passage], rrf_k: int = 60) -> list[Passage]:
+    """Order passages by retrieval score fused with question term coverage."""
+    terms = set(tokenize(question))
+    if terms:
+        coverage = {
+            id(p): len(terms & set(tokenize(p.text))) / len(terms) for p in passages
+        }
+        by_coverage = sorted(passages, key=lambda p: coverage[id(p)], reverse=True)
+        for rank, passage in enumerate(by_coverage, start=1):
+            if coverage[id(passage)] > 0:
+                passage.score += 1.0 / (rrf_k + rank)
+    return sorted(passages, key=lambda p: p.score, reverse=True)
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """Cut ``text`` to ``max_tokens`` tokens, at a word boundary."""
+    enc = encoding(model)
+    if enc is not None:
+        tokens = enc.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        cut = enc.decode(tokens[:max_tokens])
+    else:
+        if len(text) <= max_tokens * 4:
+            return text
+        cut = text[: max_tokens * 4]
+    return cut.rsplit(" ", 1)[0] + " …"
+
+
+def fit(passages: list[Passage], budget: ContextBudget) -> list[Passage]:
+    """The best passages that fit in ``budget.max_tokens``, in order."""
+    kept, left = [], budget.max_tokens
+    for passage in passages:
+        # Passages are joined by a blank line, about two tokens
+        cost = count_tokens(passage.label(), budget.model) + 2
+        if cost <= left:
+            kept.append(passage)
+            left -= cost
+            continue
+        if left >= budget.min_fragment:
+            prefix = count_tokens(f"[{passage.reference}] ", budget.model)
+            passage.text = truncate_tokens(
+                passage.text, max(1, left - prefix - 4), budget.model
+            )
+            kept.append(passage)
+        break
+    return kept
+
+
+def assemble(question: str, docs: list[Document], budget: ContextBudget) -> list[Document]:
+    """Retrieved chunks to the documents to stuff into the prompt."""
+    if not budget.enabled or not docs:
+        return docs
+    passages = merge_verses(merge_chunks(docs, budget.rrf_k))
+    passages = fit(rerank(question, passages, budget.rrf_k), budget)
+    return [passage.document() for passage in passages]
+
+
+class CompressedRetriever(BaseRetriever):
+    """Wrap a retriever so it returns :func:`assemble`-d context."""
+
+    retriever: BaseRetriever
+    budget: ContextBudget = ContextBudget()
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        docs = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return assemble(query, docs, self.budget)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        docs = await self.retriever.ainvoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        # Token counting is CPU-bound, so it runs off the event loop
+        return await asyncio.to_thread(assemble, query, docs, self.budget)
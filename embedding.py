@@ -0,0 +1,291 @@
+"""Embedding models shared by build_db.py and the API."""
+
+import asyncio
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic offline embeddings for tests and benchmarks.
+
+    Each word is hashed into one of ``size`` buckets and the counts are
+    L2-normalized, so texts that share words get similar vectors. ``latency``
+    seconds are slept per call to imitate a remote API.
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        # Identifies the vectors for model_name(): sizes are not interchangeable
+        self.model = f"fake-{size}"
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.size
+        for word in _WORD_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            vector[int.from_bytes(digest, "little") % self.size] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """Memoize query embeddings of another embeddings model.
+
+    Query vectors are kept in a bounded in-memory LRU and, when ``path`` is
+    set, in a SQLite table keyed by a hash of the model name and the text,
+    so they survive restarts and are shared between workers. The table keeps
+    the ``max_disk_entries`` most recently used vectors. The async methods
+    read and write it in a thread. Document embeddings (used when building
+    the store) pass straight through.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_entries: int = 10000,
+        path: str | Path | None = None,
+        max_disk_entries: int = 100000,
+    ):
+        self.embeddings = embeddings
+        self.model = model_name(embeddings)
+        self.max_entries = max_entries
+        self.path = str(path) if path is not None else None
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if self.path is not None:
+            with self._conn() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    " key TEXT PRIMARY KEY, vector BLOB NOT NULL,"
+                    " accessed_at REAL NOT NULL DEFAULT 0)"
+                )
+                columns = {
+                    row[1] for row in conn.execute("PRAGMA table_info(query_embeddings)")
+                }
+                if "accessed_at" not in columns:
+                    # Tables created before the size bound; old rows go first
+                    conn.execute(
+                        "ALTER TABLE query_embeddings"
+                        " ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0"
+                    )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS query_embeddings_accessed"
+                    " ON query_embeddings (accessed_at)"
+                )
+            self._count = self._query_count()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _query_count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode()).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> list[float] | None:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+        if self.path is not None:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                # Disk hits are rare (the memory LRU absorbs repeats), so
+                # refreshing the access time on each one is cheap
+                with conn:
+                    conn.execute(
+                        "UPDATE query_embeddings SET accessed_at = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                vector = array("f", row[0]).tolist()
+                self._remember(key, vector)
+                self.hits += 1
+                return vector
+        self.misses += 1
+        return None
+
+    def _store(self, key: str, vector: list[float]) -> None:
+        self._remember(key, vector)
+        if self.path is not None:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, vector, accessed_at)"
+                    " VALUES (?, ?, ?)",
+                    (key, array("f", vector).tobytes(), time.time()),
+                )
+            self._count += 1
+            # Other workers write to the same file, so recount before evicting
+            if self._count > self.max_disk_entries:
+                self._count = self._query_count()
+                if self._count > self.max_disk_entries:
+                    self._evict(conn, self._count - self.max_disk_entries)
+
+    def _evict(self, conn: sqlite3.Connection, excess: int) -> None:
+        # Evict a little extra so the next few writes don't each trigger it
+        excess += max(1, self.max_disk_entries // 100)
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM query_embeddings WHERE key IN ("
+                " SELECT key FROM query_embeddings ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+        self.evictions += cur.rowcount
+        self._count -= cur.rowcount
+
+    async def _alookup(self, keys: list[str]) -> list[list[float] | None]:
+        """:meth:`_lookup` each key, reading SQLite in a thread on a memory miss."""
+        if self.path is None or all(key in self._memory for key in keys):
+            return [self._lookup(key) for key in keys]
+        return await asyncio.to_thread(lambda: [self._lookup(key) for key in keys])
+
+    async def _astore(self, items: list[tuple[str, list[float]]]) -> None:
+        """:meth:`_store` each ``(key, vector)``, writing SQLite in a thread."""
+        if self.path is None:
+            for key, vector in items:
+                self._store(key, vector)
+            return
+
+        def store_all():
+            for key, vector in items:
+                self._store(key, vector)
+
+        await asyncio.to_thread(store_all)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        (vector,) = await self._alookup([key])
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await self._astore([(key, vector)])
+        return vector
+
+    async def aembed_queries(
+        self, texts: list[str], batch_size: int = 512
+    ) -> list[list[float]]:
+        """Query vectors for many texts, embedding the uncached ones in batches.
+
+        The vectors are memoized like :meth:`aembed_query` results, so later
+        single-query calls for the same texts (e.g. by a retriever) are hits.
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = await self._alookup(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for start in range(0, len(missing), batch_size):
+            todo = missing[start:start + batch_size]
+            embedded = await self.embeddings.aembed_documents([texts[i] for i in todo])
+            await self._astore([(keys[i], vector) for i, vector in zip(todo, embedded)])
+            for i, vector in zip(todo, embedded):
+                vectors[i] = vector
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+            "disk_evictions": self.evictions,
+        }
+
+
+def model_name(embeddings: Embeddings) -> str:
+    """Best-effort identifier of the model behind ``embeddings``."""
+    for attr in ("model", "model_name"):
+        value = getattr(embeddings, attr, None)
+        if isinstance(value, str):
+            return value
+    return type(embeddings).__name__
+
+
+def make_embeddings(provider: str | None = None) -> Embeddings:
+    """Build the embeddings model selected by ``EMBEDDING_PROVIDER``.
+
+    ``openai`` (default) uses ``OpenAIEmbeddings``; ``local`` runs the
+    sentence-transformers model named by ``LOCAL_EMBEDDING_MODEL`` on the
+    CPU; ``fake`` uses :class:`FakeEmbeddings` with ``FAKE_EMBEDDING_LATENCY``
+    seconds per call. The Chroma store must be built with the same provider
+    the API uses.
+    """
+    provider = provider or os.getenv("EMBEDDING_PROVIDER", "openai")
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
+    if provider == "local":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        try:
+            return HuggingFaceEmbeddings(
+                model_name=os.getenv("LOCAL_EMBEDDING_MODEL", DEFAULT_LOCAL_MODEL),
+                model_kwargs={"device": "cpu"},
+                encode_kwargs={"normalize_embeddings": True},
+            )
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=local needs sentence-transformers: "
+                "pip install sentence-transformers"
+            ) from e
+    if provider == "fake":
+        return FakeEmbeddings(latency=float(os.getenv("FAKE_EMBEDDING_LATENCY", "0")))
+    raise RuntimeError(f"Unknown EMBEDDING_PROVIDER: {provider}")
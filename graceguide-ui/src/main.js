@@ -207,6 +207,35 @@ function renderHistory() {
 
 renderHistory();
 
+// Parse the Server-Sent Events from /qa/stream, calling onToken for each
+// chunk of answer text and resolving with the final { answer, sources }.
+async function readAnswerStream(res, onToken) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message";
+      let data = "";
+      frame.split("\n").forEach(line => {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      });
+      const payload = data ? JSON.parse(data) : {};
+      if (event === "token") onToken(payload.text);
+      else if (event === "done") return payload;
+      else if (event === "error") throw new Error(payload.detail);
+    }
+  }
+  throw new Error("Answer stream ended unexpectedly");
+}
+
 async function ask() {
   const q = qBox.value.trim();
   if (!q) return;
@@ -219,13 +248,24 @@ async function ask() {
 
 
   try {
-    const res = await fetch("/qa", {
+    const res = await fetch("/qa/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ question: q, mode })
     });
     if (!res.ok) throw new Error(await res.text());
-    const { answer, sources } = await res.json();
+
+    // Show answer text as tokens arrive
+    output.textContent = "";
+    srcList.innerHTML = "";
+    const { answer, sources } = await readAnswerStream(res, text => {
+      if (card.classList.contains("hidden")) {
+        spinner.classList.add("hidden");
+        askLabel.classList.remove("hidden");
+        card.classList.remove("hidden");
+      }
+      output.textContent += text;
+    });
 
     // Render answer
     output.textContent = answer.trim();
@@ -0,0 +1,104 @@
+"""Hybrid retriever: BM25 keyword search fused with Chroma vector search.
+
+Questions that name explicit references ("John 3:16", "CCC 1021") are
+answered from the keyword index alone, without an embedding call. Other
+questions run both searches and merge them with reciprocal rank fusion.
+In async code the BM25 work runs in a thread, concurrently with the vector
+search, so it never blocks the event loop.
+"""
+
+import asyncio
+from typing import Any
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from keyword_index import BM25Index
+
+
+def _doc_key(doc: Document) -> tuple:
+    meta = doc.metadata
+    return meta.get("reference"), meta.get("chunk_index"), doc.page_content
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[Document]], k: int, rrf_k: int = 60
+) -> list[Document]:
+    """Merge ranked lists, scoring each document by ``sum(1 / (rrf_k + rank))``."""
+    scores: dict[tuple, float] = {}
+    docs: dict[tuple, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """Combine a vector retriever with a :class:`BM25Index`."""
+
+    vector_retriever: BaseRetriever
+    index: Any
+    k: int = 8
+    source: str | None = None
+    rrf_k: int = 60
+
+    def _documents(self, ids: list[int]) -> list[Document]:
+        index: BM25Index = self.index
+        return [
+            Document(page_content=index.texts[i], metadata=index.metadatas[i])
+            for i in ids
+        ]
+
+    def reference_documents(self, query: str) -> list[Document]:
+        """Chunks for the explicit references in ``query`` (allowed sources only)."""
+        ids = [i for ref in self.index.references_in(query) for i in self.index.lookup(ref)]
+        if self.source is not None:
+            ids = [i for i in ids if self.index.metadatas[i].get("source") == self.source]
+        return self._documents(ids)
+
+    def keyword_documents(self, query: str) -> list[Document]:
+        hits = self.index.search(query, k=self.k, source=self.source)
+        return self._documents([i for i, _ in hits])
+
+    def _fast_path(self, query: str) -> list[Document] | None:
+        direct = self.reference_documents(query)
+        if not direct:
+            return None
+        # Referenced passages first, then keyword matches for the rest
+        seen = {_doc_key(doc) for doc in direct}
+        extra = [d for d in self.keyword_documents(query) if _doc_key(d) not in seen]
+        return direct + extra[: max(0, self.k - len(direct))]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        direct = self._fast_path(query)
+        if direct is not None:
+            return direct
+        vector = self.vector_retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return reciprocal_rank_fusion(
+            [vector, self.keyword_documents(query)], k=self.k, rrf_k=self.rrf_k
+        )
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        direct = await asyncio.to_thread(self._fast_path, query)
+        if direct is not None:
+            return direct
+        vector, keyword = await asyncio.gather(
+            self.vector_retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}
+            ),
+            asyncio.to_thread(self.keyword_documents, query),
+        )
+        return reciprocal_rank_fusion([vector, keyword], k=self.k, rrf_k=self.rrf_k)
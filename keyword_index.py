@@ -0,0 +1,163 @@
+"""Local BM25 keyword index over the chunks stored in Chroma.
+
+``build_db.py`` builds the index from the same chunks and metadata it embeds
+and saves it as ``keyword_index.json`` inside the Chroma directory. Besides
+ranked keyword search, the index maps every ``reference`` (``"John 3:16"``,
+``"CCC 1021"``) to its chunks so explicit references can be answered
+without an embedding call.
+"""
+
+import heapq
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+INDEX_FILENAME = "keyword_index.json"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CCC_REF_RE = re.compile(r"\bCCC\s*§*\s*(\d{1,4})(?:\s*[-–]\s*(\d{1,4}))?", re.I)
+# Chapter, verse and optional range end after a Bible book name ("John3:16" too)
+_VERSE_PATTERN = r"\.?\s*(\d{1,3}):(\d{1,3})(?:\s*[-–]\s*(\d{1,3}))?"
+# Longest range expanded from a single reference like "CCC 1020-1060"
+MAX_RANGE = 20
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have he her him "
+    "his how i if in into is it its me my of on or our shall she so that the "
+    "their them then there these they this thou thee thy to unto us was we "
+    "what when where which who whom why will with ye you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def _book_key(book: str) -> str:
+    """Lookup key of a book name; a trailing "s" is optional ("Psalm 23:1")."""
+    return re.sub(r"\s+", "", book).lower().removesuffix("s")
+
+
+def _bible_ref_re(books: list[str]) -> re.Pattern | None:
+    """Regex for references to ``books``, anchored on their names.
+
+    Words before a book name ("Gospel of John 3:16") are never taken as
+    part of it, and names ending in "s" also match without it.
+    """
+    if not books:
+        return None
+    # Longest first, so "1 John" wins over "John"
+    names = sorted(books, key=len, reverse=True)
+    alternatives = "|".join(
+        r"\s*".join(map(re.escape, name.removesuffix("s").split()))
+        + ("s?" if name.endswith("s") else "")
+        for name in names
+    )
+    return re.compile(rf"\b({alternatives}){_VERSE_PATTERN}", re.I)
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, with a reference lookup table."""
+
+    def __init__(
+        self,
+        texts: list[str],
+        metadatas: list[dict],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self.lengths: list[int] = []
+        self.by_reference: dict[str, list[int]] = defaultdict(list)
+        for i, (text, meta) in enumerate(zip(texts, metadatas)):
+            counts = Counter(tokenize(text))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+            self.by_reference[meta.get("reference", "")].append(i)
+        self.books: dict[str, str] = {}
+        for ref, ids in self.by_reference.items():
+            ids.sort(key=lambda i: self.metadatas[i].get("chunk_index", 0))
+            if ":" in ref:
+                book = ref.rsplit(" ", 1)[0]
+                self.books.setdefault(_book_key(book), book)
+        self._bible_ref_re = _bible_ref_re(list(self.books.values()))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        self._norms = [
+            k1 * (1 - b + b * length / self.avg_length) for length in self.lengths
+        ]
+        n = len(texts)
+        self.idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def from_chunks(cls, chunks: list[dict]) -> "BM25Index":
+        """Build from ``build_db.split_entries`` output."""
+        return cls([c["text"] for c in chunks], [c["metadata"] for c in chunks])
+
+    def search(
+        self, query: str, k: int = 8, source: str | None = None
+    ) -> list[tuple[int, float]]:
+        """Return up to ``k`` ``(chunk index, score)`` pairs, best first."""
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            norms = self._norms
+            for i, tf in self.postings[term]:
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norms[i])
+        items = scores.items()
+        if source is not None:
+            items = (
+                (i, s) for i, s in items if self.metadatas[i].get("source") == source
+            )
+        return heapq.nlargest(k, items, key=lambda item: item[1])
+
+    def lookup(self, reference: str) -> list[int]:
+        """Chunk indexes for an exact reference such as ``"CCC 1021"``."""
+        return self.by_reference.get(reference, [])
+
+    def references_in(self, text: str) -> list[str]:
+        """Explicit Bible/CCC references in ``text`` that exist in the index.
+
+        Ranges (``"John 3:16-18"``, ``"CCC 1020-1022"``) are expanded to
+        their individual references.
+        """
+        found: list[str] = []
+        for m in _CCC_REF_RE.finditer(text):
+            start = int(m[1])
+            end = int(m[2]) if m[2] else start
+            for n in range(start, min(end, start + MAX_RANGE - 1) + 1):
+                found.append(f"CCC {n}")
+        matches = self._bible_ref_re.finditer(text) if self._bible_ref_re else ()
+        for m in matches:
+            book = self.books.get(_book_key(m[1]))
+            if book is None:
+                continue
+            start = int(m[3])
+            end = int(m[4]) if m[4] else start
+            for n in range(start, min(end, start + MAX_RANGE - 1) + 1):
+                found.append(f"{book} {m[2]}:{n}")
+        return [ref for ref in dict.fromkeys(found) if ref in self.by_reference]
+
+    def save(self, path: str | Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"texts": self.texts, "metadatas": self.metadatas}, f)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "BM25Index":
+        """Load a saved index; postings are rebuilt from the stored chunks."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["texts"], data["metadatas"])
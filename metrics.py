@@ -1,23 +1,282 @@
+"""Frontend event log with incremental counters.
+
+Events are buffered in memory and appended to ``metrics.csv`` in batches
+(every ``batch_size`` events or ``flush_interval`` seconds). The file rotates
+when it passes ``max_bytes`` or at the first write of a new UTC day; rotated
+files are renamed ``metrics.<date>.<n>.csv`` and their counts are kept in
+``metrics.summary.json`` so they never have to be re-read. Hours older than
+``compact_days`` are folded into day buckets there, so the summary stays small.
+
+Counts are maintained incrementally per event and per UTC hour by tailing the
+live log, which also picks up events written by other workers, next to a
+running total. Unbounded ``get_counts`` calls are answered from the total in
+O(new lines since the last call); a time range costs O(buckets x event types).
+"""
+
+import atexit
 import csv
+import io
+import json
 import os
-from datetime import datetime
-from collections import Counter
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
 METRICS_FILE = Path("metrics.csv")
+HEADER = ["timestamp", "event"]
+
+
+class EventLog:
+    """Buffered, rotating CSV event log with per-event and hourly counters."""
+
+    def __init__(
+        self,
+        file_path: Path = METRICS_FILE,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_bytes: int = 10 * 1024 * 1024,
+        compact_days: int = 7,
+    ):
+        self.path = Path(file_path)
+        self.summary_path = self.path.with_name(f"{self.path.stem}.summary.json")
+        self.lock_path = self.path.with_name(f"{self.path.name}.lock")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.compact_days = compact_days
+        self._buffer: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        # Counts of rotated files (from the summary, by hour or day), of the
+        # live file (by hour) and of both together
+        self._summary: dict[str, Counter] = {}
+        self._hourly: dict[str, Counter] = defaultdict(Counter)
+        self._total: Counter = Counter()
+        self._reader = None
+        self._partial = b""
+        self._flusher: threading.Thread | None = None
+        with self._file_lock():
+            self._catch_up(locked=True)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize appends and rotation across worker processes."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def log(self, event: str) -> None:
+        with self._lock:
+            self._buffer.append((datetime.utcnow().isoformat(), event))
+            full = len(self._buffer) >= self.batch_size
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+        if full:
+            self.flush()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Metrics flush failed: {e}")
+
+    def flush(self) -> None:
+        """Append buffered events to the log in a single write."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(rows)
+        with self._file_lock():
+            self._maybe_rotate()
+            data = out.getvalue()
+            if not self.path.exists():
+                data = ",".join(HEADER) + "\n" + data
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data.encode())
+            finally:
+                os.close(fd)
+
+    def _maybe_rotate(self) -> None:
+        """Rotate the log by size or UTC day. Caller holds the file lock."""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return
+        day = datetime.utcfromtimestamp(st.st_mtime).date()
+        if st.st_size < self.max_bytes and day == datetime.utcnow().date():
+            return
+        # Count the whole live file, then fold it into the summary
+        self._catch_up(locked=True)
+        n = 0
+        while True:
+            target = self.path.with_name(f"{self.path.stem}.{day.isoformat()}.{n}.csv")
+            if not target.exists():
+                break
+            n += 1
+        self.path.rename(target)
+        with self._lock:
+            summary = {hour: Counter(c) for hour, c in self._summary.items()}
+            for hour, counter in self._hourly.items():
+                summary.setdefault(hour, Counter()).update(counter)
+        summary = self._compact(summary)
+        tmp = self.summary_path.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump({hour: dict(c) for hour, c in summary.items()}, f)
+        os.replace(tmp, self.summary_path)
+        self._catch_up(locked=True)
+
+    def _compact(self, summary: dict[str, Counter]) -> dict[str, Counter]:
+        """Fold hourly buckets older than ``compact_days`` into day buckets."""
+        cutoff = (datetime.utcnow() - timedelta(days=self.compact_days)).date().isoformat()
+        compacted: dict[str, Counter] = {}
+        for key, counter in summary.items():
+            if key[:10] < cutoff:
+                key = key[:10]
+            compacted.setdefault(key, Counter()).update(counter)
+        return compacted
+
+    def _load_summary(self) -> dict[str, Counter]:
+        if not self.summary_path.exists():
+            return {}
+        with self.summary_path.open() as f:
+            return {hour: Counter(c) for hour, c in json.load(f).items()}
+
+    def _count(self, data: bytes) -> None:
+        lines = (self._partial + data).split(b"\n")
+        # Keep a trailing partial line until its writer finishes it
+        self._partial = lines.pop()
+        text = [line.decode("utf-8", errors="replace") for line in lines]
+        with self._lock:
+            for row in csv.reader(text):
+                if len(row) != 2 or row == HEADER:
+                    continue
+                timestamp, event = row
+                self._hourly[timestamp[:13]][event] += 1
+                self._total[event] += 1
+
+    def _same_file(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino == os.fstat(self._reader.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _catch_up(self, locked: bool = False) -> None:
+        """Count lines appended to the live log since the last call.
+
+        After a rotation (by any worker) the summary is reloaded and the new
+        live file is read from the start; the file lock guarantees the two
+        are consistent. The lock is always taken before ``_read_lock``.
+        """
+        with self._read_lock:
+            if self._reader is not None:
+                self._count(self._reader.read())
+                if self._same_file():
+                    return
+        if not locked:
+            with self._file_lock():
+                self._catch_up(locked=True)
+            return
+        with self._read_lock:
+            if self._reader is not None:
+                if self._same_file():
+                    self._count(self._reader.read())
+                    return
+                self._reader.close()
+                self._reader = None
+            summary = self._load_summary()
+            with self._lock:
+                self._summary = summary
+                self._hourly = defaultdict(Counter)
+                self._total = sum(summary.values(), Counter())
+            self._partial = b""
+            try:
+                self._reader = open(self.path, "rb")
+            except FileNotFoundError:
+                return
+            self._count(self._reader.read())
+
+    def counts(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> dict[str, int]:
+        """Counts per event, optionally limited to the UTC hours in [start, end].
+
+        Naive datetimes are taken as UTC. Compacted days count when their
+        date is in range, so older ranges are only accurate to the day.
+        """
+        self.flush()
+        self._catch_up()
+        if start is None and end is None:
+            with self._lock:
+                return dict(self._total)
+        lo = _utc_hour(start) if start else ""
+        hi = _utc_hour(end) if end else "~"
+        result: Counter = Counter()
+        with self._lock:
+            for buckets in (self._summary, self._hourly):
+                for key, counter in buckets.items():
+                    if len(key) == 10:
+                        # A compacted day bucket
+                        if lo[:10] <= key <= hi[:10]:
+                            result.update(counter)
+                    elif lo <= key <= hi:
+                        result.update(counter)
+        return dict(result)
+
+
+def _utc_hour(moment: datetime) -> str:
+    """The ``YYYY-MM-DDTHH`` bucket key of a datetime, converted to UTC."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat()[:13]
+
+
+_logs: dict[Path, EventLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_log(file_path: Path = METRICS_FILE) -> EventLog:
+    with _logs_lock:
+        if file_path not in _logs:
+            _logs[file_path] = EventLog(file_path)
+        return _logs[file_path]
+
 
 def log_event(event: str, file_path: Path = METRICS_FILE) -> None:
-    new_file = not file_path.exists()
-    with file_path.open("a", newline="") as f:
-        writer = csv.writer(f)
-        if new_file:
-            writer.writerow(["timestamp", "event"])
-        writer.writerow([datetime.utcnow().isoformat(), event])
-
-def get_counts(file_path: Path = METRICS_FILE) -> dict[str, int]:
-    if not file_path.exists():
-        return {}
-    with file_path.open(newline="") as f:
-        reader = csv.DictReader(f)
-        counter = Counter(row["event"] for row in reader)
-    return dict(counter)
+    get_log(file_path).log(event)
+
+
+def get_counts(
+    file_path: Path = METRICS_FILE,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> dict[str, int]:
+    return get_log(file_path).counts(start, end)
+
+
+@atexit.register
+def _flush_all() -> None:
+    for log in list(_logs.values()):
+        try:
+            log.flush()
+        except Exception:
+            pass
@@ -0,0 +1,198 @@
+"""Salted scrypt password hashing for the /auth endpoints.
+
+Hashes are stored as ``scrypt$<n>$<r>$<p>$<salt>$<hash>`` (base64 salt and
+hash) so the cost can be raised later without breaking existing accounts.
+The cost comes from ``PASSWORD_SCRYPT_N`` (default ``16384``), ``_R`` (``8``)
+and ``_P`` (``1``); scrypt needs ``128 * n * r`` bytes of memory per hash.
+Unsalted SHA-256 hashes from before this module still verify, and
+:func:`verify` flags them, like hashes with an outdated cost, for rehashing.
+
+scrypt releases the GIL, so :func:`ahash` and :func:`averify` run it on a
+dedicated pool of ``PASSWORD_HASH_WORKERS`` threads (default: half the CPUs).
+Logins then use at most that many cores and never occupy the threadpool that
+serves other requests. Successful verifications are remembered for
+``PASSWORD_CACHE_TTL`` seconds (default ``300``, ``0`` disables), keyed by an
+HMAC with a per-process random key, so repeated logins skip the KDF.
+"""
+
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Cost:
+    n: int = 2 ** 14
+    r: int = 8
+    p: int = 1
+
+    @property
+    def maxmem(self) -> int:
+        # scrypt uses 128 * n * r * p bytes; leave headroom for OpenSSL
+        return 256 * self.n * self.r * self.p + 1024 * 1024
+
+
+def default_cost() -> Cost:
+    return Cost(
+        n=int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14))),
+        r=int(os.getenv("PASSWORD_SCRYPT_R", "8")),
+        p=int(os.getenv("PASSWORD_SCRYPT_P", "1")),
+    )
+
+
+COST = default_cost()
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _derive(password: str, salt: bytes, cost: Cost) -> bytes:
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=cost.n,
+        r=cost.r,
+        p=cost.p,
+        maxmem=cost.maxmem,
+        dklen=KEY_BYTES,
+    )
+
+
+def hash_password(password: str, cost: Cost | None = None) -> str:
+    cost = cost or COST
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _derive(password, salt, cost)
+    return f"scrypt${cost.n}${cost.r}${cost.p}${_b64(salt)}${_b64(key)}"
+
+
+def _legacy_hash(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def needs_rehash(stored: str) -> bool:
+    """True for legacy hashes and scrypt hashes made with another cost."""
+    if not stored.startswith("scrypt$"):
+        return True
+    try:
+        _, n, r, p, _, _ = stored.split("$")
+        return Cost(int(n), int(r), int(p)) != COST
+    except ValueError:
+        return True
+
+
+def verify(password: str, stored: str) -> tuple[bool, bool]:
+    """Return ``(matches, needs_rehash)`` for a stored hash."""
+    if not stored.startswith("scrypt$"):
+        return hmac.compare_digest(_legacy_hash(password), stored), True
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        cost = Cost(int(n), int(r), int(p))
+        salt = base64.b64decode(salt, validate=True)
+        key = base64.b64decode(key, validate=True)
+        # scrypt rejects parameters no hash_password call could have written
+        derived = _derive(password, salt, cost)
+    except ValueError:
+        return False, False
+    return hmac.compare_digest(derived, key), needs_rehash(stored)
+
+
+class VerifyCache:
+    """Bounded TTL memo of successful ``(password, stored hash)`` checks.
+
+    Keys are HMAC-SHA256 digests under a random per-process key, so the
+    memo never holds a value that could be checked offline.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._secret = secrets.token_bytes(32)
+        self._entries: OrderedDict[bytes, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, password: str, stored: str) -> bytes:
+        msg = stored.encode() + b"\0" + password.encode()
+        return hmac.new(self._secret, msg, hashlib.sha256).digest()
+
+    def check(self, password: str, stored: str) -> bool:
+        if self.ttl <= 0:
+            return False
+        key = self._key(password, stored)
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is not None and expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False
+
+    def add(self, password: str, stored: str) -> None:
+        if self.ttl <= 0:
+            return
+        key = self._key(password, stored)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="password-hash")
+verify_cache = VerifyCache(
+    max_entries=int(os.getenv("PASSWORD_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PASSWORD_CACHE_TTL", "300")),
+)
+
+
+@functools.cache
+def dummy_hash() -> str:
+    """Hash of a random password, made on first use rather than at import."""
+    return hash_password(secrets.token_hex(16))
+
+
+def _verify_dummy(password: str) -> None:
+    verify(password, dummy_hash())
+
+
+async def ahash(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_pool, hash_password, password)
+
+
+async def averify(password: str, stored: str) -> tuple[bool, bool]:
+    """:func:`verify` on the hashing pool, answered from the cache when possible."""
+    if verify_cache.check(password, stored):
+        return True, needs_rehash(stored)
+    matches, rehash = await asyncio.get_running_loop().run_in_executor(
+        _pool, verify, password, stored
+    )
+    if matches:
+        verify_cache.add(password, stored)
+    return matches, rehash
+
+
+async def averify_unknown(password: str) -> None:
+    """Pay for one verification on the hashing pool, as for a known account.
+
+    Used for unknown emails so their response time matches real ones.
+    """
+    await asyncio.get_running_loop().run_in_executor(_pool, _verify_dummy, password)
@@ -0,0 +1,165 @@
+"""QA pipeline components, built on first use.
+
+Importing LangChain, opening Chroma and building the embedding client and
+chat model take seconds, so the API does none of it at import time. Each
+component is built by its ``get_*`` function the first time it is needed,
+once per process even when several threads ask at the same time, and a
+missing ``OPENAI_API_KEY`` is reported then instead of crashing the import.
+:func:`warmup` builds everything ahead of the first request; the API runs it
+in the background at startup and reports :func:`ready` through ``/readyz``.
+"""
+
+import functools
+import os
+import threading
+import time
+from pathlib import Path
+
+import qa_cache
+import verse_store
+
+CHROMA_DIR = os.getenv("CHROMA_DIR", "veritas_ai_chroma_db")
+
+_ready = threading.Event()
+_error: str | None = None
+
+
+def once(fn):
+    """Call ``fn`` on first use and return its result from then on.
+
+    ``fn.loaded()`` tells whether it has been built.
+    """
+    lock = threading.Lock()
+    result = []
+
+    @functools.wraps(fn)
+    def get():
+        if not result:
+            with lock:
+                if not result:
+                    result.append(fn())
+        return result[0]
+
+    get.loaded = lambda: bool(result)
+    return get
+
+
+def _require_api_key(provider_var: str) -> None:
+    if os.getenv(provider_var, "openai") == "openai" and not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError(
+            "OPENAI_API_KEY environment variable not set. Please provide your OpenAI API key."
+        )
+
+
+@once
+def get_answer_cache():
+    """QA answer cache (SQLite by default, see qa_cache.make_cache)"""
+    return qa_cache.make_cache()
+
+
+@once
+def get_embeddings():
+    # Query embeddings are memoized in memory and, if EMBEDDING_CACHE_PATH is
+    # set, on disk; EMBEDDING_PROVIDER=local swaps OpenAI for a CPU model
+    _require_api_key("EMBEDDING_PROVIDER")
+    from embedding import CachedEmbeddings, make_embeddings
+
+    return CachedEmbeddings(
+        make_embeddings(),
+        max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+        path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+        max_disk_entries=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000")),
+    )
+
+
+@once
+def get_vectorstore():
+    """Chroma, or the NumPy index with VECTOR_BACKEND=numpy"""
+    from vector_index import make_vectorstore
+
+    return make_vectorstore(get_embeddings(), CHROMA_DIR)
+
+
+@once
+def get_keyword_index():
+    """Keyword index written by build_db.py, fused with vector search when present"""
+    from keyword_index import BM25Index, INDEX_FILENAME
+
+    path = Path(CHROMA_DIR) / INDEX_FILENAME
+    if os.getenv("HYBRID_RETRIEVAL", "1") == "1" and path.exists():
+        return BM25Index.load(path)
+    return None
+
+
+@once
+def get_semantic_cache():
+    """Reuse answers for paraphrased questions (None when disabled)"""
+    threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    if threshold <= 0:
+        return None
+    from semantic_cache import SemanticCache
+
+    cache = get_answer_cache()
+    return SemanticCache(
+        get_embeddings(),
+        threshold=threshold,
+        # The socket cache has no file to share; SEMANTIC_CACHE_PATH gives
+        # the paraphrase index one so all workers still see each other's answers
+        path=os.getenv("SEMANTIC_CACHE_PATH") or getattr(cache, "path", None),
+        max_entries=cache.max_entries,
+    )
+
+
+@once
+def get_llm():
+    """The chat model (gpt-4-turbo unless LLM_PROVIDER=fake)"""
+    _require_api_key("LLM_PROVIDER")
+    from chat_model import make_llm
+
+    return make_llm()
+
+
+@once
+def get_chains():
+    """Retrievers and QA chains for every source mode"""
+    from chains import ChainRegistry
+
+    return ChainRegistry(
+        get_vectorstore(),
+        get_llm(),
+        k=int(os.getenv("RETRIEVER_K", "8")),
+        keyword_index=get_keyword_index(),
+    )
+
+
+def warmup() -> float:
+    """Build every component and load the verse index; return the seconds taken.
+
+    Safe to call repeatedly and from several threads; failures are recorded
+    for :func:`error` and re-raised.
+    """
+    global _error
+    start = time.perf_counter()
+    try:
+        get_chains()
+        get_semantic_cache()
+        verse_store.get_store()
+        # Load the tokenizer (a download on first use) before any request needs it
+        import telemetry
+
+        telemetry.encoding(telemetry.DEFAULT_MODEL)
+    except Exception as e:
+        _error = str(e)
+        raise
+    _error = None
+    _ready.set()
+    return time.perf_counter() - start
+
+
+def ready() -> bool:
+    return _ready.is_set()
+
+
+def error() -> str | None:
+    """Why the last warmup failed, if it did."""
+    return _error
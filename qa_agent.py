@@ -1,53 +1,206 @@
+import argparse
+import asyncio
+import json
+import math
 import os
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
-from langchain.chains import RetrievalQA
-from templates import veritas_prompt
-
-# 1) Read API key
-api_key = os.getenv("OPENAI_API_KEY")
-
-# 2) Load your Chroma vector store
-vectorstore = Chroma(
-    persist_directory="veritas_ai_chroma_db",
-    embedding_function=OpenAIEmbeddings(openai_api_key=api_key)
-)
-
-# 3) Build retriever
-retriever = vectorstore.as_retriever(search_kwargs={"k": 8})
-
-# 4) Initialize the Chat model
-llm = ChatOpenAI(
-    model_name="gpt-4-turbo",
-    temperature=0.0,
-    openai_api_key=api_key
-)
-
-# 5) Build the RetrievalQA chain with custom prompt
-qa_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    chain_type="stuff",
-    retriever=retriever,
-    return_source_documents=True,
-    chain_type_kwargs={"prompt": veritas_prompt}
-)
-
-def answer_query(query: str):
-    # Fetch answer
-    res = qa_chain.invoke({"query": query})
-    # Print Answer header with spacing
-    print("=== Answer ===\n")
-    # Print the generated answer
-    print(res["result"].strip())
-    # Print each source bullet
-    for line in res["result"].splitlines():
-        if line.strip().startswith("-"):
-            print(line)
+import sys
+import time
 
-if __name__ == "__main__":
-    print("Veritas AI QA Agent. Ask away!\n")
+import answering
+import pipeline
+from telemetry import StageTimer
+
+MODES = ["bible", "both", "catechism"]
+# Columns of the --bench report, in pipeline order
+STAGES = [
+    "cache_lookup", "retrieval", "prompt", "first_token", "llm", "parse", "cache_write", "total",
+]
+
+async def answer_query(mode: str, question: str, use_cache: bool = True, echo: bool = True) -> dict:
+    """Answer one question exactly like POST /qa/stream; return its timings"""
+    timer = StageTimer(mode)
+    start = time.perf_counter()
+    # 1) Look the question up in the shared QA cache (exact, then similar)
+    cached, vector, result = None, None, "off"
+    if use_cache:
+        with timer.time("cache_lookup"):
+            cached, vector, result = await answering.lookup(mode, question)
+    if echo:
+        print("=== Answer ===\n")
+
+    first_token, text = None, ""
+    if cached:
+        resp = cached
+        if echo:
+            print(resp["answer"])
+    else:
+        # 2) Retrieve, then stream the answer tokens as they arrive
+        async for event, data in answering.stream_answer(mode, question, timer):
+            if event == "token":
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                text += data["text"]
+                if echo:
+                    print(data["text"], end="", flush=True)
+            elif event == "done":
+                resp = data
+        if echo and not text.endswith("\n"):
+            print()
+        # 3) Store it for the API and later sessions
+        if use_cache:
+            with timer.time("cache_write"):
+                await asyncio.to_thread(answering.save_answer, mode, question, resp, vector)
+
+    if echo:
+        if resp["sources"]:
+            print(f"\n{answering.SOURCES_MARKER}")
+            for source in resp["sources"]:
+                print(f"- {source}")
+        print()
+    return {
+        "cache": result,
+        "tokens": timer.tokens,
+        **timer.stages,
+        "first_token": first_token,
+        "total": time.perf_counter() - start,
+    }
+
+def read_questions(path: str, mode: str) -> list[dict]:
+    """One question per line, or JSON lines with ``question`` and ``mode``"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                questions.append({"question": item["question"], "mode": item.get("mode", mode)})
+            else:
+                questions.append({"question": line, "mode": mode})
+    return questions
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+async def run_bench(args):
+    """Replay a file of questions and print per-stage timings"""
+    questions = read_questions(args.bench, args.mode)
+    results = []
+    print(f"{'#':>4} {'mode':<10}{'cache':<9}{'first ms':>9}{'total ms':>9}{'tokens':>7}  question")
+    for i, item in enumerate(questions):
+        stats = await answer_query(
+            item["mode"], item["question"], use_cache=not args.no_cache, echo=False
+        )
+        results.append(stats)
+        first = f"{stats['first_token'] * 1000:.0f}" if stats["first_token"] else "-"
+        print(
+            f"{i:>4} {item['mode']:<10}{stats['cache']:<9}{first:>9}"
+            f"{stats['total'] * 1000:>9.0f}{stats['tokens']:>7}  {item['question'][:60]}"
+        )
+    if not results:
+        return
+
+    print(f"\n{'stage':<14}{'n':>5}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage in STAGES:
+        values = sorted(r[stage] for r in results if r.get(stage) is not None)
+        if not values:
+            continue
+        print(
+            f"{stage:<14}{len(values):>5}{sum(values) / len(values) * 1000:>10.1f}"
+            f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+        )
+    hits = sum(r["cache"] in ("exact", "semantic") for r in results)
+    print(f"\n{hits}/{len(results)} cache hits, {sum(r['tokens'] for r in results)} LLM tokens")
+
+async def interactive(args):
+    mode = args.mode
+    print(f"Veritas AI QA Agent ({mode}). Ask away! /mode <{'|'.join(MODES)}> switches sources.\n")
     while True:
-        q = input("Question: ")
+        q = (await asyncio.to_thread(input, "Question: ")).strip()
         if q.lower() in ("exit", "quit"):
             break
-        answer_query(q)
+        if q.startswith("/mode"):
+            choice = q[len("/mode"):].strip()
+            if choice in MODES:
+                mode = choice
+            print(f"Mode: {mode}\n")
+            continue
+        if q:
+            await answer_query(mode, q, use_cache=not args.no_cache)
+
+def run_batch(args):
+    """Answer a file of questions through POST /qa/batch, writing NDJSON"""
+    import requests
+
+    password = os.getenv("ADMIN_PASSWORD")
+    if not password:
+        sys.exit("Set ADMIN_PASSWORD to use the batch endpoint")
+    questions = read_questions(args.batch, args.mode)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    done = cached = errors = 0
+    start = time.perf_counter()
+    with requests.Session() as session:
+        session.auth = ("admin", password)
+        for offset in range(0, len(questions), args.chunk_size):
+            chunk = questions[offset:offset + args.chunk_size]
+            with session.post(
+                f"{args.url.rstrip('/')}/qa/batch",
+                json={"requests": chunk},
+                stream=True,
+                timeout=(10, None),
+            ) as r:
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    # Indexes refer to the whole file, not the chunk
+                    result["index"] += offset
+                    out.write(json.dumps(result) + "\n")
+                    done += 1
+                    cached += bool(result.get("cached"))
+                    errors += "error" in result
+            print(
+                f"{done}/{len(questions)} answered ({cached} cached, {errors} errors) "
+                f"in {time.perf_counter() - start:.0f}s",
+                file=sys.stderr,
+            )
+    if out is not sys.stdout:
+        out.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Veritas AI QA agent. Answers with the API's pipeline and QA cache."
+    )
+    parser.add_argument("--mode", default="both", choices=MODES)
+    parser.add_argument(
+        "--no-cache", action="store_true", help="always generate (e.g. when tuning prompts)"
+    )
+    parser.add_argument(
+        "--bench", metavar="FILE", help="replay the questions in FILE and print stage timings"
+    )
+    parser.add_argument("--batch", metavar="FILE", help="answer every question in FILE via the API")
+    parser.add_argument("--url", default=os.getenv("QA_API_URL", "http://localhost:8000"))
+    parser.add_argument("--out", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="questions per request")
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch(args)
+        return
+
+    # Build the retrievers, chains and caches up front, as the API's warmup does
+    try:
+        seconds = pipeline.warmup()
+    except RuntimeError as e:
+        sys.exit(str(e))
+    if args.bench:
+        print(f"Pipeline ready in {seconds:.1f}s\n")
+        asyncio.run(run_bench(args))
+    else:
+        asyncio.run(interactive(args))
+
+if __name__ == "__main__":
+    main()
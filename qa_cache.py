@@ -0,0 +1,424 @@
+"""Bounded key/value store for cached QA answers.
+
+Three backends share the same small interface (``get``/``set``/``delete``/
+``clear``/``stats``):
+
+- ``SQLiteCache`` keeps entries in a WAL-mode SQLite file, so every write
+  touches one row and several uvicorn workers can share the file safely.
+- ``MemoryCache`` keeps entries in a per-process LRU dict.
+- ``SocketCache`` talks to a ``cache_server.py`` process over a Unix socket,
+  so all workers on a host share one in-memory cache; a small near cache in
+  each worker is kept coherent by the server's invalidation broadcasts.
+
+The memory and SQLite backends evict the least recently used entries beyond
+``max_entries`` and treat entries older than ``ttl`` seconds as missing
+(``ttl=0`` disables expiry); with the socket backend the server's cache does
+this, configured by ``cache_server.py``'s flags.
+Use :func:`make_cache` to build the backend configured by the environment.
+"""
+
+import json
+import os
+import re
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+LEGACY_CACHE_FILE = Path("qa_cache.json")
+
+_SPACE_RE = re.compile(r"\s+")
+_TRAILING_RE = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    question = _SPACE_RE.sub(" ", question.strip().lower())
+    return _TRAILING_RE.sub("", question)
+
+
+def cache_key(mode: str, question: str) -> str:
+    return f"{mode}|{normalize_question(question)}"
+
+
+class CacheBackend:
+    """Interface shared by the QA cache backends."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> dict | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: dict) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss/eviction counters for this process and the entry count."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
+
+    def expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - created_at > self.ttl
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 0):
+        super().__init__(max_entries, ttl)
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or self.expired(item[0], time.time()):
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """LRU cache stored in a WAL-mode SQLite database.
+
+    Each thread gets its own connection. Access times are refreshed at most
+    every ``touch_interval`` seconds so that hits rarely write.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "qa_cache.db",
+        max_entries: int = 10000,
+        ttl: float = 0,
+        touch_interval: float = 60,
+    ):
+        super().__init__(max_entries, ttl)
+        self.path = str(path)
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS qa_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS qa_cache_accessed"
+                " ON qa_cache (accessed_at)"
+            )
+        self._count = self._query_count()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _query_count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM qa_cache").fetchone()[0]
+
+    def get(self, key: str) -> dict | None:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, created_at, accessed_at FROM qa_cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+        now = time.time()
+        if row is None or self.expired(row[1], now):
+            if row is not None:
+                self.delete(key)
+            self.misses += 1
+            return None
+        if now - row[2] > self.touch_interval:
+            with conn:
+                conn.execute(
+                    "UPDATE qa_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict) -> None:
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO qa_cache (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+        self._count += 1
+        # Other workers write to the same file, so recount before evicting
+        # rather than trusting the local estimate.
+        if self._count > self.max_entries:
+            self._count = self._query_count()
+            if self._count > self.max_entries:
+                self._evict(conn, self._count - self.max_entries)
+
+    def _evict(self, conn: sqlite3.Connection, excess: int) -> None:
+        # Evict a little extra so the next few writes don't each trigger it
+        excess += max(1, self.max_entries // 100)
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM qa_cache WHERE key IN ("
+                " SELECT key FROM qa_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+        self.evictions += cur.rowcount
+        self._count -= cur.rowcount
+
+    def delete(self, key: str) -> None:
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("DELETE FROM qa_cache WHERE key = ?", (key,))
+        self._count -= cur.rowcount
+
+    def clear(self) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM qa_cache")
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._query_count()
+
+    def import_json(self, file_path: Path = LEGACY_CACHE_FILE) -> int:
+        """Copy entries from the old ``qa_cache.json`` file, if present.
+
+        Its ``mode|question`` keys are rebuilt with :func:`cache_key`, so the
+        answers are found by exact lookups. Existing keys are left untouched.
+        Returns the number of entries read.
+        """
+        if not file_path.exists():
+            return 0
+        try:
+            with file_path.open("r") as f:
+                legacy = json.load(f)
+        except Exception:
+            return 0
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO qa_cache (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (cache_key(*k.split("|", 1)) if "|" in k else k, json.dumps(v), now, now)
+                    for k, v in legacy.items()
+                ],
+            )
+        self._count = self._query_count()
+        return len(legacy)
+
+
+class SocketCache(CacheBackend):
+    """Client of the shared ``cache_server.py`` process.
+
+    Each thread keeps its own connection. Up to ``near_entries`` recent
+    answers are also kept in this process and served without a round trip
+    while the invalidation subscription is up; when it drops, the near
+    cache is emptied and bypassed until it reconnects. If the server is
+    unreachable, lookups miss and writes are dropped.
+    """
+
+    def __init__(
+        self,
+        socket_path: str | Path = "qa_cache.sock",
+        max_entries: int = 10000,
+        ttl: float = 0,
+        near_entries: int = 1000,
+        timeout: float = 1.0,
+    ):
+        super().__init__(max_entries, ttl)
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self.origin = f"{os.getpid()}-{secrets.token_hex(4)}"
+        self.near = MemoryCache(near_entries, ttl) if near_entries > 0 else None
+        self._local = threading.local()
+        self._subscribed = threading.Event()
+        # Bumped on every invalidation, so a get racing one does not store
+        # the value it read in the near cache
+        self._generation = 0
+        self._warned_at = 0.0
+        if self.near is not None:
+            threading.Thread(
+                target=self._listen, name="qa-cache-invalidations", daemon=True
+            ).start()
+
+    def _connect(self) -> tuple[socket.socket, object]:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock, sock.makefile("rb")
+
+    def _call(self, request: dict) -> dict | None:
+        """Send one request; None if the server cannot be reached."""
+        for _ in range(2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None:
+                    conn = self._local.conn = self._connect()
+                sock, reader = conn
+                sock.sendall(json.dumps(request).encode() + b"\n")
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("cache server closed the connection")
+                return json.loads(line)
+            except (OSError, ValueError) as e:
+                # Retry once on a fresh connection (the server may have restarted)
+                self._local.conn = None
+                if conn is not None:
+                    conn[0].close()
+                error = e
+        if time.monotonic() - self._warned_at > 60:
+            self._warned_at = time.monotonic()
+            print(f"QA cache server unavailable at {self.socket_path}: {error}")
+        return None
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                sock, reader = self._connect()
+                sock.settimeout(None)
+                sock.sendall(
+                    json.dumps({"op": "subscribe", "origin": self.origin}).encode() + b"\n"
+                )
+                reader.readline()
+                self.near.clear()
+                self._subscribed.set()
+                for line in reader:
+                    key = json.loads(line).get("invalidate")
+                    self._generation += 1
+                    if key is None:
+                        self.near.clear()
+                    else:
+                        self.near.delete(key)
+            except (OSError, ValueError):
+                pass
+            self._subscribed.clear()
+            self.near.clear()
+            time.sleep(1)
+
+    def _near(self) -> MemoryCache | None:
+        return self.near if self.near is not None and self._subscribed.is_set() else None
+
+    def get(self, key: str) -> dict | None:
+        near = self._near()
+        if near is not None:
+            value = near.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+        generation = self._generation
+        reply = self._call({"op": "get", "key": key})
+        value = reply.get("value") if reply else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if near is not None and generation == self._generation:
+            near.set(key, value)
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        self._call({"op": "set", "key": key, "value": value, "origin": self.origin})
+        near = self._near()
+        if near is not None:
+            near.set(key, value)
+
+    def delete(self, key: str) -> None:
+        if self.near is not None:
+            self.near.delete(key)
+        self._call({"op": "delete", "key": key, "origin": self.origin})
+
+    def clear(self) -> None:
+        if self.near is not None:
+            self.near.clear()
+        self._call({"op": "clear", "origin": self.origin})
+
+    def __len__(self) -> int:
+        reply = self._call({"op": "len"})
+        return reply.get("value", 0) if reply else 0
+
+
+def make_cache() -> CacheBackend:
+    """Build the QA cache backend configured by the environment.
+
+    ``QA_CACHE_BACKEND`` selects ``sqlite`` (default), ``memory`` or
+    ``socket``; ``QA_CACHE_PATH``, ``QA_CACHE_MAX_ENTRIES`` and
+    ``QA_CACHE_TTL_SECONDS`` tune it, and ``QA_CACHE_SOCKET`` and
+    ``QA_CACHE_NEAR_ENTRIES`` the socket client. A new SQLite cache imports
+    the legacy ``qa_cache.json`` once.
+    """
+    backend = os.getenv("QA_CACHE_BACKEND", "sqlite")
+    max_entries = int(os.getenv("QA_CACHE_MAX_ENTRIES", "10000"))
+    ttl = float(os.getenv("QA_CACHE_TTL_SECONDS", "0"))
+    if backend == "memory":
+        return MemoryCache(max_entries=max_entries, ttl=ttl)
+    if backend == "socket":
+        return SocketCache(
+            os.getenv("QA_CACHE_SOCKET", "qa_cache.sock"),
+            max_entries=max_entries,
+            ttl=ttl,
+            near_entries=int(os.getenv("QA_CACHE_NEAR_ENTRIES", "1000")),
+        )
+    if backend != "sqlite":
+        raise RuntimeError(f"Unknown QA_CACHE_BACKEND: {backend}")
+    cache = SQLiteCache(
+        os.getenv("QA_CACHE_PATH", "qa_cache.db"), max_entries=max_entries, ttl=ttl
+    )
+    if len(cache) == 0:
+        cache.import_json()
+    return cache
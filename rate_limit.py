@@ -0,0 +1,222 @@
+"""Token-bucket rate limits and daily LLM token budgets.
+
+A limiter refills each key's bucket at ``per_minute / 60`` tokens a second up
+to ``per_minute`` tokens, so clients can burst a minute's allowance and then
+settle at the steady rate. :meth:`Limiter.take` returns 0 when the request
+is allowed and otherwise the seconds to wait, which becomes ``Retry-After``.
+
+Two backends share that interface:
+
+- ``MemoryLimiter`` keeps buckets in a per-process dict (each uvicorn worker
+  enforces its own limit).
+- ``SQLiteLimiter`` keeps them in a WAL-mode SQLite file, so all workers on
+  a host share one limit; each check is a single-row transaction.
+
+:class:`DailyTokenBudget` counts LLM tokens per key and UTC day with the
+same choice of backend. Use :func:`make_limiter` and :func:`make_budget`
+to build them from the environment.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+def seconds_until_midnight() -> float:
+    now = datetime.utcnow()
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+class _SQLite:
+    """Per-thread WAL connections to one database file."""
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode so BEGIN IMMEDIATE can be issued explicitly
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class Limiter:
+    """Token bucket per key: ``per_minute`` capacity, refilled continuously."""
+
+    def __init__(self, name: str, per_minute: float):
+        self.name = name
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def _decide(self, tokens: float, cost: float) -> tuple[float, float]:
+        """Return the tokens left and the wait (0 when allowed)."""
+        if tokens >= cost:
+            self.allowed += 1
+            return tokens - cost, 0.0
+        self.limited += 1
+        return tokens, (cost - tokens) / self.rate
+
+    def take(self, key: str, cost: float = 1) -> float:
+        raise NotImplementedError
+
+    def stats(self) -> dict[str, int]:
+        return {"allowed": self.allowed, "limited": self.limited}
+
+
+class MemoryLimiter(Limiter):
+    def __init__(self, name: str, per_minute: float, max_keys: int = 100000):
+        super().__init__(name, per_minute)
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float = 1) -> float:
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens, wait = self._decide(self._refill(tokens, updated, now), cost)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Forgotten keys restart with a full bucket, which is harmless
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class SQLiteLimiter(Limiter, _SQLite):
+    def __init__(self, name: str, per_minute: float, path: str | Path = "rate_limits.db"):
+        Limiter.__init__(self, name, per_minute)
+        _SQLite.__init__(self, path)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def take(self, key: str, cost: float = 1) -> float:
+        if not self.enabled:
+            return 0.0
+        key = f"{self.name}|{key}"
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = self._refill(*row, now) if row else self.capacity
+            tokens, wait = self._decide(tokens, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated)"
+                " VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class DailyTokenBudget:
+    """LLM tokens allowed per key and UTC day (``limit=0`` disables it)."""
+
+    def __init__(self, limit: int, path: str | Path | None = None):
+        self.limit = limit
+        self.exhausted = 0
+        self._db = _SQLite(path) if path is not None else None
+        self._usage: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        # Last day this process deleted older rows from the table
+        self._pruned_day = ""
+        if self._db is not None:
+            self._db._conn().execute(
+                "CREATE TABLE IF NOT EXISTS token_usage ("
+                " key TEXT NOT NULL, day TEXT NOT NULL, tokens INTEGER NOT NULL,"
+                " PRIMARY KEY (key, day))"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    def used(self, key: str) -> int:
+        day = datetime.utcnow().date().isoformat()
+        if self._db is None:
+            return self._usage.get((key, day), 0)
+        row = self._db._conn().execute(
+            "SELECT tokens FROM token_usage WHERE key = ? AND day = ?", (key, day)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def check(self, key: str) -> float:
+        """0 if ``key`` has budget left today, else seconds until it resets."""
+        if not self.enabled or self.used(key) < self.limit:
+            return 0.0
+        self.exhausted += 1
+        return seconds_until_midnight()
+
+    def add(self, key: str, tokens: int) -> None:
+        if not self.enabled or tokens <= 0:
+            return
+        day = datetime.utcnow().date().isoformat()
+        if self._db is None:
+            with self._lock:
+                # Drop previous days so the dict only holds today's usage
+                if any(d != day for _, d in self._usage):
+                    self._usage = {k: v for k, v in self._usage.items() if k[1] == day}
+                self._usage[(key, day)] = self._usage.get((key, day), 0) + tokens
+            return
+        conn = self._db._conn()
+        if self._pruned_day != day:
+            # Only today's rows are ever read; drop the rest once a day
+            self._pruned_day = day
+            conn.execute("DELETE FROM token_usage WHERE day < ?", (day,))
+        conn.execute(
+            "INSERT INTO token_usage (key, day, tokens) VALUES (?, ?, ?)"
+            " ON CONFLICT (key, day) DO UPDATE SET tokens = tokens + excluded.tokens",
+            (key, day, tokens),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {"exhausted": self.exhausted}
+
+
+def _backend() -> tuple[str, str]:
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    if backend not in ("memory", "sqlite"):
+        raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return backend, os.getenv("RATE_LIMIT_PATH", "rate_limits.db")
+
+
+def make_limiter(name: str, per_minute: float) -> Limiter:
+    """Limiter on the backend selected by ``RATE_LIMIT_BACKEND``."""
+    backend, path = _backend()
+    if backend == "sqlite":
+        return SQLiteLimiter(name, per_minute, path)
+    return MemoryLimiter(name, per_minute)
+
+
+def make_budget(limit: int) -> DailyTokenBudget:
+    backend, path = _backend()
+    return DailyTokenBudget(limit, path if backend == "sqlite" else None)
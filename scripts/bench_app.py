@@ -0,0 +1,331 @@
+"""Load-test the FastAPI app offline and report latency percentiles.
+
+Boots ``app.py`` in-process with the fake chat model and fake embeddings
+(``LLM_PROVIDER=fake``, ``EMBEDDING_PROVIDER=fake``) against a small fixture
+Chroma store built in a temp directory, then drives it through
+``httpx.ASGITransport`` with ``--concurrency`` requests in flight. Every
+scenario reports p50/p95/p99 latency and requests per second. The server's
+working files (users, caches, metrics) live in the temp directory too.
+
+Worker startup is measured first, in fresh interpreters: ``startup_import``
+is the time to import ``app.py`` and ``startup_ready`` the time until the
+warmed-up pipeline is ready (``--startup-runs`` samples each).
+
+    python scripts/bench_app.py --requests 200 --concurrency 16
+    python scripts/bench_app.py --json after.json --baseline before.json
+
+With ``--baseline`` the script exits with status 1 if any scenario's p95 is
+more than ``--tolerance`` (default 25%) slower than in the baseline file.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+from langchain_chroma import Chroma
+
+import build_db
+import ccc_parser
+from embedding import make_embeddings
+from keyword_index import BM25Index, INDEX_FILENAME
+from verse_store import VerseStore
+
+MODES = ("bible", "both", "catechism")
+
+# Chapters used by /verse-of-the-day, filled with synthetic verses
+FIXTURE_CHAPTERS = [
+    ("Matthew", 5), ("John", 3), ("Psalms", 23), ("Romans", 8),
+    ("1 Corinthians", 13), ("Philippians", 4), ("Isaiah", 40), ("Proverbs", 3),
+    ("Matthew", 6), ("James", 1), ("Ephesians", 2), ("Hebrews", 11),
+    ("Jeremiah", 29), ("Matthew", 11), ("John", 14),
+]
+
+
+def fixture_bible(words: list[str], rng: random.Random) -> dict:
+    bible: dict = {}
+    for book, chapter in FIXTURE_CHAPTERS:
+        verses = bible.setdefault(book, {}).setdefault(str(chapter), {})
+        for verse in range(1, 41):
+            verses[str(verse)] = " ".join(rng.choices(words, k=20)).capitalize() + "."
+    return bible
+
+
+def build_fixture(directory: Path, paragraphs: int, seed: int) -> list[str]:
+    """Write a fixture Bible and Chroma store; return the vocabulary used."""
+    rng = random.Random(seed)
+    with open(ROOT / "ccc.json", encoding="utf-8") as f:
+        ccc = list(ccc_parser.iter_paragraphs(json.load(f)))
+    ccc = rng.sample(ccc, min(paragraphs, len(ccc)))
+    words = sorted({w for p in ccc for w in p["text"].split() if w.isalpha()})
+
+    bible = fixture_bible(words, rng)
+    with open(directory / "EntireBible-DR.json", "w", encoding="utf-8") as f:
+        json.dump(bible, f)
+
+    entries = [
+        {"source": "Bible", "reference": f"{book} {chap}:{verse}", "text": text}
+        for book, chap, verse, text in VerseStore(bible)
+    ] + [
+        {"source": "CCC", "reference": f"CCC {p['number']}", "text": p["text"]}
+        for p in ccc
+    ]
+    chunks = build_db.split_entries(entries)
+    embeddings = make_embeddings("fake")
+    chroma_dir = directory / "chroma"
+    db = Chroma(persist_directory=str(chroma_dir), embedding_function=embeddings)
+    build_db.sync_chunks(db, chunks, embeddings, batch_size=1000, workers=1)
+    BM25Index.from_chunks(chunks).save(chroma_dir / INDEX_FILENAME)
+    return words
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        "requests": n,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": n / elapsed if elapsed else 0.0,
+    }
+
+
+# Run in a fresh interpreter: prints import and ready times in seconds
+STARTUP_PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.pipeline.warmup()
+print(json.dumps([imported - start, time.perf_counter() - start]))
+"""
+
+
+def measure_startup(runs: int) -> dict:
+    """Time ``runs`` cold worker starts; return the two startup scenarios."""
+    imports, readies = [], []
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        imported, ready = json.loads(out.strip().splitlines()[-1])
+        imports.append(imported)
+        readies.append(ready)
+    return {
+        "startup_import": summarize(imports, 0.0),
+        "startup_ready": summarize(readies, 0.0),
+    }
+
+
+def print_result(name: str, r: dict) -> None:
+    print(
+        f"{name:<24}{r['requests']:>6}{r['errors']:>7}{r['p50_ms']:>10.1f}"
+        f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['rps']:>10.1f}"
+    )
+
+
+async def run_scenario(client, make_request, n: int, concurrency: int, before=None):
+    """Send ``n`` requests, ``concurrency`` at a time; return the summary."""
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(n))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            if before is not None:
+                before()
+            method, url, body = make_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def scenarios(app_module, words: list[str], seed: int):
+    """Yield ``(name, make_request, before, warmup)`` for every scenario."""
+    rng = random.Random(seed)
+
+    def question() -> str:
+        # Random words, so paraphrase matching does not turn misses into hits
+        return " ".join(rng.choices(words, k=8)) + "?"
+
+    for mode in MODES:
+        def cold(i, mode=mode):
+            return "POST", "/qa", {"question": question(), "mode": mode}
+
+        yield f"qa_cold_{mode}", cold, None, None
+
+    # Bursts of identical cold questions, as when a question trends
+    burst: dict[int, str] = {}
+
+    def stampede(i):
+        return "POST", "/qa", {"question": burst.setdefault(i // 16, question())}
+
+    yield "qa_burst", stampede, None, None
+
+    for mode in MODES:
+        hot = [question() for _ in range(20)]
+
+        def warm(i, mode=mode, hot=hot):
+            return "POST", "/qa", {"question": hot[i % len(hot)], "mode": mode}
+
+        yield f"qa_warm_{mode}", warm, None, len(hot)
+
+    verse = ("GET", "/verse-of-the-day", None)
+
+    def forget_verse():
+        app_module.verse_of_day_cache.clear()
+        app_module.verse_calendar.prune(date.max)
+
+    yield "verse_of_the_day_cold", lambda i: verse, forget_verse, None
+    yield (
+        "verse_of_the_day_calendar",
+        lambda i: verse,
+        app_module.verse_of_day_cache.clear,
+        1,
+    )
+    yield "verse_of_the_day_warm", lambda i: verse, None, 1
+
+    credentials = {"email": "bench@example.com", "password": "correct horse battery"}
+    yield "auth_signin", lambda i: ("POST", "/auth/signin", credentials), None, None
+    yield "log_event", lambda i: ("POST", "/log_event", {"event": "popup_shown"}), None, None
+    yield (
+        "subscribe",
+        lambda i: ("POST", "/subscribe", {"email": f"bench{i}-{rng.random()}@example.com"}),
+        None,
+        None,
+    )
+
+
+async def bench(args, words: list[str]) -> dict:
+    import app as app_module
+
+    # ASGITransport does not run startup events, so warm up explicitly
+    await asyncio.to_thread(app_module.pipeline.warmup)
+    results = {}
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        await client.post("/auth/signup", json={
+            "email": "bench@example.com", "password": "correct horse battery"
+        })
+        for name, make_request, before, warmup in scenarios(app_module, words, args.seed):
+            if args.only and name not in args.only:
+                continue
+            if warmup:
+                await run_scenario(client, make_request, warmup, 1)
+            results[name] = await run_scenario(
+                client, make_request, args.requests, args.concurrency, before
+            )
+            print_result(name, results[name])
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, r in results.items():
+        before = baseline.get(name)
+        if before and r["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.1f} ms -> {r['p95_ms']:.1f} ms"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per answer")
+    parser.add_argument("--llm-tokens", type=int, default=200, help="words per answer")
+    parser.add_argument("--embedding-latency", type=float, default=0.005)
+    parser.add_argument("--paragraphs", type=int, default=300, help="CCC paragraphs in the fixture")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup-runs", type=int, default=3, help="0 skips startup timing")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        words = build_fixture(tmp, args.paragraphs, args.seed)
+        os.environ.update({
+            "LLM_PROVIDER": "fake",
+            "EMBEDDING_PROVIDER": "fake",
+            "FAKE_LLM_LATENCY": str(args.llm_latency),
+            "FAKE_LLM_TOKENS": str(args.llm_tokens),
+            "FAKE_EMBEDDING_LATENCY": str(args.embedding_latency),
+            "CHROMA_DIR": str(tmp / "chroma"),
+            # Every simulated request comes from one client; measure the
+            # pipeline, not the rate limiter
+            "RATE_LIMIT_REQUESTS_PER_MINUTE": "0",
+            "RATE_LIMIT_LLM_PER_MINUTE": "0",
+            "DAILY_TOKEN_BUDGET": "0",
+        })
+        for name in (
+            "MAILCHIMP_API_KEY", "SUBSCRIBERS_DB_PATH", "QA_CACHE_PATH", "EMBEDDING_CACHE_PATH"
+        ):
+            os.environ.pop(name, None)
+        # Users, caches and metrics are written relative to the working dir
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            print(
+                f"\n{'scenario':<24}{'reqs':>6}{'errors':>7}{'p50 ms':>10}"
+                f"{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+            )
+            results = {}
+            if args.startup_runs:
+                for name, r in measure_startup(args.startup_runs).items():
+                    if not args.only or name in args.only:
+                        results[name] = r
+                        print_result(name, r)
+            results.update(asyncio.run(bench(args, words)))
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark the QA cache backends with one and several worker processes.
+
+Each worker process replays the same kind of traffic as the API: questions
+drawn from a Zipf distribution are looked up, and a miss is "answered" and
+stored. With the ``memory`` backend every worker has its own cache, so its
+hit rate drops as workers are added; ``sqlite`` and ``socket`` (a
+``cache_server.py`` subprocess with a near cache in each worker) share one
+cache between them. For each backend and worker count the script reports
+the overall hit rate, get latency percentiles and cache operations/sec.
+
+    python scripts/bench_cache.py --workers 1 4 --ops 20000 --keys 5000
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from qa_cache import MemoryCache, SocketCache, SQLiteCache
+
+BACKENDS = ["memory", "sqlite", "socket"]
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def make_backend(backend: str, tmp: Path, max_entries: int):
+    if backend == "sqlite":
+        return SQLiteCache(tmp / "qa_cache.db", max_entries=max_entries)
+    if backend == "socket":
+        cache = SocketCache(tmp / "qa_cache.sock", max_entries=max_entries)
+        # Let the invalidation subscription come up so the near cache is used
+        cache._subscribed.wait(5)
+        return cache
+    return MemoryCache(max_entries=max_entries)
+
+
+def worker(backend: str, tmp: Path, args, seed: int, results) -> None:
+    cache = make_backend(backend, tmp, args.max_entries)
+    rng = random.Random(seed)
+    weights = [1 / rank ** args.zipf for rank in range(1, args.keys + 1)]
+    keys = rng.choices(range(args.keys), weights=weights, k=args.ops)
+    answer = {"answer": "x" * args.answer_bytes}
+    latencies, hits = [], 0
+    start = time.perf_counter()
+    for key in keys:
+        key = f"both:question {key}"
+        t = time.perf_counter()
+        value = cache.get(key)
+        latencies.append(time.perf_counter() - t)
+        if value is None:
+            cache.set(key, answer)
+        else:
+            hits += 1
+    results.put((hits, time.perf_counter() - start, latencies))
+
+
+def run(backend: str, workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        server = None
+        if backend == "socket":
+            server = subprocess.Popen(
+                [sys.executable, str(ROOT / "cache_server.py"),
+                 "--socket", str(tmp / "qa_cache.sock"),
+                 "--max-entries", str(args.max_entries)],
+                stdout=subprocess.DEVNULL,
+            )
+            deadline = time.monotonic() + 10
+            while not (tmp / "qa_cache.sock").exists():
+                if time.monotonic() > deadline:
+                    raise SystemExit("cache_server.py did not start")
+                time.sleep(0.05)
+        try:
+            results = multiprocessing.Queue()
+            procs = [
+                multiprocessing.Process(
+                    target=worker, args=(backend, tmp, args, args.seed + i, results)
+                )
+                for i in range(workers)
+            ]
+            for proc in procs:
+                proc.start()
+            outcomes = [results.get() for _ in procs]
+            for proc in procs:
+                proc.join()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    latencies = sorted(t for _, _, lats in outcomes for t in lats)
+    ops = 0
+    for hits, _, lats in outcomes:
+        # Every miss is followed by a set
+        ops += 2 * len(lats) - hits
+    return {
+        "hit_rate": sum(hits for hits, _, _ in outcomes) / len(latencies),
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p95_us": percentile(latencies, 95) * 1e6,
+        "ops_per_s": ops / max(elapsed for _, elapsed, _ in outcomes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 4])
+    parser.add_argument("--ops", type=int, default=20000, help="lookups per worker")
+    parser.add_argument("--keys", type=int, default=5000, help="distinct questions")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of question popularity")
+    parser.add_argument("--max-entries", type=int, default=10000)
+    parser.add_argument("--answer-bytes", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'backend':<9}{'workers':>8}{'hit rate':>10}{'p50 us':>9}{'p95 us':>9}{'ops/s':>10}")
+    for backend in args.backends:
+        for workers in args.workers:
+            result = run(backend, workers, args)
+            print(
+                f"{backend:<9}{workers:>8}{result['hit_rate']:>10.1%}"
+                f"{result['p50_us']:>9.1f}{result['p95_us']:>9.1f}"
+                f"{result['ops_per_s']:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Micro-benchmark: per-request chain construction vs. the prebuilt registry.
+
+Compares what ``/qa`` used to do on every request (build a retriever,
+partial the prompt and assemble a ``RetrievalQA`` chain) with a lookup in
+``chains.ChainRegistry``. Runs offline with fake embeddings and a fake chat
+model; nothing is retrieved or generated.
+
+    python scripts/bench_chains.py --iterations 2000
+"""
+
+import argparse
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain.chains import RetrievalQA
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+
+from chains import MODE_FILTERS, ChainRegistry
+from templates import prompt_for_mode
+
+
+def build_per_request(vectorstore, llm, mode: str):
+    filter_opt = MODE_FILTERS[mode]
+    retriever = vectorstore.as_retriever(
+        search_kwargs={"k": 8, **({"filter": filter_opt} if filter_opt else {})}
+    )
+    return RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=retriever,
+        chain_type_kwargs={"prompt": prompt_for_mode(mode)},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vectorstore = Chroma(
+            persist_directory=tmp,
+            embedding_function=DeterministicFakeEmbedding(size=64),
+        )
+        llm = FakeListChatModel(responses=["ok"])
+        registry = ChainRegistry(vectorstore, llm)
+        modes = list(MODE_FILTERS)
+
+        def per_request():
+            for mode in modes:
+                build_per_request(vectorstore, llm, mode)
+
+        def prebuilt():
+            for mode in modes:
+                registry.get(mode).chain
+
+        n = args.iterations
+        before = timeit.timeit(per_request, number=n) / (n * len(modes))
+        after = timeit.timeit(prebuilt, number=n) / (n * len(modes))
+
+    print(f"per-request build: {before * 1e6:9.1f} µs/request")
+    print(f"prebuilt registry: {after * 1e6:9.1f} µs/request")
+    print(f"speedup:           {before / after:9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
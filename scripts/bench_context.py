@@ -0,0 +1,119 @@
+"""Benchmark context compression: prompt tokens and latency before and after.
+
+Builds the same offline fixture as ``bench_app.py`` (sampled Catechism
+paragraphs, synthetic verses, fake embeddings, BM25 index) and answers a
+fixed question set in every mode twice: with the raw retrieved chunks
+stuffed into the prompt, and with the context assembled by ``context.py``
+under each mode's token budget. For each it reports the mean prompt and
+completion tokens (tiktoken) and the mean and p95 end-to-end latency of
+retrieval, context assembly and the LLM call.
+
+With the default fake chat model the latency shows the cost of assembly
+only; ``--provider openai`` (needs ``OPENAI_API_KEY``) measures real
+gpt-4-turbo latency and completion length.
+
+    python scripts/bench_context.py --k 8
+    CONTEXT_TOKEN_BUDGET=800 python scripts/bench_context.py --provider openai
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_chroma import Chroma
+
+from bench_app import MODES, build_fixture, percentile
+from chains import ChainRegistry
+from chat_model import make_llm
+from context import ContextBudget, budget_for_mode
+from embedding import make_embeddings
+from keyword_index import BM25Index, INDEX_FILENAME
+from telemetry import count_tokens
+
+QUESTIONS = [
+    "What does the Church teach about grace?",
+    "Why is baptism necessary for salvation?",
+    "How should a Christian pray?",
+    "What is the meaning of the Eucharist?",
+    "What does Scripture say about God's love for us?",
+    "How are faith and reason related?",
+    "What is original sin?",
+    "Why do Catholics honor Mary?",
+    "What is the role of conscience in moral decisions?",
+    "How does the Holy Spirit guide the Church?",
+    "What happens after death?",
+    "How are we called to love our neighbor?",
+]
+
+
+async def run(registry: ChainRegistry, llm, mode: str) -> dict:
+    mode_chain = registry.get(mode)
+    prompt_tokens, completion_tokens, latencies = [], [], []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        docs = await mode_chain.retriever.ainvoke(question)
+        prompt = mode_chain.prompt.format(
+            context="\n\n".join(doc.page_content for doc in docs),
+            question=question,
+        )
+        response = await llm.ainvoke(prompt)
+        latencies.append(time.perf_counter() - start)
+        prompt_tokens.append(count_tokens(prompt))
+        completion_tokens.append(count_tokens(str(response.content)))
+    latencies.sort()
+    return {
+        "prompt": sum(prompt_tokens) / len(QUESTIONS),
+        "completion": sum(completion_tokens) / len(QUESTIONS),
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=8, help="chunks retrieved per question")
+    parser.add_argument("--paragraphs", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--provider", default="fake", choices=["fake", "openai"])
+    args = parser.parse_args()
+
+    llm = make_llm(args.provider)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        build_fixture(tmp, args.paragraphs, args.seed)
+        chroma_dir = tmp / "chroma"
+        vectorstore = Chroma(
+            persist_directory=str(chroma_dir), embedding_function=make_embeddings("fake")
+        )
+        index = BM25Index.load(chroma_dir / INDEX_FILENAME)
+        variants = {
+            "raw chunks": lambda mode: ContextBudget(max_tokens=0),
+            "compressed": budget_for_mode,
+        }
+
+        print(
+            f"\n{'mode':<11}{'context':<12}{'budget':>8}{'prompt':>9}"
+            f"{'compl.':>8}{'mean ms':>10}{'p95 ms':>10}"
+        )
+        for mode in MODES:
+            for name, budget in variants.items():
+                registry = ChainRegistry(
+                    vectorstore, llm, k=args.k, keyword_index=index, context_budget=budget
+                )
+                result = asyncio.run(run(registry, llm, mode))
+                limit = budget(mode).max_tokens or "-"
+                print(
+                    f"{mode:<11}{name:<12}{limit:>8}{result['prompt']:>9.0f}"
+                    f"{result['completion']:>8.0f}{result['mean_ms']:>10.1f}"
+                    f"{result['p95_ms']:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
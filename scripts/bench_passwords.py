@@ -0,0 +1,77 @@
+"""Benchmark password hashing cost: signins/sec per core and with a pool.
+
+For each scrypt ``n`` (``r``/``p`` fixed by the flags) the script measures a
+single hash on one core, then the throughput of ``--workers`` threads
+hashing in parallel (scrypt releases the GIL), which is what
+``PASSWORD_HASH_WORKERS`` bounds in the API. Use it to pick the largest cost
+whose signins/sec still covers peak login traffic with the cores you can
+spare. The legacy SHA-256 hash and a verification-cache hit are shown for
+reference.
+
+    python scripts/bench_passwords.py --n 4096 8192 16384 32768 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import passwords
+
+
+def per_second(fn, seconds: float) -> float:
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def parallel_per_second(fn, workers: int, seconds: float) -> float:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        counts = list(pool.map(lambda _: per_second(fn, seconds), range(workers)))
+    return sum(counts) * seconds / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, nargs="+", default=[2 ** k for k in range(12, 17)])
+    parser.add_argument("--r", type=int, default=8)
+    parser.add_argument("--p", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=passwords.WORKERS)
+    parser.add_argument("--seconds", type=float, default=2.0, help="per measurement")
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    print(f"{os.cpu_count()} CPUs, {args.workers} hashing workers\n")
+    print(f"{'cost':<24}{'ms/hash':>10}{'memory':>10}{'/s/core':>10}{'/s pool':>10}")
+    for n in args.n:
+        cost = passwords.Cost(n, args.r, args.p)
+        stored = passwords.hash_password(password, cost)
+
+        def verify():
+            passwords.verify(password, stored)
+
+        single = per_second(verify, args.seconds)
+        pool = parallel_per_second(verify, args.workers, args.seconds)
+        memory = f"{128 * n * args.r / 2 ** 20:.0f} MiB"
+        label = f"scrypt n={n} r={args.r} p={args.p}"
+        print(f"{label:<24}{1000 / single:>10.1f}{memory:>10}{single:>10.0f}{pool:>10.0f}")
+
+    legacy = passwords._legacy_hash(password)
+    rate = per_second(lambda: passwords.verify(password, legacy), 0.5)
+    print(f"{'legacy sha256':<24}{1000 / rate:>10.4f}{'-':>10}{rate:>10.0f}{'-':>10}")
+
+    cache = passwords.VerifyCache()
+    cache.add(password, stored)
+    rate = per_second(lambda: cache.check(password, stored), 0.5)
+    print(f"{'verify cache hit':<24}{1000 / rate:>10.4f}{'-':>10}{rate:>10.0f}{'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark latency and recall of keyword, vector and hybrid retrieval.
+
+Builds the chunks exactly like ``build_db.py`` and samples two question sets:
+
+- *keyword*: a run of words copied from a chunk, relevant = that chunk
+- *reference*: "What does <reference> say?", relevant = that reference
+
+Each retriever is scored by recall@k (the relevant reference is among the
+results) and mean latency. By default the vector store is built in a temp
+directory with fake embeddings so the script runs offline; pass
+``--persist-dir veritas_ai_chroma_db`` (with ``EMBEDDING_PROVIDER``/
+``OPENAI_API_KEY`` set as for the API) to measure the real store.
+
+    python scripts/bench_retrieval.py --questions 200
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_chroma import Chroma
+
+import build_db
+from embedding import FakeEmbeddings, make_embeddings
+from hybrid import HybridRetriever
+from keyword_index import BM25Index
+
+
+def make_questions(chunks: list[dict], n: int, rng: random.Random):
+    keyword, reference = [], []
+    for chunk in rng.sample(chunks, n):
+        words = chunk["text"].split()
+        if len(words) < 8:
+            continue
+        start = rng.randrange(0, len(words) - 6)
+        ref = chunk["metadata"]["reference"]
+        keyword.append((" ".join(words[start:start + 6]), ref))
+        reference.append((f"What does {ref} say?", ref))
+    return {"keyword": keyword, "reference": reference}
+
+
+def evaluate(search, questions, k: int):
+    hits, elapsed = 0, 0.0
+    for query, ref in questions:
+        start = time.perf_counter()
+        docs = search(query)
+        elapsed += time.perf_counter() - start
+        hits += any(d.metadata.get("reference") == ref for d in docs[:k])
+    return hits / len(questions), elapsed / len(questions) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--persist-dir", help="existing Chroma store (real embeddings)")
+    args = parser.parse_args()
+
+    chunks = build_db.split_entries(build_db.load_entries())
+    start = time.perf_counter()
+    index = BM25Index.from_chunks(chunks)
+    print(f"BM25 index: {len(index)} chunks built in {time.perf_counter() - start:.2f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.persist_dir:
+            embeddings = make_embeddings()
+            db = Chroma(persist_directory=args.persist_dir, embedding_function=embeddings)
+        else:
+            embeddings = FakeEmbeddings()
+            db = Chroma(persist_directory=tmp, embedding_function=embeddings)
+            build_db.sync_chunks(db, chunks, embeddings, batch_size=1000, workers=1)
+
+        vector = db.as_retriever(search_kwargs={"k": args.k})
+        hybrid = HybridRetriever(vector_retriever=vector, index=index, k=args.k)
+        searches = {
+            "vector": vector.invoke,
+            "keyword": hybrid.keyword_documents,
+            "hybrid": hybrid.invoke,
+        }
+
+        questions = make_questions(chunks, args.questions, random.Random(args.seed))
+        print(f"\n{'retriever':<10}{'questions':<12}{'recall@k':>10}{'ms/query':>10}")
+        for name, search in searches.items():
+            for kind, qs in questions.items():
+                recall, ms = evaluate(search, qs, args.k)
+                print(f"{name:<10}{kind:<12}{recall:>10.2%}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
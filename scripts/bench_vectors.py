@@ -0,0 +1,122 @@
+"""Benchmark vector search: Chroma vs. the NumPy index (float32 and int8).
+
+Builds the chunks exactly like ``build_db.py``, stores them in Chroma in a
+temp directory with fake embeddings of ``--dim`` dimensions (1536 matches
+OpenAI's), and exports that store to NumPy indexes like ``build_db.py
+--numpy-index``. Query vectors are embedded once up front, so only the
+search itself is timed. For each store and source filter the script reports
+mean and p95 latency, recall@k against an exact float32 scan, and the size
+of the vectors on disk. Pass ``--persist-dir veritas_ai_chroma_db`` (with
+``EMBEDDING_PROVIDER``/``OPENAI_API_KEY`` set as for the API) to measure
+the real store instead.
+
+    python scripts/bench_vectors.py --dim 1536 --questions 200
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_chroma import Chroma
+
+import build_db
+from bench_app import percentile
+from bench_retrieval import make_questions
+from chains import MODE_FILTERS
+from embedding import FakeEmbeddings, make_embeddings
+from vector_index import NumpyVectorStore, export_chroma
+
+
+def dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def measure(search, queries: list[list[float]], truth: list[set] | None):
+    latencies, recalls, results = [], [], []
+    for i, vector in enumerate(queries):
+        start = time.perf_counter()
+        docs = search(vector)
+        latencies.append(time.perf_counter() - start)
+        found = {(d.metadata.get("reference"), d.metadata.get("chunk_index")) for d in docs}
+        results.append(found)
+        if truth is not None:
+            recalls.append(len(found & truth[i]) / max(1, len(truth[i])))
+    latencies.sort()
+    return {
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "recall": sum(recalls) / len(recalls) if recalls else 1.0,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--dim", type=int, default=1536, help="fake embedding size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--persist-dir", help="existing Chroma store (real embeddings)")
+    args = parser.parse_args()
+
+    chunks = build_db.split_entries(build_db.load_entries())
+    questions = make_questions(chunks, args.questions, random.Random(args.seed))["keyword"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if args.persist_dir:
+            embeddings = make_embeddings()
+            chroma_dir = Path(args.persist_dir)
+        else:
+            embeddings = FakeEmbeddings(size=args.dim)
+            chroma_dir = tmp / "chroma"
+        db = Chroma(persist_directory=str(chroma_dir), embedding_function=embeddings)
+        if not args.persist_dir:
+            build_db.sync_chunks(db, chunks, embeddings, batch_size=1000, workers=1)
+
+        start = time.perf_counter()
+        export_chroma(db, tmp / "exact", projection_dim=0)
+        export_chroma(db, tmp / "float32")
+        export_chroma(db, tmp / "int8", quantize=True)
+        print(f"Exported {len(chunks)} chunks 3 ways in {time.perf_counter() - start:.1f}s")
+
+        stores = {
+            "chroma": (db, dir_size(chroma_dir)),
+            **{
+                name: (NumpyVectorStore(tmp / name, embeddings), dir_size(tmp / name))
+                for name in ("exact", "float32", "int8")
+            },
+        }
+        queries = embeddings.embed_documents([query for query, _ in questions])
+
+        print(
+            f"\n{'store':<9}{'mode':<11}{'mean ms':>9}{'p95 ms':>9}"
+            f"{'recall@k':>10}{'disk MB':>9}"
+        )
+        for mode, filter_opt in MODE_FILTERS.items():
+            truth = None
+            for name in ("exact", "chroma", "float32", "int8"):
+                store, size = stores[name]
+                result = measure(
+                    lambda vector: store.similarity_search_by_vector(
+                        vector, k=args.k, filter=filter_opt
+                    ),
+                    queries,
+                    truth,
+                )
+                if truth is None:
+                    truth = result["results"]
+                print(
+                    f"{name:<9}{mode:<11}{result['mean_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                    f"{result['recall']:>10.1%}{size / 2 ** 20:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
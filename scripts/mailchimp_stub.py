@@ -0,0 +1,93 @@
+"""Local stand-in for the Mailchimp batch-subscribe endpoint.
+
+Answers ``POST /lists/<list_id>`` like Mailchimp's API 3.0: new emails are
+returned in ``new_members`` and emails already on the list as
+``ERROR_CONTACT_EXISTS`` errors. ``--latency`` slows every response and
+``--fail-rate`` answers that share of requests with a 503, to exercise the
+sync worker's retries. Point the API at it with:
+
+    python scripts/mailchimp_stub.py --port 8025 --latency 2 --fail-rate 0.2
+    MAILCHIMP_API_KEY=stub MAILCHIMP_LIST_ID=list MAILCHIMP_BASE_URL=http://127.0.0.1:8025 \\
+        uvicorn app:app
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency: float, fail_rate: float):
+    members: set[str] = set()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(latency)
+            if not self.path.startswith("/lists/"):
+                return self._reply(404, {"detail": "Not found"})
+            if random.random() < fail_rate:
+                return self._reply(503, {"detail": "Stub failure"})
+
+            new, errors = [], []
+            with lock:
+                for member in payload.get("members", []):
+                    email = member["email_address"].lower()
+                    if email in members:
+                        errors.append({
+                            "email_address": email,
+                            "error": f"{email} is already a list member",
+                            "error_code": "ERROR_CONTACT_EXISTS",
+                        })
+                    else:
+                        members.add(email)
+                        new.append({"email_address": email, "status": "subscribed"})
+                total = len(members)
+            print(f"batch of {len(new) + len(errors)}: {len(new)} new, {total} on list")
+            self._reply(200, {
+                "new_members": new,
+                "updated_members": [],
+                "errors": errors,
+                "total_created": len(new),
+                "total_updated": 0,
+                "error_count": len(errors),
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of 503 responses")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(args.latency, args.fail_rate)
+    )
+    print(f"Mailchimp stub on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Embedding-similarity lookup in front of the QA answer cache.
+
+Every cached answer is indexed by the embedding of its question, under the
+normalized key built by ``qa_cache.cache_key``. The question is embedded
+exactly as the retriever will embed it, so with a memoizing embeddings model
+the lookup costs no extra API call. A new question whose embedding is within
+``threshold`` cosine similarity of an indexed question in the same source
+mode reuses that answer.
+
+Vectors live in one NumPy matrix per mode. Small indexes are searched
+exhaustively; once an index passes ``EXACT_SEARCH_LIMIT`` rows, a 128-d random
+projection of every vector picks candidates that are then rescored exactly,
+which keeps lookups in the low milliseconds at 100k+ entries.
+
+The vectors are persisted to a ``semantic_cache`` table in the QA cache
+database, and each worker picks up rows written by the others every
+``refresh_interval`` seconds, in a background thread so lookups never wait
+on SQLite. Each row records the embedding model and vector size; rows from
+another model are deleted at startup, and rows of another size are dropped
+when the first new vector is stored, so switching ``EMBEDDING_PROVIDER``
+starts a fresh index instead of comparing incompatible vectors.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from embedding import model_name
+
+# Above this many rows per mode, search a random projection first
+EXACT_SEARCH_LIMIT = 4096
+PROJECTION_DIM = 128
+CANDIDATES = 64
+
+_projections: dict[int, np.ndarray] = {}
+
+
+def _projection(dim: int) -> np.ndarray:
+    """Fixed Gaussian projection from ``dim`` to ``PROJECTION_DIM`` dimensions."""
+    if dim not in _projections:
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((dim, PROJECTION_DIM)) / np.sqrt(PROJECTION_DIM)
+        _projections[dim] = matrix.astype(np.float32)
+    return _projections[dim]
+
+
+def _grow(matrix: np.ndarray, rows: int) -> np.ndarray:
+    grown = np.zeros((matrix.shape[0] * 2, matrix.shape[1]), dtype=np.float32)
+    grown[:rows] = matrix[:rows]
+    return grown
+
+
+class _ModeIndex:
+    """Growable matrix of unit vectors with the cache key of each row."""
+
+    def __init__(self):
+        self.vectors: np.ndarray | None = None
+        self.sketch: np.ndarray | None = None
+        self.keys: list[str | None] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def dim(self) -> int | None:
+        return None if self.vectors is None else self.vectors.shape[1]
+
+    def add(self, key: str, vector: np.ndarray) -> None:
+        if self.dim is not None and vector.shape[0] != self.dim:
+            # Rows arrive oldest first, so vectors of a new model replace the old
+            self.vectors = self.sketch = None
+            self.keys = []
+        n = len(self.keys)
+        if self.vectors is None:
+            self.vectors = np.zeros((16, vector.shape[0]), dtype=np.float32)
+            self.sketch = np.zeros((16, PROJECTION_DIM), dtype=np.float32)
+        elif n == self.vectors.shape[0]:
+            self.vectors = _grow(self.vectors, n)
+            self.sketch = _grow(self.sketch, n)
+        self.vectors[n] = vector
+        self.sketch[n] = vector @ _projection(vector.shape[0])
+        self.keys.append(key)
+
+    def remove(self, key: str) -> None:
+        for i, k in enumerate(self.keys):
+            if k == key:
+                self.keys[i] = None
+                self.vectors[i] = 0
+                self.sketch[i] = 0
+
+    def best(self, vector: np.ndarray) -> tuple[float, str | None]:
+        vector = vector.astype(np.float32, copy=False)
+        n = len(self.keys)
+        if not n or vector.shape[0] != self.dim:
+            return 0.0, None
+        if n <= EXACT_SEARCH_LIMIT:
+            scores = self.vectors[:n] @ vector
+            i = int(np.argmax(scores))
+            return float(scores[i]), self.keys[i]
+        rough = self.sketch[:n] @ (vector @ _projection(vector.shape[0]))
+        candidates = np.argpartition(-rough, CANDIDATES)[:CANDIDATES]
+        scores = self.vectors[candidates] @ vector
+        i = int(np.argmax(scores))
+        return float(scores[i]), self.keys[candidates[i]]
+
+
+class SemanticCache:
+    """Maps question embeddings to QA cache keys, per source mode."""
+
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = 0.95,
+        path: str | Path | None = None,
+        max_entries: int = 10000,
+        refresh_interval: float = 30,
+    ):
+        self.embeddings = embeddings
+        self.model = model_name(embeddings)
+        self.threshold = threshold
+        self.path = str(path) if path is not None else None
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self._indexes: dict[str, _ModeIndex] = {}
+        self._lock = threading.Lock()
+        # Serializes refreshes so rows are never loaded twice
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._local = threading.local()
+        self._last_rowid = 0
+        self._last_refresh = 0.0
+        # Vector size of the rows stored by this process
+        self._dim: int | None = None
+        if self.path is not None:
+            with self._conn() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS semantic_cache ("
+                    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                    " mode TEXT NOT NULL,"
+                    " key TEXT NOT NULL UNIQUE,"
+                    " vector BLOB NOT NULL,"
+                    " model TEXT NOT NULL DEFAULT '',"
+                    " dim INTEGER NOT NULL DEFAULT 0)"
+                )
+                columns = {
+                    row[1] for row in conn.execute("PRAGMA table_info(semantic_cache)")
+                }
+                # Tables from before the model was recorded; their rows are purged
+                for column, definition in (
+                    ("model", "TEXT NOT NULL DEFAULT ''"),
+                    ("dim", "INTEGER NOT NULL DEFAULT 0"),
+                ):
+                    if column not in columns:
+                        conn.execute(
+                            f"ALTER TABLE semantic_cache ADD COLUMN {column} {definition}"
+                        )
+                conn.execute("DELETE FROM semantic_cache WHERE model != ?", (self.model,))
+            self.refresh()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, question: str) -> np.ndarray:
+        return self._unit(self.embeddings.embed_query(question))
+
+    async def aembed(self, question: str) -> np.ndarray:
+        return self._unit(await self.embeddings.aembed_query(question))
+
+    async def aembed_many(self, questions: list[str]) -> list[np.ndarray]:
+        """Embed many questions, in one call when the embeddings support it."""
+        if hasattr(self.embeddings, "aembed_queries"):
+            vectors = await self.embeddings.aembed_queries(questions)
+        else:
+            vectors = await self.embeddings.aembed_documents(questions)
+        return [self._unit(vector) for vector in vectors]
+
+    def refresh(self) -> None:
+        """Load index rows added since the last refresh (e.g. by other workers)."""
+        if self.path is None:
+            return
+        with self._refresh_lock:
+            rows = self._conn().execute(
+                "SELECT id, mode, key, vector FROM semantic_cache"
+                " WHERE id > ? AND model = ? ORDER BY id",
+                (self._last_rowid, self.model),
+            ).fetchall()
+            with self._lock:
+                for rowid, mode, key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._indexes.setdefault(mode, _ModeIndex()).add(key, vector)
+                    self._last_rowid = rowid
+                self._last_refresh = time.monotonic()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Semantic cache refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="semantic-cache-refresh", daemon=True).start()
+
+    def nearest(self, mode: str, vector: np.ndarray) -> str | None:
+        """Return the cache key of the closest question above the threshold.
+
+        Never touches SQLite: a stale index is refreshed in the background
+        and this lookup uses the rows loaded so far.
+        """
+        if time.monotonic() - self._last_refresh > self.refresh_interval:
+            self._refresh_in_background()
+        with self._lock:
+            index = self._indexes.get(mode)
+            score, key = index.best(vector) if index else (0.0, None)
+        if key is not None and score >= self.threshold:
+            self.hits += 1
+            return key
+        self.misses += 1
+        return None
+
+    def add(self, mode: str, key: str, vector: np.ndarray) -> None:
+        if self.path is None:
+            with self._lock:
+                self._indexes.setdefault(mode, _ModeIndex()).add(key, vector)
+                total = sum(len(i) for i in self._indexes.values())
+            if total > self.max_entries:
+                self._trim_memory()
+            return
+        conn = self._conn()
+        dim = vector.shape[0]
+        with conn:
+            if self._dim != dim:
+                # Once per process: drop rows another model (or size) wrote
+                conn.execute(
+                    "DELETE FROM semantic_cache WHERE model != ? OR dim != ?",
+                    (self.model, dim),
+                )
+                self._dim = dim
+            conn.execute(
+                "INSERT OR IGNORE INTO semantic_cache (mode, key, vector, model, dim)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (mode, key, vector.astype(np.float32).tobytes(), self.model, dim),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM semantic_cache WHERE id IN ("
+                    " SELECT id FROM semantic_cache ORDER BY id LIMIT ?)",
+                    (count - self.max_entries + max(1, self.max_entries // 100),),
+                )
+                self._reload()
+        self.refresh()
+
+    def discard(self, mode: str, key: str) -> None:
+        """Forget a key whose answer is no longer in the QA cache."""
+        with self._lock:
+            index = self._indexes.get(mode)
+            if index:
+                index.remove(key)
+        if self.path is not None:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM semantic_cache WHERE key = ?", (key,))
+
+    def _reload(self) -> None:
+        with self._refresh_lock, self._lock:
+            self._indexes = {}
+            self._last_rowid = 0
+
+    def _trim_memory(self) -> None:
+        with self._lock:
+            for index in self._indexes.values():
+                live = [(k, v) for k, v in zip(index.keys, index.vectors) if k]
+                drop = max(1, len(live) // 100)
+                fresh = _ModeIndex()
+                for k, v in live[drop:]:
+                    fresh.add(k, v)
+                index.vectors, index.sketch = fresh.vectors, fresh.sketch
+                index.keys = fresh.keys
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": sum(len(i) for i in self._indexes.values()),
+        }
@@ -0,0 +1,131 @@
+"""Coalesce concurrent identical work into a single upstream computation.
+
+When many requests for the same key arrive while the first one is still
+being computed, :meth:`SingleFlight.do` runs the computation once and hands
+every caller the same result (or exception). :meth:`SingleFlight.stream`
+does the same for async generators: one producer runs, and each subscriber
+receives every item from the start, so late joiners of a streamed answer
+still see all of its tokens.
+
+The shared computation runs in its own task. A caller that is cancelled
+(e.g. its client disconnected) stops waiting without affecting the others;
+the computation is cancelled only once nobody is waiting for it.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+
+class _Call:
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.waiters = 0
+
+
+class _Broadcast:
+    def __init__(self):
+        self.items: list = []
+        self.done = False
+        self.error: Exception | None = None
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+        self.subscribers = 0
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time (per event loop)."""
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self._streams: dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls or key in self._streams
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, bool]:
+        """Return ``(result, shared)``; ``shared`` is False for the caller
+        whose call started the computation."""
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = self._calls[key] = _Call()
+            call.task = asyncio.ensure_future(fn())
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    async def stream(
+        self, key: str, fn: Callable[[], AsyncIterator]
+    ) -> AsyncIterator[tuple[Any, bool]]:
+        """Yield ``(item, shared)`` for every item of the shared generator."""
+        broadcast = self._streams.get(key)
+        shared = broadcast is not None
+        if broadcast is None:
+            broadcast = self._streams[key] = _Broadcast()
+            broadcast.task = asyncio.ensure_future(self._produce(broadcast, fn))
+            broadcast.task.add_done_callback(
+                lambda _: self._forget(self._streams, key, broadcast)
+            )
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        broadcast.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                async with broadcast.changed:
+                    await broadcast.changed.wait_for(
+                        lambda: len(broadcast.items) > sent or broadcast.done
+                    )
+                    items = broadcast.items[sent:]
+                    finished = broadcast.done
+                for item in items:
+                    yield item, shared
+                sent += len(items)
+                if finished and sent == len(broadcast.items):
+                    break
+            # Re-raise a failure of the producer in every subscriber
+            if broadcast.error is not None:
+                raise broadcast.error
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.task.done():
+                broadcast.task.cancel()
+
+    @staticmethod
+    async def _produce(broadcast: _Broadcast, fn: Callable[[], AsyncIterator]) -> None:
+        try:
+            async for item in fn():
+                async with broadcast.changed:
+                    broadcast.items.append(item)
+                    broadcast.changed.notify_all()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            async with broadcast.changed:
+                broadcast.changed.notify_all()
+
+    @staticmethod
+    def _forget(calls: dict, key: str, call) -> None:
+        if calls.get(key) is call:
+            del calls[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
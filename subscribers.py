@@ -0,0 +1,300 @@
+"""Email subscribers for /subscribe and their background sync to Mailchimp.
+
+``/subscribe`` only records the email in ``SubscriberStore``, a WAL-mode
+SQLite table keyed by the email, so deduplication is one indexed insert and
+the request never waits on Mailchimp. :class:`SyncWorker` then pushes
+pending subscribers in batches through :class:`MailchimpClient`, which keeps
+one pooled HTTP session. A failed batch is retried with exponential backoff;
+rows are claimed with a lease, so several uvicorn workers can run the sync
+without sending the same email twice.
+
+Set ``MAILCHIMP_BASE_URL`` to point the client at a local stub server
+(``scripts/mailchimp_stub.py``) instead of ``https://<server>.api.mailchimp.com/3.0``.
+"""
+
+import asyncio
+import csv
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LEGACY_SUBSCRIBERS_FILE = Path("subscribers.csv")
+
+# Mailchimp error codes meaning the member is already on the list
+ALREADY_SUBSCRIBED = {"ERROR_CONTACT_EXISTS", "MEMBER_EXISTS"}
+
+
+class SubscriberStore:
+    """Subscribers keyed by email, with their Mailchimp sync state."""
+
+    def __init__(self, path: str | Path = "subscribers.db"):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS subscribers ("
+                " email TEXT PRIMARY KEY,"
+                " created_at TEXT NOT NULL,"
+                " synced_at TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt REAL NOT NULL DEFAULT 0,"
+                " last_error TEXT)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS subscribers_pending"
+                " ON subscribers (next_attempt) WHERE synced_at IS NULL"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, email: str) -> bool:
+        """Record a subscriber; return False if the email is already known."""
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO subscribers (email, created_at) VALUES (?, ?)",
+                (email, datetime.utcnow().isoformat()),
+            )
+        return cur.rowcount == 1
+
+    def claim(self, limit: int, lease: float, max_attempts: int = 10) -> list[str]:
+        """Take up to ``limit`` due subscribers for ``lease`` seconds.
+
+        Claimed rows are not due again until the lease expires, so a worker
+        that dies mid-batch only delays them. Emails that failed
+        ``max_attempts`` times are left for inspection.
+        """
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            emails = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT email FROM subscribers"
+                    " WHERE synced_at IS NULL AND next_attempt <= ? AND attempts < ?"
+                    " ORDER BY next_attempt LIMIT ?",
+                    (now, max_attempts, limit),
+                )
+            ]
+            conn.executemany(
+                "UPDATE subscribers SET next_attempt = ? WHERE email = ?",
+                [(now + lease, email) for email in emails],
+            )
+        return emails
+
+    def mark_synced(self, emails: list[str]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "UPDATE subscribers SET synced_at = ?, last_error = NULL WHERE email = ?",
+                [(datetime.utcnow().isoformat(), email) for email in emails],
+            )
+
+    def mark_failed(self, errors: dict[str, str], base_delay: float, max_delay: float) -> None:
+        """Schedule a retry for each email, backing off by its attempt count."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            for email, error in errors.items():
+                conn.execute(
+                    "UPDATE subscribers SET attempts = attempts + 1, last_error = ?,"
+                    " next_attempt = ? + min(?, ? * (1 << min(attempts, 20)))"
+                    " WHERE email = ?",
+                    (error[:500], now, max_delay, base_delay, email),
+                )
+
+    def stats(self) -> dict[str, int]:
+        total, pending = self._conn().execute(
+            "SELECT COUNT(*), COUNT(*) - COUNT(synced_at) FROM subscribers"
+        ).fetchone()
+        return {"total": total, "pending": pending}
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+
+    def import_csv(self, file_path: Path = LEGACY_SUBSCRIBERS_FILE) -> int:
+        """Copy emails from the old ``subscribers.csv`` as pending subscribers.
+
+        They were only stored there when Mailchimp was unavailable, so they
+        are synced like new ones. The file itself is not modified.
+        """
+        if not file_path.exists():
+            return 0
+        with file_path.open("r", newline="") as f:
+            emails = {
+                row.get("email", "").strip().lower() for row in csv.DictReader(f)
+            } - {""}
+        conn = self._conn()
+        now = datetime.utcnow().isoformat()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO subscribers (email, created_at) VALUES (?, ?)",
+                [(email, now) for email in sorted(emails)],
+            )
+        return len(emails)
+
+
+def make_subscriber_store() -> SubscriberStore:
+    """Open the store at ``SUBSCRIBERS_DB_PATH`` (default ``subscribers.db``).
+
+    A new, empty store imports the legacy ``subscribers.csv`` once.
+    """
+    store = SubscriberStore(os.getenv("SUBSCRIBERS_DB_PATH", "subscribers.db"))
+    if len(store) == 0:
+        imported = store.import_csv()
+        if imported:
+            print(f"Imported {imported} subscribers from {LEGACY_SUBSCRIBERS_FILE}")
+    return store
+
+
+class MailchimpError(Exception):
+    """The whole batch failed (network error, 429 or 5xx); retry it later."""
+
+
+class MailchimpClient:
+    """Batch-subscribes emails to one list over a pooled ``requests`` session."""
+
+    def __init__(
+        self,
+        api_key: str,
+        list_id: str,
+        server: str | None = None,
+        base_url: str | None = None,
+        timeout: float = 10,
+    ):
+        self.list_id = list_id
+        self.base_url = (base_url or f"https://{server}.api.mailchimp.com/3.0").rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = ("anystring", api_key)
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+    def subscribe(self, emails: list[str]) -> dict[str, str]:
+        """Add ``emails`` to the list; return the per-email errors.
+
+        Emails already on the list count as synced. Raises
+        :class:`MailchimpError` when the batch as a whole should be retried.
+        """
+        try:
+            r = self.session.post(
+                f"{self.base_url}/lists/{self.list_id}",
+                json={
+                    "members": [
+                        {"email_address": email, "status": "subscribed"}
+                        for email in emails
+                    ],
+                    "update_existing": False,
+                },
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise MailchimpError(str(e)) from e
+        if r.status_code == 429 or r.status_code >= 500:
+            raise MailchimpError(f"POST {r.status_code}: {r.text[:200]}")
+        if not 200 <= r.status_code < 300:
+            # A rejected request (bad key, unknown list) fails every member
+            return {email: f"POST {r.status_code}: {r.text[:200]}" for email in emails}
+        return {
+            err["email_address"]: err.get("error", "")
+            for err in r.json().get("errors", [])
+            if err.get("error_code") not in ALREADY_SUBSCRIBED
+        }
+
+
+def make_mailchimp_client() -> MailchimpClient | None:
+    """Client from ``MAILCHIMP_*`` variables, or None when they are not set."""
+    api_key = os.getenv("MAILCHIMP_API_KEY")
+    list_id = os.getenv("MAILCHIMP_LIST_ID")
+    server = os.getenv("MAILCHIMP_SERVER_PREFIX")
+    base_url = os.getenv("MAILCHIMP_BASE_URL")
+    if not (api_key and list_id and (server or base_url)):
+        return None
+    return MailchimpClient(api_key, list_id, server=server, base_url=base_url)
+
+
+class SyncWorker:
+    """Pushes pending subscribers to Mailchimp in the background.
+
+    :meth:`wake` starts a sync after ``batch_delay`` seconds (gathering the
+    signups that arrive meanwhile into one batch); otherwise the worker
+    polls every ``interval`` seconds for retries and other workers' rows.
+    """
+
+    def __init__(
+        self,
+        store: SubscriberStore,
+        client: MailchimpClient,
+        batch_size: int = 100,
+        batch_delay: float = 1.0,
+        interval: float = 60,
+        retry_delay: float = 30,
+        max_retry_delay: float = 3600,
+        max_attempts: int = 10,
+    ):
+        self.store = store
+        self.client = client
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.synced = 0
+        self.failed = 0
+        self._wake = asyncio.Event()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def sync_once(self) -> int:
+        """Send one batch (blocking); return the number of emails claimed."""
+        # Leave time for the request and its timeout before anyone reclaims
+        emails = self.store.claim(
+            self.batch_size, lease=self.client.timeout * 3, max_attempts=self.max_attempts
+        )
+        if not emails:
+            return 0
+        try:
+            errors = self.client.subscribe(emails)
+        except MailchimpError as e:
+            errors = {email: str(e) for email in emails}
+        synced = [email for email in emails if email not in errors]
+        self.store.mark_synced(synced)
+        self.store.mark_failed(errors, self.retry_delay, self.max_retry_delay)
+        self.synced += len(synced)
+        self.failed += len(errors)
+        if errors:
+            print(f"Mailchimp sync: {len(errors)} of {len(emails)} failed, will retry")
+        return len(emails)
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+                await asyncio.sleep(self.batch_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                # Drain full batches before waiting again
+                while await asyncio.to_thread(self.sync_once) == self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Mailchimp sync failed: {e}")
+
+    def stats(self) -> dict[str, int]:
+        return {"synced": self.synced, "failed": self.failed}
@@ -0,0 +1,365 @@
+"""Prometheus-style counters and histograms for the QA pipeline.
+
+Metrics are kept in process memory and rendered in the Prometheus text
+exposition format by :func:`render`. With several uvicorn workers each worker
+reports its own values; scrape them individually or sum them in the query.
+
+The pipeline metrics are defined at the bottom of this module:
+
+- ``qa_stage_seconds{stage, mode}``: cache lookup, retrieval, prompt
+  building, LLM call, answer parsing and cache write
+- ``qa_request_seconds{endpoint, mode}``: end-to-end handler time
+- ``qa_cache_lookups_total{mode, result}``: exact hit, semantic hit or miss
+- ``qa_llm_tokens_total{mode, kind}`` and ``qa_llm_cost_usd_total{mode}``
+- ``qa_upstream_errors_total{endpoint, kind}``: timeout, disconnect, error
+- ``qa_rate_limited_total{endpoint, budget}``: 429s by exhausted budget
+- ``qa_coalesced_requests_total{endpoint}``: requests served by another
+  request's in-flight computation
+
+:class:`StageTimer` is a LangChain callback handler that fills in the
+retrieval, prompt and LLM stages of a ``RetrievalQA`` run.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base for a labelled metric family."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+                )
+            labels = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# Pipeline metrics
+STAGE_SECONDS = REGISTRY.histogram(
+    "qa_stage_seconds", "Time spent in each QA pipeline stage.", ("stage", "mode")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "qa_request_seconds", "End-to-end QA handler time.", ("endpoint", "mode")
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "qa_cache_lookups_total", "QA answer cache lookups by result.", ("mode", "result")
+)
+LLM_TOKENS = REGISTRY.counter(
+    "qa_llm_tokens_total", "LLM tokens used by QA answers.", ("mode", "kind")
+)
+LLM_COST = REGISTRY.counter(
+    "qa_llm_cost_usd_total", "Estimated LLM cost of QA answers in USD.", ("mode",)
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "qa_upstream_errors_total", "Failed upstream calls by kind.", ("endpoint", "kind")
+)
+RATE_LIMITED = REGISTRY.counter(
+    "qa_rate_limited_total", "Requests rejected with 429 by budget.", ("endpoint", "budget")
+)
+COALESCED = REGISTRY.counter(
+    "qa_coalesced_requests_total",
+    "Requests that shared an identical in-flight computation.",
+    ("endpoint",),
+)
+
+# USD per 1K tokens; defaults are gpt-4-turbo list prices
+PROMPT_COST_PER_1K = float(os.getenv("LLM_PROMPT_COST_PER_1K", "0.01"))
+COMPLETION_COST_PER_1K = float(os.getenv("LLM_COMPLETION_COST_PER_1K", "0.03"))
+
+
+# Model whose tokenizer counts tokens when none is given
+DEFAULT_MODEL = "gpt-4-turbo"
+
+
+@lru_cache(maxsize=None)
+def encoding(model: str):
+    """The tiktoken encoding for ``model``, or None if it cannot be loaded.
+
+    tiktoken downloads its BPE files on first use, so a failure is remembered
+    too: without network access every retry would block on the download.
+    ``pipeline.warmup`` loads the default model's encoding ahead of requests.
+    """
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken encoding for {model} unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Token count of ``text``, roughly estimated if tiktoken is unavailable."""
+    enc = encoding(model)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text))
+
+
+def record_usage(mode: str, prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_TOKENS.inc(prompt_tokens, mode=mode, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, mode=mode, kind="completion")
+    LLM_COST.inc(
+        (prompt_tokens * PROMPT_COST_PER_1K + completion_tokens * COMPLETION_COST_PER_1K)
+        / 1000,
+        mode=mode,
+    )
+
+
+def _usage(response) -> tuple[int, int] | None:
+    """Prompt/completion tokens reported by the provider, if any."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return usage["prompt_tokens"], usage.get("completion_tokens", 0)
+    for generations in response.generations:
+        for generation in generations:
+            meta = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if meta:
+                return meta["input_tokens"], meta["output_tokens"]
+    return None
+
+
+class StageTimer(BaseCallbackHandler):
+    """Record retrieval, prompt and LLM stage times and token usage for one run.
+
+    Only the outermost retriever is timed (context compression and hybrid
+    retrieval nest other retrievers). The prompt stage is the gap between the
+    end of retrieval and the start of the LLM call, which is where
+    ``RetrievalQA`` stuffs the documents into the prompt. Token counts come
+    from the provider's usage report, or are estimated with tiktoken when it
+    is missing (streaming); ``tokens`` totals them for the run, and ``stages``
+    the seconds spent in each stage.
+    """
+
+    run_inline = True
+
+    def __init__(self, mode: str, model: str = DEFAULT_MODEL):
+        self.mode = mode
+        self.model = model
+        self._starts: dict[UUID, float] = {}
+        self._prompts: dict[UUID, str] = {}
+        self._retrieved_at: float | None = None
+        self._retriever_runs: set[UUID] = set()
+        self.tokens = 0
+        self.stages: dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        STAGE_SECONDS.observe(seconds, stage=stage, mode=self.mode)
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage: str):
+        """Record the duration of the ``with`` block as ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def _stage(self, stage: str, run_id: UUID) -> None:
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            self.observe(stage, time.perf_counter() - start)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id not in self._retriever_runs:
+            self._starts[run_id] = time.perf_counter()
+        self._retriever_runs.add(run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._retriever_runs.discard(run_id)
+        if run_id in self._starts:
+            self._stage("retrieval", run_id)
+            self._retrieved_at = time.perf_counter()
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._retriever_runs.discard(run_id)
+        self._starts.pop(run_id, None)
+
+    def _llm_start(self, run_id: UUID, prompt: str) -> None:
+        now = time.perf_counter()
+        if self._retrieved_at is not None:
+            self.observe("prompt", now - self._retrieved_at)
+            self._retrieved_at = None
+        self._starts[run_id] = now
+        self._prompts[run_id] = prompt
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._llm_start(run_id, "\n".join(prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._llm_start(
+            run_id, "\n".join(str(m.content) for batch in messages for m in batch)
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._stage("llm", run_id)
+        prompt = self._prompts.pop(run_id, "")
+        usage = _usage(response)
+        if usage is None:
+            completion = "".join(
+                g.text for generations in response.generations for g in generations
+            )
+            usage = count_tokens(prompt, self.model), count_tokens(completion, self.model)
+        record_usage(self.mode, *usage)
+        self.tokens += sum(usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+        self._prompts.pop(run_id, None)
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ccc_parser import iter_paragraphs
+
+CCC_PATH = Path(__file__).resolve().parent.parent / "ccc.json"
+
+
+def text(value: str, **attrs) -> dict:
+    return {"type": "text", "text": value, "attrs": attrs}
+
+
+def numbered(number: int, *elements: dict) -> dict:
+    return {"elements": [{"type": "ref-ccc", "ref_number": number}, *elements], "attrs": {}}
+
+
+def line(*elements: dict, indent: bool = False) -> dict:
+    return {"elements": list(elements), "attrs": {"indent": True} if indent else {}}
+
+
+def catechism(paragraphs: list[dict]) -> dict:
+    return {
+        "toc_nodes": {"1": {"text": "Article 11"}},
+        "toc_link_tree": [{"id": "1", "children": []}],
+        "page_nodes": {
+            "1": {
+                "paragraphs": paragraphs,
+                "footnotes": {"7": {"refs": [{"text": "⇒ 1 Thess 4:16"}]}},
+            }
+        },
+    }
+
+
+def test_subheadings_end_paragraphs_and_name_sections():
+    ccc = catechism([
+        line(text("Article 11", b=True)),
+        numbered(1001, text("When? At the last day:"), {"type": "ref", "number": 7}),
+        line(text("For the Lord himself will descend from heaven."), indent=True),
+        line(text("Risen with Christ")),
+        numbered(1002, text("Christ will raise us up")),
+        line(text("on the last day.")),
+        line(text("II. DYING IN CHRIST JESUS")),
+        line(text("The meaning of Christian death", b=True)),
+        numbered(1006, text("Death is the end of earthly life.")),
+    ])
+    paragraphs = list(iter_paragraphs(ccc))
+    assert [(p["number"], p["text"], p["section"]) for p in paragraphs] == [
+        (1001, "When? At the last day:\nFor the Lord himself will descend from heaven.",
+         "Article 11"),
+        (1002, "Christ will raise us up\non the last day.", "Article 11 > Risen with Christ"),
+        (1006, "Death is the end of earthly life.",
+         "Article 11 > The meaning of Christian death"),
+    ]
+    assert paragraphs[0]["footnotes"] == [7]
+    assert paragraphs[0]["citations"] == ["1 Thess 4:16"]
+
+
+def test_quotations_continue_paragraphs():
+    ccc = catechism([
+        numbered(2056, text("The word \"Decalogue\" means \"ten words\".")),
+        line(text("You shall not kill.", i=True)),
+        line(text("commandments.")),
+        numbered(2057, text("The Decalogue must first be understood.")),
+    ])
+    first = next(iter_paragraphs(ccc))
+    assert first["text"].splitlines()[1:] == ["You shall not kill.", "commandments."]
+
+
+@pytest.mark.skipif(not CCC_PATH.exists(), reason="ccc.json not available")
+def test_parses_the_whole_catechism():
+    with open(CCC_PATH, encoding="utf-8") as f:
+        paragraphs = {p["number"]: p for p in iter_paragraphs(json.load(f))}
+    assert len(paragraphs) == 2865
+    assert paragraphs[1001]["text"].endswith("and the dead in Christ will rise first.")
+    assert paragraphs[1002]["section"].endswith("> Risen with Christ")
+    assert "Risen with Christ" not in paragraphs[1001]["text"]
+    assert all(p["text"] for p in paragraphs.values())
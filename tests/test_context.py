@@ -0,0 +1,108 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+import context
+import telemetry
+from context import ContextBudget, Passage, assemble, fit, merge_chunks, merge_verses, stitch
+
+
+@pytest.fixture
+def estimated_tokens(monkeypatch):
+    """Count tokens as ``len(text) // 4`` so budgets do not depend on tiktoken."""
+    monkeypatch.setattr(telemetry, "encoding", lambda model: None)
+    monkeypatch.setattr(context, "encoding", lambda model: None)
+
+
+def bible(reference: str, text: str, score: float = 1.0) -> Passage:
+    return Passage(reference=reference, text=text, metadata={"source": "Bible"}, score=score)
+
+
+def test_stitch_drops_overlap_at_word_boundaries():
+    assert stitch("God so loved the world", "loved the world that he gave") == (
+        "God so loved the world that he gave"
+    )
+    # "ld" is shared but is not a whole word
+    assert stitch("the world", "ld peace") == "the world ld peace"
+    assert stitch("no overlap", "at all") == "no overlap at all"
+
+
+def test_merge_chunks_stitches_one_entry():
+    docs = [
+        Document(page_content="b c d", metadata={"reference": "CCC 1", "chunk_index": 1}),
+        Document(page_content="a b c", metadata={"reference": "CCC 1", "chunk_index": 0}),
+        Document(page_content="x y", metadata={"reference": "CCC 9", "chunk_index": 3}),
+        Document(page_content="a b c", metadata={"reference": "CCC 1", "chunk_index": 0}),
+    ]
+    passages = {p.reference: p for p in merge_chunks(docs)}
+    assert passages["CCC 1"].text == "a b c d"
+    assert "chunk_index" not in passages["CCC 1"].metadata
+    assert passages["CCC 1"].score > passages["CCC 9"].score
+
+
+def test_merge_verses_joins_consecutive_verses():
+    passages = [
+        bible("John 3:17", "For God sent not"),
+        bible("John 3:16", "For God so loved"),
+        bible("John 3:18-19", "He that believeth"),
+        bible("John 3:21", "But he that doth truth"),
+        bible("Romans 8:28", "All things work together"),
+        Passage("CCC 1", "Catechism", {"source": "CCC"}, 1.0),
+    ]
+    merged = {p.reference: p for p in merge_verses(passages)}
+    assert set(merged) == {"John 3:16-19", "John 3:21", "Romans 8:28", "CCC 1"}
+    assert merged["John 3:16-19"].text == (
+        "For God so loved For God sent not He that believeth"
+    )
+    assert merged["John 3:16-19"].score == 3.0
+
+
+def test_merge_verses_keeps_contained_ranges_once():
+    merged = merge_verses([bible("John 3:16-18", "whole"), bible("John 3:17", "part")])
+    assert [(p.reference, p.text, p.score) for p in merged] == [("John 3:16-18", "whole", 2.0)]
+
+
+def test_fit_keeps_best_passages_within_budget(estimated_tokens):
+    passages = [bible(f"John 3:{i}", "word " * 40) for i in range(1, 6)]
+    budget = ContextBudget(max_tokens=150, min_fragment=1000)
+    kept = fit(passages, budget)
+    # Each labelled passage costs 211 // 4 + 2 = 54 tokens
+    assert [p.reference for p in kept] == ["John 3:1", "John 3:2"]
+
+
+def test_fit_truncates_the_last_passage(estimated_tokens):
+    passages = [bible("John 3:1", "word " * 40), bible("John 3:2", "word " * 40)]
+    kept = fit(passages, ContextBudget(max_tokens=80, min_fragment=10))
+    assert [p.reference for p in kept] == ["John 3:1", "John 3:2"]
+    assert kept[1].text.endswith(" …")
+    total = sum(telemetry.count_tokens(p.label()) + 2 for p in kept)
+    assert total <= 80
+
+
+def test_assemble_disabled_budget_returns_docs():
+    docs = [Document(page_content="text", metadata={"reference": "CCC 1"})]
+    assert assemble("question", docs, ContextBudget(max_tokens=0)) is docs
+
+
+def test_failed_encoding_load_is_remembered(monkeypatch):
+    calls = []
+
+    def encoding_for_model(model):
+        calls.append(model)
+        raise OSError("no network")
+
+    monkeypatch.setitem(
+        sys.modules, "tiktoken", types.SimpleNamespace(encoding_for_model=encoding_for_model)
+    )
+    telemetry.encoding.cache_clear()
+    try:
+        assert telemetry.count_tokens("x" * 40) == 10
+        assert telemetry.count_tokens("y" * 40) == 10
+        assert calls == [telemetry.DEFAULT_MODEL]
+    finally:
+        telemetry.encoding.cache_clear()
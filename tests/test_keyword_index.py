@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from keyword_index import BM25Index
+
+REFERENCES = [
+    "John 3:16", "John 3:17", "John 3:18", "1 John 4:8", "Psalms 23:1",
+    "Song of Songs 2:1", "CCC 1021", "CCC 1022",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BM25Index(
+        [f"text of {ref}" for ref in REFERENCES],
+        [{"reference": ref, "source": "catechism" if ref.startswith("CCC") else "bible"}
+         for ref in REFERENCES],
+    )
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("What does the Gospel of John 3:16 mean?", ["John 3:16"]),
+        ("Compare 1 John 4:8 with John 3:16", ["1 John 4:8", "John 3:16"]),
+        ("Explain 1john 4:8", ["1 John 4:8"]),
+        ("Read John 3:16-18", ["John 3:16", "John 3:17", "John 3:18"]),
+        ("What is Psalm 23:1 about?", ["Psalms 23:1"]),
+        ("psalms 23:1", ["Psalms 23:1"]),
+        ("john3:16", ["John 3:16"]),
+        ("Song of Song 2:1", ["Song of Songs 2:1"]),
+        ("See CCC 1021-1022 and CCC §1021", ["CCC 1021", "CCC 1022"]),
+        ("John 9:9 and CCC 9999", []),
+        ("What is grace?", []),
+    ],
+)
+def test_references_in(index, text, expected):
+    assert index.references_in(text) == expected
+
+
+def test_semantic_lookup_skips_questions_with_references(index, monkeypatch):
+    pytest.importorskip("langchain_core")
+    import answering
+    import pipeline
+
+    embedded = []
+
+    class Cache:
+        async def aembed(self, question):
+            embedded.append(question)
+            return [1.0]
+
+        def nearest(self, mode, vector):
+            return None
+
+    monkeypatch.setattr(pipeline, "get_semantic_cache", Cache)
+    monkeypatch.setattr(pipeline, "get_keyword_index", lambda: index)
+    assert asyncio.run(answering.semantic_lookup("bible", "Explain John 3:16", 1)) == (
+        None, None, "miss"
+    )
+    assert asyncio.run(answering.semantic_lookup("bible", "What is grace?", 1)) == (
+        None, [1.0], "miss"
+    )
+    assert embedded == ["What is grace?"]
@@ -0,0 +1,89 @@
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from metrics import EventLog
+
+
+def make_log(tmp_path, **kwargs) -> EventLog:
+    kwargs.setdefault("flush_interval", 3600)
+    return EventLog(tmp_path / "metrics.csv", **kwargs)
+
+
+def test_counts_buffered_events(tmp_path):
+    log = make_log(tmp_path)
+    for event in ["open", "ask", "ask"]:
+        log.log(event)
+    assert log.counts() == {"open": 1, "ask": 2}
+    assert (tmp_path / "metrics.csv").read_text().splitlines()[0] == "timestamp,event"
+
+
+def test_rotates_by_size_and_keeps_counts(tmp_path):
+    log = make_log(tmp_path, batch_size=1, max_bytes=200)
+    for i in range(30):
+        log.log("ask" if i % 3 else "open")
+    rotated = sorted(tmp_path.glob("metrics.*.*.csv"))
+    assert rotated
+    assert (tmp_path / "metrics.summary.json").exists()
+    assert log.counts() == {"ask": 20, "open": 10}
+    # A new worker starts from the summary and the live file
+    assert make_log(tmp_path).counts() == {"ask": 20, "open": 10}
+
+
+def test_rotates_at_new_day(tmp_path):
+    log = make_log(tmp_path)
+    log.log("ask")
+    log.flush()
+    yesterday = time.time() - 86400
+    os.utime(tmp_path / "metrics.csv", (yesterday, yesterday))
+    log.log("ask")
+    log.flush()
+    day = datetime.utcfromtimestamp(yesterday).date().isoformat()
+    assert (tmp_path / f"metrics.{day}.0.csv").exists()
+    assert log.counts() == {"ask": 2}
+
+
+def test_counts_picks_up_other_workers(tmp_path):
+    first, second = make_log(tmp_path), make_log(tmp_path)
+    first.log("open")
+    second.log("ask")
+    second.flush()
+    assert first.counts() == {"open": 1, "ask": 1}
+
+
+def test_counts_by_time_range(tmp_path):
+    log = make_log(tmp_path)
+    log.log("ask")
+    now = datetime.utcnow()
+    assert log.counts(start=now - timedelta(hours=1)) == {"ask": 1}
+    assert log.counts(end=now - timedelta(hours=1)) == {}
+    assert log.counts(start=now + timedelta(hours=1)) == {}
+
+
+def test_counts_converts_aware_datetimes_to_utc(tmp_path):
+    log = make_log(tmp_path)
+    log.log("ask")
+    # Now in UTC-05:00; compared without conversion its hour is 5 hours early
+    local = datetime.now(timezone(timedelta(hours=-5)))
+    assert log.counts(end=local) == {"ask": 1}
+    assert log.counts(start=local + timedelta(hours=1)) == {}
+
+
+def test_summary_compacts_old_hours(tmp_path):
+    summary = {"2020-01-01T05": {"ask": 2}, "2020-01-01T06": {"ask": 3, "open": 1}}
+    (tmp_path / "metrics.summary.json").write_text(json.dumps(summary))
+    log = make_log(tmp_path, batch_size=1, max_bytes=1)
+    log.log("ask")
+    log.log("ask")
+
+    saved = json.loads((tmp_path / "metrics.summary.json").read_text())
+    assert saved["2020-01-01"] == {"ask": 5, "open": 1}
+    assert not any(key.startswith("2020-01-01T") for key in saved)
+    assert sum((Counter(c) for c in saved.values()), Counter())["ask"] == 6
+    # Compacted days count when their date is in range
+    day = datetime(2020, 1, 1, 12)
+    assert log.counts(start=day, end=day) == {"ask": 5, "open": 1}
+    assert log.counts(start=datetime(2020, 1, 2)) == {"ask": 2}
+    assert log.counts() == {"ask": 7, "open": 1}
@@ -0,0 +1,79 @@
+import hashlib
+
+import pytest
+
+import passwords
+from passwords import Cost, VerifyCache, hash_password, needs_rehash, verify
+
+FAST = Cost(n=2 ** 4, r=8, p=1)
+
+
+@pytest.fixture(autouse=True)
+def fast_cost(monkeypatch):
+    monkeypatch.setattr(passwords, "COST", FAST)
+
+
+def test_verifies_scrypt_hashes():
+    stored = hash_password("Ave Maria")
+    assert stored.startswith("scrypt$16$8$1$")
+    assert verify("Ave Maria", stored) == (True, False)
+    assert verify("Ave maria", stored) == (False, False)
+    assert not needs_rehash(stored)
+
+
+def test_legacy_sha256_hashes_verify_and_need_rehash():
+    stored = hashlib.sha256(b"Ave Maria").hexdigest()
+    assert verify("Ave Maria", stored) == (True, True)
+    assert verify("Pater Noster", stored) == (False, True)
+    assert needs_rehash(stored)
+
+
+def test_cost_change_needs_rehash(monkeypatch):
+    stored = hash_password("Ave Maria")
+    monkeypatch.setattr(passwords, "COST", Cost(n=2 ** 5, r=8, p=1))
+    assert needs_rehash(stored)
+    # The old cost is read from the hash, so it still verifies
+    assert verify("Ave Maria", stored) == (True, True)
+    assert not needs_rehash(hash_password("Ave Maria"))
+
+
+@pytest.mark.parametrize(
+    "stored",
+    [
+        "scrypt$16$8$1$salt",
+        "scrypt$sixteen$8$1$c2FsdA==$a2V5",
+        "scrypt$16$8$1$not base64!$a2V5",
+        "scrypt$15$8$1$c2FsdA==$a2V5",
+    ],
+)
+def test_malformed_scrypt_hashes_never_match(stored):
+    assert verify("Ave Maria", stored) == (False, False)
+
+
+def test_verify_cache_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(passwords.time, "monotonic", lambda: now[0])
+    cache = VerifyCache(ttl=60)
+    assert not cache.check("Ave Maria", "stored")
+    cache.add("Ave Maria", "stored")
+    assert cache.check("Ave Maria", "stored")
+    assert not cache.check("Ave maria", "stored")
+    assert not cache.check("Ave Maria", "other")
+    now[0] += 61
+    assert not cache.check("Ave Maria", "stored")
+    assert cache.stats() == {"hits": 1, "misses": 4, "entries": 0}
+
+
+def test_verify_cache_disabled_by_zero_ttl():
+    cache = VerifyCache(ttl=0)
+    cache.add("Ave Maria", "stored")
+    assert not cache.check("Ave Maria", "stored")
+    assert cache.stats()["entries"] == 0
+
+
+def test_verify_cache_is_bounded():
+    cache = VerifyCache(max_entries=2, ttl=60)
+    for password in ("one", "two", "three"):
+        cache.add(password, "stored")
+    assert not cache.check("one", "stored")
+    assert cache.check("three", "stored")
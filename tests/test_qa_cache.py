@@ -0,0 +1,85 @@
+import json
+import time
+
+import pytest
+
+from qa_cache import MemoryCache, SQLiteCache, cache_key, normalize_question
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "sqlite":
+            return SQLiteCache(tmp_path / "qa_cache.db", **kwargs)
+        return MemoryCache(**kwargs)
+
+    return make
+
+
+def test_get_set_delete(make_cache):
+    cache = make_cache()
+    assert cache.get("bible|a") is None
+    cache.set("bible|a", {"answer": "A"})
+    assert cache.get("bible|a") == {"answer": "A"}
+    cache.delete("bible|a")
+    assert cache.get("bible|a") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "entries": 0}
+
+
+def test_evicts_least_recently_used(make_cache):
+    cache = make_cache(max_entries=100)
+    sqlite = isinstance(cache, SQLiteCache)
+    if sqlite:
+        cache.touch_interval = 0
+    for i in range(100):
+        cache.set(f"k{i}", {"i": i})
+        if sqlite:
+            # Access times must differ for the order to be defined
+            time.sleep(0.001)
+    assert cache.get("k0") == {"i": 0}
+    cache.set("k100", {"i": 100})
+    assert len(cache) <= 100
+    assert cache.get("k0") == {"i": 0}
+    assert cache.get("k1") is None
+    assert cache.get("k100") == {"i": 100}
+    assert cache.evictions >= 1
+
+
+def test_expires_after_ttl(make_cache, monkeypatch):
+    cache = make_cache(ttl=60)
+    cache.set("k", {"answer": "A"})
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    assert cache.get("k") == {"answer": "A"}
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_cache_key_normalizes_question():
+    assert normalize_question("  Who is   JESUS?! ") == "who is jesus"
+    assert cache_key("bible", "Who is Jesus?") == cache_key("bible", "who is jesus")
+    assert cache_key("bible", "Who is Jesus?") != cache_key("both", "Who is Jesus?")
+
+
+def test_import_json_rekeys_legacy_entries(tmp_path):
+    legacy = tmp_path / "qa_cache.json"
+    legacy.write_text(json.dumps({
+        "bible|Who is Jesus?": {"answer": "old"},
+        "catechism|what is grace": {"answer": "grace"},
+        "no separator": {"answer": "kept"},
+    }))
+    cache = SQLiteCache(tmp_path / "qa_cache.db")
+    cache.set(cache_key("bible", "who is jesus"), {"answer": "new"})
+
+    assert cache.import_json(legacy) == 3
+    # Existing entries win over imported ones
+    assert cache.get(cache_key("bible", "Who is Jesus?")) == {"answer": "new"}
+    assert cache.get(cache_key("catechism", "What is grace?")) == {"answer": "grace"}
+    assert cache.get("no separator") == {"answer": "kept"}
+    assert len(cache) == 3
+
+
+def test_import_json_without_file(tmp_path):
+    cache = SQLiteCache(tmp_path / "qa_cache.db")
+    assert cache.import_json(tmp_path / "missing.json") == 0
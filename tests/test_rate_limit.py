@@ -0,0 +1,113 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from rate_limit import DailyTokenBudget, MemoryLimiter, SQLiteLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_limiter(request, tmp_path):
+    def make(name: str, per_minute: float):
+        if request.param == "sqlite":
+            return SQLiteLimiter(name, per_minute, tmp_path / "rate_limits.db")
+        return MemoryLimiter(name, per_minute)
+
+    return make
+
+
+def test_allows_a_burst_then_limits(make_limiter, clock):
+    limiter = make_limiter("qa", 6)
+    assert [limiter.take("ip") for _ in range(6)] == [0.0] * 6
+    # Refilled at one token every 10 seconds
+    assert limiter.take("ip") == pytest.approx(10)
+    clock.now += 10
+    assert limiter.take("ip") == 0.0
+    assert limiter.take("ip") > 0
+    assert limiter.stats() == {"allowed": 7, "limited": 2}
+
+
+def test_keys_are_independent(make_limiter, clock):
+    limiter = make_limiter("qa", 1)
+    assert limiter.take("a") == 0.0
+    assert limiter.take("a") > 0
+    assert limiter.take("b") == 0.0
+
+
+def test_refill_is_capped(make_limiter, clock):
+    limiter = make_limiter("qa", 2)
+    limiter.take("ip")
+    clock.now += 3600
+    assert [limiter.take("ip") for _ in range(3)][-1] > 0
+
+
+def test_zero_disables(make_limiter, clock):
+    limiter = make_limiter("qa", 0)
+    assert not limiter.enabled
+    assert all(limiter.take("ip") == 0.0 for _ in range(100))
+
+
+def test_sqlite_limiters_share_buckets_by_name(tmp_path, clock):
+    path = tmp_path / "rate_limits.db"
+    first, second = SQLiteLimiter("qa", 1, path), SQLiteLimiter("qa", 1, path)
+    other = SQLiteLimiter("llm", 1, path)
+    assert first.take("ip") == 0.0
+    assert second.take("ip") > 0
+    assert other.take("ip") == 0.0
+
+
+def test_memory_limiter_forgets_oldest_keys(clock):
+    limiter = MemoryLimiter("qa", 1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.take(key)
+    # "a" was forgotten and starts with a full bucket again
+    assert limiter.take("a") == 0.0
+    assert limiter.take("c") > 0
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_daily_budget(backend, tmp_path):
+    path = tmp_path / "rate_limits.db" if backend == "sqlite" else None
+    budget = DailyTokenBudget(100, path)
+    assert budget.check("user") == 0.0
+    budget.add("user", 60)
+    budget.add("user", 40)
+    assert budget.used("user") == 100
+    assert 0 < budget.check("user") <= 86400
+    assert budget.check("other") == 0.0
+    assert budget.stats() == {"exhausted": 1}
+
+
+def test_daily_budget_disabled():
+    budget = DailyTokenBudget(0)
+    budget.add("user", 10 ** 6)
+    assert budget.used("user") == 0
+    assert budget.check("user") == 0.0
+
+
+def test_daily_budget_deletes_previous_days(tmp_path):
+    path = tmp_path / "rate_limits.db"
+    budget = DailyTokenBudget(100, path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO token_usage VALUES ('user', '2000-01-01', 50)")
+    budget.add("user", 10)
+    with sqlite3.connect(path) as conn:
+        days = [row[0] for row in conn.execute("SELECT day FROM token_usage")]
+    assert days == [datetime.utcnow().date().isoformat()]
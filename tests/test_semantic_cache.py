@@ -0,0 +1,74 @@
+import sqlite3
+
+import numpy as np
+
+from embedding import FakeEmbeddings
+from semantic_cache import SemanticCache
+
+
+class NamedEmbeddings(FakeEmbeddings):
+    def __init__(self, model: str, size: int):
+        super().__init__(size=size)
+        self.model = model
+
+
+def make_cache(path, embeddings, **kwargs) -> SemanticCache:
+    kwargs.setdefault("threshold", 0.9)
+    return SemanticCache(embeddings, path=path, refresh_interval=3600, **kwargs)
+
+
+def test_finds_paraphrases_per_mode(tmp_path):
+    cache = make_cache(tmp_path / "qa.db", FakeEmbeddings(size=256))
+    cache.add("bible", "bible|who is jesus", cache.embed("Who is Jesus?"))
+    assert cache.nearest("bible", cache.embed("who is Jesus")) == "bible|who is jesus"
+    assert cache.nearest("catechism", cache.embed("who is Jesus")) is None
+    assert cache.nearest("bible", cache.embed("what is grace")) is None
+
+
+def test_workers_share_the_index(tmp_path):
+    first = make_cache(tmp_path / "qa.db", FakeEmbeddings(size=256))
+    second = make_cache(tmp_path / "qa.db", FakeEmbeddings(size=256))
+    first.add("bible", "bible|who is jesus", first.embed("Who is Jesus?"))
+    second.refresh()
+    assert second.nearest("bible", second.embed("who is jesus")) == "bible|who is jesus"
+    second.discard("bible", "bible|who is jesus")
+    assert make_cache(tmp_path / "qa.db", FakeEmbeddings(size=256)).stats()["entries"] == 0
+
+
+def test_vector_size_change_starts_a_fresh_index(tmp_path):
+    old = make_cache(tmp_path / "qa.db", FakeEmbeddings(size=256))
+    old.add("bible", "bible|who is jesus", old.embed("Who is Jesus?"))
+
+    new = make_cache(tmp_path / "qa.db", FakeEmbeddings(size=384))
+    # Old vectors are never compared with new ones
+    assert new.nearest("bible", new.embed("who is jesus")) is None
+    new.add("bible", "bible|what is grace", new.embed("What is grace?"))
+    assert new.nearest("bible", new.embed("what is grace")) == "bible|what is grace"
+    with sqlite3.connect(tmp_path / "qa.db") as conn:
+        assert conn.execute("SELECT key, dim FROM semantic_cache").fetchall() == [
+            ("bible|what is grace", 384)
+        ]
+
+
+def test_rows_of_another_model_are_purged(tmp_path):
+    old = make_cache(tmp_path / "qa.db", NamedEmbeddings("text-embedding-3-small", 256))
+    old.add("bible", "bible|who is jesus", old.embed("Who is Jesus?"))
+    new = make_cache(tmp_path / "qa.db", NamedEmbeddings("all-MiniLM-L6-v2", 256))
+    assert new.stats()["entries"] == 0
+    assert new.nearest("bible", new.embed("who is jesus")) is None
+
+
+def test_legacy_table_is_migrated(tmp_path):
+    with sqlite3.connect(tmp_path / "qa.db") as conn:
+        conn.execute(
+            "CREATE TABLE semantic_cache (id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " mode TEXT NOT NULL, key TEXT NOT NULL UNIQUE, vector BLOB NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO semantic_cache (mode, key, vector) VALUES (?, ?, ?)",
+            ("bible", "bible|old", np.ones(384, dtype=np.float32).tobytes()),
+        )
+    cache = make_cache(tmp_path / "qa.db", FakeEmbeddings(size=256))
+    assert cache.stats()["entries"] == 0
+    cache.add("bible", "bible|new", cache.embed("new"))
+    assert cache.nearest("bible", cache.embed("new")) == "bible|new"
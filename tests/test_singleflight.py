@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_do_runs_once_for_concurrent_callers():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("k", compute) for _ in range(5)))
+        assert calls == 1
+        assert [r for r, _ in results] == ["answer"] * 5
+        assert [shared for _, shared in results] == [False] + [True] * 4
+        assert flight.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+        # Finished keys are forgotten, so the next call computes again
+        await flight.do("k", compute)
+        assert calls == 2
+
+    asyncio.run(main())
+
+
+def test_do_shares_exceptions():
+    async def main():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream")
+
+        results = await asyncio.gather(
+            flight.do("k", fail), flight.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        assert "k" not in flight
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "answer"
+
+        first = asyncio.ensure_future(flight.do("k", compute))
+        second = asyncio.ensure_future(flight.do("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        assert await second == ("answer", True)
+
+    asyncio.run(main())
+
+
+def test_computation_cancelled_when_nobody_waits():
+    async def main():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(flight.do("k", compute))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert "k" not in flight
+
+    asyncio.run(main())
+
+
+def test_stream_late_joiners_get_every_item():
+    async def main():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def tokens():
+            yield "a"
+            started.set()
+            await release.wait()
+            yield "b"
+            yield "c"
+
+        async def collect():
+            return [item async for item in flight.stream("k", tokens)]
+
+        first = asyncio.ensure_future(collect())
+        await started.wait()
+        second = asyncio.ensure_future(collect())
+        await asyncio.sleep(0)
+        release.set()
+        assert await first == [("a", False), ("b", False), ("c", False)]
+        assert await second == [("a", True), ("b", True), ("c", True)]
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_stream_reraises_producer_error():
+    async def main():
+        flight = SingleFlight()
+
+        async def tokens():
+            yield "a"
+            raise RuntimeError("model failed")
+
+        items = []
+        with pytest.raises(RuntimeError):
+            async for item, _ in flight.stream("k", tokens):
+                items.append(item)
+        assert items == ["a"]
+
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+import subscribers
+from subscribers import MailchimpError, SubscriberStore, SyncWorker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(subscribers.time, "time", lambda: now[0])
+    return now
+
+
+class FakeClient:
+    timeout = 10
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.down = False
+        self.batches = []
+
+    def subscribe(self, emails):
+        self.batches.append(list(emails))
+        if self.down:
+            raise MailchimpError("POST 503: unavailable")
+        return {email: "Invalid Resource" for email in emails if email in self.fail}
+
+
+def test_add_deduplicates(tmp_path):
+    store = SubscriberStore(tmp_path / "subscribers.db")
+    assert store.add("anna@example.com")
+    assert not store.add("anna@example.com")
+    assert store.stats() == {"total": 1, "pending": 1}
+
+
+def test_claimed_rows_wait_for_the_lease(tmp_path, clock):
+    store = SubscriberStore(tmp_path / "subscribers.db")
+    for email in ("a@example.com", "b@example.com", "c@example.com"):
+        store.add(email)
+    assert store.claim(2, lease=30) == ["a@example.com", "b@example.com"]
+    assert store.claim(10, lease=30) == ["c@example.com"]
+    assert store.claim(10, lease=30) == []
+    clock[0] += 31
+    # A worker that died mid-batch only delays its rows
+    assert sorted(store.claim(10, lease=30)) == ["a@example.com", "b@example.com", "c@example.com"]
+
+
+def test_two_claimers_never_share_a_row(tmp_path):
+    SubscriberStore(tmp_path / "subscribers.db")
+    emails = [f"user{n}@example.com" for n in range(200)]
+    for email in emails:
+        SubscriberStore(tmp_path / "subscribers.db").add(email)
+    claimed: list[list[str]] = [[], []]
+
+    def claimer(n):
+        store = SubscriberStore(tmp_path / "subscribers.db")
+        while batch := store.claim(7, lease=600):
+            claimed[n].extend(batch)
+
+    threads = [threading.Thread(target=claimer, args=(n,)) for n in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not set(claimed[0]) & set(claimed[1])
+    assert sorted(claimed[0] + claimed[1]) == sorted(emails)
+
+
+def test_failures_back_off_and_retry(tmp_path, clock):
+    store = SubscriberStore(tmp_path / "subscribers.db")
+    store.add("ok@example.com")
+    store.add("bad@example.com")
+    client = FakeClient(fail={"bad@example.com"})
+    worker = SyncWorker(store, client, retry_delay=30, max_retry_delay=100, max_attempts=3)
+
+    assert worker.sync_once() == 2
+    assert worker.stats() == {"synced": 1, "failed": 1}
+    assert store.stats() == {"total": 2, "pending": 1}
+    # Retried after 30s, then 60s
+    for delay in (30, 60):
+        clock[0] += delay - 1
+        assert worker.sync_once() == 0
+        clock[0] += 1
+        assert worker.sync_once() == 1
+    assert client.batches[1:] == [["bad@example.com"]] * 2
+    # The third failure was the last attempt; its 120s backoff is capped at 100s
+    clock[0] += 100
+    assert worker.sync_once() == 0
+    assert store.claim(10, lease=30, max_attempts=4) == ["bad@example.com"]
+
+
+def test_unavailable_mailchimp_retries_the_whole_batch(tmp_path, clock):
+    store = SubscriberStore(tmp_path / "subscribers.db")
+    store.add("a@example.com")
+    store.add("b@example.com")
+    client = FakeClient()
+    worker = SyncWorker(store, client, retry_delay=30)
+    client.down = True
+    assert worker.sync_once() == 2
+    assert store.stats()["pending"] == 2
+    client.down = False
+    clock[0] += 30
+    assert worker.sync_once() == 2
+    assert store.stats() == {"total": 2, "pending": 0}
@@ -0,0 +1,59 @@
+import json
+import threading
+
+from user_store import SQLiteUserStore
+
+
+def test_emails_are_unique(tmp_path):
+    store = SQLiteUserStore(tmp_path / "users.db")
+    assert store.create("anna@example.com", "hash-1")
+    assert not store.create("anna@example.com", "hash-2")
+    assert store.get("anna@example.com")["password_hash"] == "hash-1"
+    assert store.get("nobody@example.com") is None
+    store.set_password_hash("anna@example.com", "hash-3")
+    assert store.get("anna@example.com")["password_hash"] == "hash-3"
+    assert len(store) == 1
+
+
+def test_concurrent_signups_create_one_account(tmp_path):
+    SQLiteUserStore(tmp_path / "users.db")
+    results = []
+
+    def signup(n):
+        store = SQLiteUserStore(tmp_path / "users.db")
+        results.append(store.create("anna@example.com", f"hash-{n}"))
+
+    threads = [threading.Thread(target=signup, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False] * 7 + [True]
+    assert len(SQLiteUserStore(tmp_path / "users.db")) == 1
+
+
+def test_import_json_keeps_existing_accounts(tmp_path):
+    legacy = tmp_path / "users.json"
+    legacy.write_text(json.dumps({
+        "anna@example.com": {"password_hash": "legacy-1", "created_at": "2024-01-01T00:00:00"},
+        "ben@example.com": {"password_hash": "legacy-2"},
+    }))
+    store = SQLiteUserStore(tmp_path / "users.db")
+    store.create("anna@example.com", "new-hash")
+
+    assert store.import_json(legacy) == 2
+    assert store.import_json(legacy) == 2
+    assert len(store) == 2
+    assert store.get("anna@example.com")["password_hash"] == "new-hash"
+    assert store.get("ben@example.com")["password_hash"] == "legacy-2"
+    assert store.get("ben@example.com")["created_at"]
+    assert json.loads(legacy.read_text())["anna@example.com"]["password_hash"] == "legacy-1"
+
+
+def test_import_json_ignores_missing_or_broken_files(tmp_path):
+    store = SQLiteUserStore(tmp_path / "users.db")
+    assert store.import_json(tmp_path / "missing.json") == 0
+    broken = tmp_path / "users.json"
+    broken.write_text("{not json")
+    assert store.import_json(broken) == 0
+    assert len(store) == 0
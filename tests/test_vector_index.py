@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import vector_index
+from vector_index import NumpyVectorStore, write_index
+
+DIM = 64
+
+
+def corpus(n: int, seed: int = 0):
+    """Clustered unit vectors, so a low-dimensional projection keeps their order."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(16, DIM))
+    vectors = centers[rng.integers(0, 16, n)] + 0.3 * rng.normal(size=(n, DIM))
+    texts = [f"chunk {i}" for i in range(n)]
+    metadatas = [
+        {"reference": f"ref {i}", "source": "bible" if i % 3 else "catechism"}
+        for i in range(n)
+    ]
+    return vectors.astype(np.float32), texts, metadatas
+
+
+def brute_force(vectors, metadatas, query, k, source=None):
+    """Texts of the ``k`` rows most similar to ``query``, best first."""
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    rows = [i for i in np.argsort(-scores) if source is None or metadatas[i]["source"] == source]
+    return [f"chunk {i}" for i in rows[:k]], scores
+
+
+def found(store, query, k, source=None):
+    docs = store.similarity_search_by_vector(
+        query, k=k, filter={"source": source} if source else None
+    )
+    return [doc.page_content for doc in docs]
+
+
+@pytest.mark.parametrize("source", [None, "bible", "catechism"])
+def test_exact_search_matches_brute_force(tmp_path, source):
+    vectors, texts, metadatas = corpus(500)
+    write_index(tmp_path / "index", vectors, texts, metadatas)
+    store = NumpyVectorStore(tmp_path / "index", embedding=None)
+    assert store.projected is None
+    rng = np.random.default_rng(1)
+    for query in rng.normal(size=(20, DIM)).astype(np.float32):
+        expected, scores = brute_force(vectors, metadatas, query, 8, source)
+        assert found(store, query, 8, source) == expected
+        if source is None:
+            [(_, score)] = store.search(query, k=1)
+            assert score == pytest.approx(scores.max(), abs=1e-5)
+
+
+def test_results_carry_text_and_metadata(tmp_path):
+    vectors, texts, metadatas = corpus(50)
+    write_index(tmp_path / "index", vectors, texts, metadatas)
+    store = NumpyVectorStore(tmp_path / "index", embedding=None)
+    doc, score = store.similarity_search_with_score_by_vector(vectors[7], k=1)[0]
+    assert doc.page_content == "chunk 7"
+    assert doc.metadata == metadatas[7]
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_projected_search_recall(tmp_path, monkeypatch, quantize):
+    monkeypatch.setattr(vector_index, "EXACT_SEARCH_LIMIT", 100)
+    monkeypatch.setattr(vector_index, "CANDIDATES", 64)
+    vectors, texts, metadatas = corpus(3000)
+    write_index(
+        tmp_path / "index", vectors, texts, metadatas, quantize=quantize, projection_dim=16
+    )
+    store = NumpyVectorStore(tmp_path / "index", embedding=None)
+    assert store.projected is not None
+    rng = np.random.default_rng(2)
+    recalls = []
+    for query in vectors[rng.choice(len(vectors), 50)] + 0.1 * rng.normal(size=(50, DIM)):
+        expected, _ = brute_force(vectors, metadatas, query, 8, "bible")
+        recalls.append(len(set(found(store, query, 8, "bible")) & set(expected)) / 8)
+    assert np.mean(recalls) >= 0.9
+
+
+def test_rejects_mismatched_dimensions_and_filters(tmp_path):
+    vectors, texts, metadatas = corpus(20)
+    write_index(tmp_path / "index", vectors, texts, metadatas)
+    store = NumpyVectorStore(tmp_path / "index", embedding=None)
+    with pytest.raises(ValueError):
+        store.search([0.1] * (DIM + 1))
+    with pytest.raises(ValueError):
+        store.search(vectors[0], filter={"reference": "ref 1"})
+    assert store.search(vectors[0], filter={"source": "unknown"}) == []
+
+
+def test_refuses_store_of_another_embedding_model(tmp_path, monkeypatch):
+    pytest.importorskip("langchain_chroma")
+    import build_db
+    from embedding import FakeEmbeddings
+    from langchain_chroma import Chroma
+
+    persist_dir = str(tmp_path / "chroma")
+    small, large = FakeEmbeddings(size=8), FakeEmbeddings(size=16)
+    db = Chroma(persist_directory=persist_dir, embedding_function=small)
+    build_db.claim_store(db, small, persist_dir)
+    db.add_texts(["In the beginning"], ids=["a"])
+    assert vector_index.stored_model(db) == "fake-8"
+
+    monkeypatch.setenv("VECTOR_BACKEND", "chroma")
+    assert vector_index.make_vectorstore(small, persist_dir) is not None
+    with pytest.raises(RuntimeError, match="fake-8"):
+        vector_index.make_vectorstore(large, persist_dir)
+    reopened = Chroma(persist_directory=persist_dir, embedding_function=large)
+    with pytest.raises(RuntimeError, match="fake-8"):
+        build_db.claim_store(reopened, large, persist_dir)
+
+    vectors = np.ones((1, 8), dtype=np.float32)
+    write_index(tmp_path / "index", vectors, ["a"], [{}], embedding_model="fake-8")
+    monkeypatch.setenv("VECTOR_BACKEND", "numpy")
+    monkeypatch.setenv("NUMPY_INDEX_DIR", str(tmp_path / "index"))
+    assert vector_index.make_vectorstore(small, persist_dir).embedding_model == "fake-8"
+    with pytest.raises(RuntimeError, match="fake-8"):
+        vector_index.make_vectorstore(large, persist_dir)
+
+
+def test_claims_legacy_store_of_matching_size(tmp_path):
+    pytest.importorskip("langchain_chroma")
+    import build_db
+    from embedding import FakeEmbeddings
+    from langchain_chroma import Chroma
+
+    persist_dir = str(tmp_path / "chroma")
+    db = Chroma(persist_directory=persist_dir, embedding_function=FakeEmbeddings(size=8))
+    db.add_texts(["In the beginning"], ids=["a"])
+    with pytest.raises(RuntimeError, match="8-d"):
+        build_db.claim_store(db, FakeEmbeddings(size=16), persist_dir)
+    build_db.claim_store(db, FakeEmbeddings(size=8), persist_dir)
+    assert vector_index.stored_model(db) == "fake-8"
@@ -0,0 +1,58 @@
+import pytest
+
+from verse_store import VerseStore, parse_reference
+
+BIBLE = {
+    "John": {
+        "3": {
+            "16": "For God so loved the world",
+            "17": "For God sent not",
+            "18": "He that believeth",
+        },
+    },
+    "1 John": {"4": {"8": "God is charity"}},
+    "Song of Songs": {"2": {"1": "I am the flower of the field"}},
+}
+
+
+@pytest.mark.parametrize(
+    "ref, expected",
+    [
+        ("John 3:16", ("John", 3, 16, 16)),
+        ("John 3:16-18", ("John", 3, 16, 18)),
+        ("John 3:16 – 18", ("John", 3, 16, 18)),
+        ("John 3", ("John", 3, None, None)),
+        ("  1 John 4:8 ", ("1 John", 4, 8, 8)),
+        ("1John 4:8", ("1John", 4, 8, 8)),
+        ("Song of Songs 2:1", ("Song of Songs", 2, 1, 1)),
+        ("Jn. 3:16", ("Jn", 3, 16, 16)),
+    ],
+)
+def test_parse_reference(ref, expected):
+    assert parse_reference(ref) == expected
+
+
+@pytest.mark.parametrize("ref", ["", "John", "3:16", "John 3:16 and more"])
+def test_parse_reference_rejects(ref):
+    assert parse_reference(ref) is None
+
+
+def test_lookup_verse_and_range():
+    store = VerseStore(BIBLE)
+    assert store.lookup("John 3:16") == [("John 3:16", "For God so loved the world")]
+    assert [ref for ref, _ in store.lookup("john 3:17-20")] == ["John 3:17", "John 3:18"]
+    assert len(store.lookup("John 3")) == 3
+
+
+def test_lookup_normalizes_book_names():
+    store = VerseStore(BIBLE)
+    assert store.lookup("1john 4:8") == [("1 John 4:8", "God is charity")]
+    assert store.get("song of songs", 2, 1) == "I am the flower of the field"
+
+
+def test_lookup_unknown():
+    store = VerseStore(BIBLE)
+    assert store.lookup("Genesis 1:1") == []
+    assert store.lookup("John 4:1") == []
+    assert store.lookup("not a reference") == []
+    assert store.get("John", 3, 99) is None
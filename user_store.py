@@ -0,0 +1,140 @@
+"""Account storage for the /auth endpoints.
+
+``SQLiteUserStore`` keeps one row per account in a WAL-mode SQLite file with
+a unique index on the email, so a signup is a single-row transactional
+insert: its cost does not grow with the number of users, and concurrent
+signups from several threads or uvicorn workers cannot overwrite each other.
+Use :func:`make_user_store` to open the store configured by the environment;
+a new store imports the legacy ``users.json`` once.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+LEGACY_USERS_FILE = Path("users.json")
+
+
+class UserStore:
+    """Interface of the account store. Emails are stored as given."""
+
+    def get(self, email: str) -> dict | None:
+        """Return ``{"email", "password_hash", "created_at"}`` or None."""
+        raise NotImplementedError
+
+    def create(self, email: str, password_hash: str) -> bool:
+        """Add an account; return False if the email is already taken."""
+        raise NotImplementedError
+
+    def set_password_hash(self, email: str, password_hash: str) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class SQLiteUserStore(UserStore):
+    """Accounts in a SQLite table with a unique email index."""
+
+    def __init__(self, path: str | Path = "users.db"):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " id INTEGER PRIMARY KEY,"
+                " email TEXT NOT NULL,"
+                " password_hash TEXT NOT NULL,"
+                " created_at TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, email: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT email, password_hash, created_at FROM users WHERE email = ?",
+            (email,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"email": row[0], "password_hash": row[1], "created_at": row[2]}
+
+    def create(self, email: str, password_hash: str) -> bool:
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO users (email, password_hash, created_at)"
+                    " VALUES (?, ?, ?)",
+                    (email, password_hash, datetime.utcnow().isoformat()),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def set_password_hash(self, email: str, password_hash: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE users SET password_hash = ? WHERE email = ?",
+                (password_hash, email),
+            )
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def import_json(self, file_path: Path = LEGACY_USERS_FILE) -> int:
+        """Copy accounts from the old ``users.json`` file, if present.
+
+        Existing emails are left untouched and the file itself is not
+        modified. Returns the number of accounts read.
+        """
+        if not file_path.exists():
+            return 0
+        try:
+            with file_path.open("r") as f:
+                legacy = json.load(f)
+        except Exception:
+            return 0
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (email, password_hash, created_at)"
+                " VALUES (?, ?, ?)",
+                [
+                    (
+                        email,
+                        user["password_hash"],
+                        user.get("created_at") or datetime.utcnow().isoformat(),
+                    )
+                    for email, user in legacy.items()
+                ],
+            )
+        return len(legacy)
+
+
+def make_user_store() -> UserStore:
+    """Open the SQLite user store at ``USERS_DB_PATH`` (default ``users.db``).
+
+    A new, empty store imports the legacy ``users.json`` once; the import is
+    idempotent, so workers starting together cannot duplicate accounts.
+    """
+    store = SQLiteUserStore(os.getenv("USERS_DB_PATH", "users.db"))
+    if len(store) == 0:
+        imported = store.import_json()
+        if imported:
+            print(f"Imported {imported} users from {LEGACY_USERS_FILE}")
+    return store
@@ -0,0 +1,358 @@
+"""Vector store backends: Chroma or a memory-mapped NumPy index.
+
+The corpus is fixed between ``build_db.py`` runs and small enough to keep
+in one matrix, so Chroma's general-purpose query path is not needed to serve
+it. :class:`NumpyVectorStore` reads an index exported from the Chroma store:
+
+- ``vectors.npy``: one L2-normalized row per chunk, float32, or int8 with a
+  float32 scale per row in ``scales.npy`` (a quarter of the size);
+- ``projected.npy`` / ``projection.npy``: every row projected onto the
+  top ``PROJECTION_DIM`` principal components of the corpus;
+- ``rows.bin`` / ``offsets.npy``: each chunk's text and metadata as JSON;
+- ``index.json``: shape, dtype, embedding model and the row range of each
+  ``source``.
+
+Rows are sorted by ``source``, so the Bible/CCC filters of the source modes
+select a contiguous slice. Scanning full 1536-d rows is bound by memory
+bandwidth (tens of milliseconds for the whole corpus), so like the semantic
+cache the search scores the small projected matrix first and rescores only
+the best ``CANDIDATES`` rows exactly; corpora under ``EXACT_SEARCH_LIMIT``
+rows get no projection and are scanned exactly. Every file is memory-mapped:
+workers share the pages through the OS page cache, and only the projected
+matrix is read in full.
+
+:func:`make_vectorstore` picks the backend from ``VECTOR_BACKEND``; both are
+LangChain vector stores, so ``ChainRegistry`` uses them the same way. It
+refuses a store whose recorded embedding model (see ``build_db.py``) is not
+the one the API embeds queries with.
+"""
+
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from embedding import model_name
+
+NUMPY_INDEX_DIRNAME = "numpy_index"
+# Chroma collection metadata key holding the model that embedded the chunks
+EMBEDDING_MODEL_KEY = "embedding_model"
+
+# Above this many rows, the index gets a projection to search first
+EXACT_SEARCH_LIMIT = 4096
+PROJECTION_DIM = 128
+CANDIDATES = 256
+# Rows sampled to compute the projection
+PROJECTION_SAMPLE = 20000
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def principal_components(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """``(vectors.shape[1], dim)`` projection onto the top principal directions."""
+    rng = np.random.default_rng(0)
+    if len(vectors) > PROJECTION_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), PROJECTION_SAMPLE, replace=False)]
+    # Uncentered, so dot products (not distances from the mean) are preserved
+    _, eigenvectors = np.linalg.eigh(vectors.T.astype(np.float64) @ vectors)
+    return np.ascontiguousarray(eigenvectors[:, ::-1][:, :dim], dtype=np.float32)
+
+
+def write_index(
+    directory: str | Path,
+    vectors: np.ndarray,
+    texts: list[str],
+    metadatas: list[dict],
+    quantize: bool = False,
+    projection_dim: int = PROJECTION_DIM,
+    embedding_model: str | None = None,
+) -> None:
+    """Write a :class:`NumpyVectorStore` index, replacing any existing one.
+
+    ``projection_dim=0`` (or a corpus under ``EXACT_SEARCH_LIMIT`` rows)
+    writes no projection, so every search is exact.
+    """
+    directory = Path(directory)
+    vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+    order = sorted(range(len(texts)), key=lambda i: metadatas[i].get("source") or "")
+    vectors = vectors[order]
+
+    partitions: dict[str, list[int]] = {}
+    for row, i in enumerate(order):
+        source = metadatas[i].get("source") or ""
+        partitions.setdefault(source, [row, row])[1] = row + 1
+
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    if quantize:
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        np.save(tmp / "vectors.npy", np.round(vectors / scales[:, None]).astype(np.int8))
+        np.save(tmp / "scales.npy", scales.astype(np.float32))
+    else:
+        np.save(tmp / "vectors.npy", vectors)
+    dim = vectors.shape[1] if len(texts) else 0
+    if not 0 < projection_dim < dim or len(texts) <= EXACT_SEARCH_LIMIT:
+        projection_dim = 0
+    if projection_dim:
+        projection = principal_components(vectors, projection_dim)
+        np.save(tmp / "projection.npy", projection)
+        np.save(tmp / "projected.npy", vectors @ projection)
+
+    offsets = [0]
+    with open(tmp / "rows.bin", "wb") as f:
+        for i in order:
+            row = json.dumps({"text": texts[i], "metadata": metadatas[i]}).encode()
+            f.write(row)
+            offsets.append(offsets[-1] + len(row))
+    np.save(tmp / "offsets.npy", np.array(offsets, dtype=np.int64))
+    with open(tmp / "index.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "count": len(texts),
+            "dim": int(dim),
+            "dtype": "int8" if quantize else "float32",
+            "projection_dim": projection_dim,
+            "partitions": partitions,
+            "embedding_model": embedding_model,
+        }, f)
+
+    # Swap the finished index in; readers open it once at startup
+    old = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old)
+    tmp.rename(directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def export_chroma(
+    db,
+    directory: str | Path,
+    quantize: bool = False,
+    projection_dim: int = PROJECTION_DIM,
+    batch_size: int = 5000,
+) -> int:
+    """Write every chunk of a Chroma store to a NumPy index; return the count."""
+    collection = db._collection
+    vectors, texts, metadatas = [], [], []
+    for offset in range(0, collection.count(), batch_size):
+        batch = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset,
+        )
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        texts.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    write_index(
+        directory, matrix, texts, metadatas, quantize, projection_dim, stored_model(db)
+    )
+    return len(texts)
+
+
+def stored_model(db) -> str | None:
+    """The embedding model ``build_db.py`` recorded on a Chroma store, if any."""
+    return (db._collection.metadata or {}).get(EMBEDDING_MODEL_KEY)
+
+
+def check_model(stored: str | None, embeddings: Embeddings, where) -> None:
+    """Raise if ``stored`` (None for older stores) is not the model of ``embeddings``."""
+    current = model_name(embeddings)
+    if stored is not None and stored != current:
+        raise RuntimeError(
+            f"{where} was built with {stored} embeddings but queries use {current}; "
+            "set EMBEDDING_PROVIDER to match or rebuild it with build_db.py --rebuild"
+        )
+
+
+class NumpyVectorStore(VectorStore):
+    """Read-only cosine search over a memory-mapped index.
+
+    ``filter`` may only select a ``source`` (as the source modes do).
+    """
+
+    def __init__(self, directory: str | Path, embedding: Embeddings):
+        self.directory = Path(directory)
+        self.embedding = embedding
+        with open(self.directory / "index.json", encoding="utf-8") as f:
+            info = json.load(f)
+        self.count = info["count"]
+        self.dim = info["dim"]
+        self.dtype = info["dtype"]
+        self.embedding_model = info.get("embedding_model")
+        self.partitions = {k: tuple(v) for k, v in info["partitions"].items()}
+        self.vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        self.scales = (
+            np.load(self.directory / "scales.npy", mmap_mode="r")
+            if self.dtype == "int8"
+            else None
+        )
+        self.projection = self.projected = None
+        if info.get("projection_dim"):
+            self.projection = np.load(self.directory / "projection.npy")
+            self.projected = np.load(self.directory / "projected.npy", mmap_mode="r")
+        self.offsets = np.load(self.directory / "offsets.npy", mmap_mode="r")
+        with open(self.directory / "rows.bin", "rb") as f:
+            self._rows = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return self.count
+
+    def nbytes(self) -> int:
+        """Size of the vectors, scales and projection."""
+        return sum(
+            array.nbytes
+            for array in (self.vectors, self.scales, self.projected)
+            if array is not None
+        )
+
+    def _range(self, filter: dict | None) -> tuple[int, int]:
+        if not filter:
+            return 0, self.count
+        if set(filter) != {"source"}:
+            raise ValueError(f"NumpyVectorStore can only filter on source, got {filter}")
+        return self.partitions.get(filter["source"], (0, 0))
+
+    def _scores(self, query: np.ndarray, rows) -> np.ndarray:
+        """Exact cosine similarity of ``query`` with ``rows`` (a slice or indexes)."""
+        if self.scales is None:
+            return self.vectors[rows] @ query
+        return (self.vectors[rows].astype(np.float32) @ query) * self.scales[rows]
+
+    def _candidates(self, query: np.ndarray, start: int, end: int, count: int) -> np.ndarray:
+        coarse = self.projected[start:end] @ (query @ self.projection)
+        rows = np.argpartition(coarse, -count)[-count:] + start
+        # Ascending rows read the memory-mapped vectors front to back
+        rows.sort()
+        return rows
+
+    def search(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None
+    ) -> list[tuple[int, float]]:
+        """Return up to ``k`` ``(row, cosine similarity)`` pairs, best first."""
+        start, end = self._range(filter)
+        if end <= start or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape != (self.dim,):
+            raise ValueError(
+                f"Query embedding has {query.size} dimensions, the index {self.dim}; "
+                "rebuild it with the embeddings provider the API uses"
+            )
+        query = query / (np.linalg.norm(query) or 1.0)
+        count = max(CANDIDATES, 4 * k)
+        if self.projected is not None and end - start > count:
+            rows = self._candidates(query, start, end, count)
+        else:
+            rows = np.arange(start, end)
+        scores = self._scores(query, rows if len(rows) < end - start else slice(start, end))
+        if k < len(scores):
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def document(self, row: int) -> Document:
+        data = json.loads(self._rows[self.offsets[row]:self.offsets[row + 1]])
+        return Document(page_content=data["text"], metadata=data["metadata"])
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        return [(self.document(row), score) for row, score in self.search(embedding, k, filter)]
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: dict | None = None, **kwargs: Any
+    ) -> list[Document]:
+        return [self.document(row) for row, _ in self.search(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: dict | None = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k, filter
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: dict | None = None, **kwargs: Any
+    ) -> list[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k, filter)
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: dict | None = None, **kwargs: Any
+    ) -> list[Document]:
+        # Only the embedding call waits; the search itself is sub-millisecond
+        vector = await self.embedding.aembed_query(query)
+        return self.similarity_search_by_vector(vector, k, filter)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    def add_texts(
+        self, texts: Iterable[str], metadatas: list[dict] | None = None, **kwargs: Any
+    ) -> list[str]:
+        raise NotImplementedError(
+            "NumpyVectorStore is read-only; rebuild it with build_db.py --numpy-index"
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        *,
+        directory: str | Path,
+        quantize: bool = False,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """Embed ``texts``, write an index to ``directory`` and open it."""
+        vectors = np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32)
+        write_index(
+            directory, vectors, list(texts), metadatas or [{} for _ in texts], quantize
+        )
+        return cls(directory, embedding)
+
+
+def make_vectorstore(embeddings: Embeddings, persist_dir: str | Path) -> VectorStore:
+    """Open the vector store selected by ``VECTOR_BACKEND``.
+
+    ``chroma`` (default) opens the Chroma store in ``persist_dir``; ``numpy``
+    opens the index that ``build_db.py --numpy-index`` exports next to it
+    (``NUMPY_INDEX_DIR`` overrides its location).
+    """
+    backend = os.getenv("VECTOR_BACKEND", "chroma")
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+
+        db = Chroma(persist_directory=str(persist_dir), embedding_function=embeddings)
+        check_model(stored_model(db), embeddings, persist_dir)
+        return db
+    if backend == "numpy":
+        directory = Path(os.getenv("NUMPY_INDEX_DIR") or Path(persist_dir) / NUMPY_INDEX_DIRNAME)
+        if not (directory / "index.json").exists():
+            raise RuntimeError(
+                f"No NumPy index in {directory}; run python build_db.py --numpy-index"
+            )
+        store = NumpyVectorStore(directory, embeddings)
+        check_model(store.embedding_model, embeddings, directory)
+        return store
+    raise RuntimeError(f"Unknown VECTOR_BACKEND: {backend}")
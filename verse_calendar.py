@@ -0,0 +1,277 @@
+"""Precomputed verse-of-the-day calendar.
+
+Each UTC day maps to one of :data:`MEANINGFUL_VERSES`. Its explanation needs a
+Catechism retrieval and an LLM call, so entries are generated ahead of time
+and stored in a SQLite table that every worker reads; serving the verse of
+the day is then a single-row lookup with no upstream calls. The API refreshes
+the upcoming days in the background, and the calendar can be filled ahead
+from the command line:
+
+    python verse_calendar.py --days 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pipeline
+import verse_store
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+CALENDAR_FILE = Path("verse_calendar.db")
+
+# Load meaningful verses for daily selection
+MEANINGFUL_VERSES = [
+    {"book": "Matthew", "chapter": "5", "verse": "8", "theme": "purity"},
+    {"book": "John", "chapter": "3", "verse": "16", "theme": "love"},
+    {"book": "Psalms", "chapter": "23", "verse": "1", "theme": "trust"},
+    {"book": "Romans", "chapter": "8", "verse": "28", "theme": "providence"},
+    {"book": "1 Corinthians", "chapter": "13", "verse": "13", "theme": "love"},
+    {"book": "Philippians", "chapter": "4", "verse": "13", "theme": "strength"},
+    {"book": "Isaiah", "chapter": "40", "verse": "31", "theme": "hope"},
+    {"book": "Proverbs", "chapter": "3", "verse": "5", "theme": "trust"},
+    {"book": "Matthew", "chapter": "6", "verse": "33", "theme": "priorities"},
+    {"book": "James", "chapter": "1", "verse": "5", "theme": "wisdom"},
+    {"book": "Ephesians", "chapter": "2", "verse": "8", "theme": "grace"},
+    {"book": "Hebrews", "chapter": "11", "verse": "1", "theme": "faith"},
+    {"book": "Jeremiah", "chapter": "29", "verse": "11", "theme": "hope"},
+    {"book": "Matthew", "chapter": "11", "verse": "28", "theme": "rest"},
+    {"book": "John", "chapter": "14", "verse": "6", "theme": "truth"},
+]
+
+FALLBACK_EXPLANATION = "This verse reminds us of God's infinite love and mercy. The Catechism teaches us that Scripture is the living Word of God, speaking to us today. Let us meditate on this verse and apply its wisdom to our daily lives."
+
+
+def verse_for_day(day: date) -> dict:
+    """Select verse based on day of year for consistency"""
+    return MEANINGFUL_VERSES[day.timetuple().tm_yday % len(MEANINGFUL_VERSES)]
+
+
+def today() -> date:
+    return datetime.utcnow().date()
+
+
+class VerseCalendar:
+    """Verse-of-the-day entries keyed by ISO date in a WAL-mode SQLite file."""
+
+    def __init__(self, path: str | Path = CALENDAR_FILE):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verse_of_the_day ("
+                " day TEXT PRIMARY KEY, entry TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, day: date) -> dict | None:
+        row = self._conn().execute(
+            "SELECT entry FROM verse_of_the_day WHERE day = ?", (day.isoformat(),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, day: date, entry: dict) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO verse_of_the_day (day, entry, created_at)"
+                " VALUES (?, ?, ?)",
+                (day.isoformat(), json.dumps(entry), time.time()),
+            )
+
+    def missing(self, start: date, days: int) -> list[date]:
+        """Days in ``[start, start + days)`` that have no entry yet."""
+        wanted = [start + timedelta(days=i) for i in range(days)]
+        have = {
+            row[0]
+            for row in self._conn().execute(
+                "SELECT day FROM verse_of_the_day WHERE day >= ? AND day <= ?",
+                (wanted[0].isoformat(), wanted[-1].isoformat()),
+            )
+        } if wanted else set()
+        return [day for day in wanted if day.isoformat() not in have]
+
+    def prune(self, before: date) -> int:
+        """Delete the entries for days before ``before``; return how many."""
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM verse_of_the_day WHERE day < ?", (before.isoformat(),)
+            )
+        return cur.rowcount
+
+    @contextmanager
+    def refresh_lock(self):
+        """Yield True in the one process allowed to refresh, False elsewhere."""
+        if fcntl is None:
+            yield True
+            return
+        with open(f"{self.path}.lock", "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+async def _direct(coro):
+    return await coro
+
+
+async def generate_entry(day: date, retriever, llm, limit=_direct) -> tuple[dict, bool]:
+    """Build the entry for ``day``.
+
+    Returns the entry and whether it is complete; when the LLM call fails the
+    entry carries a generic explanation and should not be stored. ``limit``
+    wraps each upstream call (the API passes its concurrency limiter).
+    """
+    selected_verse = verse_for_day(day)
+
+    # Load Bible data to get the verse text
+    bible = await asyncio.to_thread(verse_store.get_store)
+    verse_text = bible.get(
+        selected_verse["book"], selected_verse["chapter"], selected_verse["verse"]
+    ) or "Verse not found"
+    verse_reference = f"{selected_verse['book']} {selected_verse['chapter']}:{selected_verse['verse']}"
+
+    # Generate explanation using the LLM with Catechism context
+    prompt = f"""Given this Bible verse: "{verse_text}" ({verse_reference})
+
+Please provide a brief Catholic explanation (2-3 sentences) that:
+1. Explains the spiritual meaning of this verse
+2. Connects it to Catholic teaching from the Catechism
+3. Offers a practical application for daily life
+
+Keep the explanation concise and accessible."""
+
+    # Get relevant CCC passages based on the verse theme
+    search_query = f"{selected_verse['theme']} {verse_text[:50]}"
+    relevant_docs = await limit(retriever.ainvoke(search_query))
+
+    # Extract CCC references
+    catechism_refs = []
+    for doc in relevant_docs:
+        ref = doc.metadata.get("reference", "")
+        if ref and ref not in catechism_refs:
+            catechism_refs.append(ref)
+
+    complete = True
+    try:
+        response = await limit(llm.ainvoke(prompt))
+        explanation = str(getattr(response, "content", response)).strip()
+    except Exception as e:
+        print(f"Verse of the day explanation failed for {day}: {e}")
+        explanation = FALLBACK_EXPLANATION
+        complete = False
+
+    entry = {
+        "verse_text": verse_text,
+        "verse_reference": verse_reference,
+        "explanation": explanation,
+        "catechism_references": catechism_refs[:2],  # Limit to 2 references
+    }
+    return entry, complete
+
+
+async def fill(
+    calendar: VerseCalendar,
+    retriever,
+    llm,
+    days: int,
+    start: date | None = None,
+    force: bool = False,
+    limit=_direct,
+) -> list[date]:
+    """Generate the missing (or, with ``force``, all) entries; return the days stored."""
+    start = start or today()
+    todo = (
+        [start + timedelta(days=i) for i in range(days)]
+        if force
+        else await asyncio.to_thread(calendar.missing, start, days)
+    )
+    stored = []
+    for day in todo:
+        entry, complete = await generate_entry(day, retriever, llm, limit)
+        if complete:
+            await asyncio.to_thread(calendar.put, day, entry)
+            stored.append(day)
+    return stored
+
+
+async def refresh_forever(
+    calendar: VerseCalendar,
+    retriever,
+    llm,
+    days: int,
+    interval: float,
+    limit=_direct,
+    keep_days: int = 30,
+) -> None:
+    """Keep today and the next ``days - 1`` days generated.
+
+    Runs every ``interval`` seconds; with several workers only the one
+    holding the calendar's lock file does the work. Entries more than
+    ``keep_days`` days old are deleted.
+    """
+    while True:
+        try:
+            with calendar.refresh_lock() as owner:
+                if owner:
+                    stored = await fill(calendar, retriever, llm, days, limit=limit)
+                    if stored:
+                        print(f"Verse calendar: generated {len(stored)} day(s)")
+                    await asyncio.to_thread(
+                        calendar.prune, today() - timedelta(days=keep_days)
+                    )
+        except Exception as e:
+            print(f"Verse calendar refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate the verse of the day.")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--start", type=date.fromisoformat, help="YYYY-MM-DD (default: today, UTC)")
+    parser.add_argument("--path", default=os.getenv("VERSE_CALENDAR_PATH", str(CALENDAR_FILE)))
+    parser.add_argument("--force", action="store_true", help="regenerate existing days")
+    args = parser.parse_args()
+
+    # The same retriever and model as the API's background refresh
+    retriever = pipeline.get_chains().retriever("catechism", k=3)
+    llm = pipeline.get_llm()
+
+    calendar = VerseCalendar(args.path)
+    start = time.perf_counter()
+    stored = asyncio.run(
+        fill(calendar, retriever, llm, args.days, start=args.start, force=args.force)
+    )
+    print(
+        f"✅ {len(stored)} day(s) generated into {args.path} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Douay-Rheims Bible text, loaded once and indexed by reference.
+
+``EntireBible-DR.json`` maps ``book -> chapter -> verse -> text``. The store
+flattens it into a dict keyed by ``(book, chapter, verse)`` for O(1) lookups
+and keeps the verse numbers of each chapter in order for range lookups.
+Use :func:`get_store` to share a single instance per process.
+"""
+
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+BIBLE_FILE = Path("EntireBible-DR.json")
+
+_REF_RE = re.compile(
+    r"^\s*(?P<book>(?:[1-4]\s*)?[A-Za-z][A-Za-z .']*?)\.?\s+(?P<chapter>\d+)"
+    r"(?::(?P<start>\d+)(?:\s*[-–]\s*(?P<end>\d+))?)?\s*$"
+)
+
+
+def _book_key(book: str) -> str:
+    return re.sub(r"[\s.']", "", book).lower()
+
+
+def parse_reference(ref: str) -> tuple[str, int, int | None, int | None] | None:
+    """Parse ``"John 3:16"``, ``"John 3:16-18"`` or ``"John 3"``.
+
+    Returns ``(book, chapter, start, end)`` with ``start``/``end`` set to
+    ``None`` for a whole chapter, or ``None`` if ``ref`` is not a reference.
+    """
+    m = _REF_RE.match(ref)
+    if not m:
+        return None
+    start = int(m["start"]) if m["start"] else None
+    end = int(m["end"]) if m["end"] else start
+    return m["book"].strip(), int(m["chapter"]), start, end
+
+
+class VerseStore:
+    """O(1) verse and range lookups over the Douay-Rheims text."""
+
+    def __init__(self, bible_data: dict):
+        self._verses: dict[tuple[str, int, int], str] = {}
+        self._chapters: dict[tuple[str, int], list[int]] = {}
+        self._books: dict[str, str] = {}
+        for book, chapters in bible_data.items():
+            self._books[_book_key(book)] = book
+            for chap, verses in chapters.items():
+                numbers = []
+                for verse, text in verses.items():
+                    self._verses[(book, int(chap), int(verse))] = text.strip()
+                    numbers.append(int(verse))
+                self._chapters[(book, int(chap))] = sorted(numbers)
+
+    @classmethod
+    def from_file(cls, path: str | Path = BIBLE_FILE) -> "VerseStore":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self._verses)
+
+    def __iter__(self):
+        """Yield ``(book, chapter, verse, text)`` in canonical order."""
+        for (book, chap, verse), text in self._verses.items():
+            yield book, chap, verse, text
+
+    def book(self, name: str) -> str | None:
+        """Return the canonical spelling of a book name, ignoring case/spaces."""
+        return self._books.get(_book_key(name))
+
+    def get(self, book: str, chapter: int | str, verse: int | str) -> str | None:
+        book = self.book(book)
+        if book is None:
+            return None
+        return self._verses.get((book, int(chapter), int(verse)))
+
+    def range(
+        self,
+        book: str,
+        chapter: int | str,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> list[tuple[str, str]]:
+        """Return ``(reference, text)`` pairs for verses ``start..end``.
+
+        Without ``start``/``end`` the whole chapter is returned.
+        """
+        book = self.book(book)
+        if book is None:
+            return []
+        chapter = int(chapter)
+        numbers = self._chapters.get((book, chapter), [])
+        lo = start if start is not None else 0
+        hi = end if end is not None else (numbers[-1] if numbers else 0)
+        return [
+            (f"{book} {chapter}:{n}", self._verses[(book, chapter, n)])
+            for n in numbers
+            if lo <= n <= hi
+        ]
+
+    def lookup(self, ref: str) -> list[tuple[str, str]]:
+        """Resolve a textual reference such as ``"John 3:16-18"``."""
+        parsed = parse_reference(ref)
+        if parsed is None:
+            return []
+        return self.range(*parsed)
+
+
+@lru_cache(maxsize=1)
+def get_store() -> VerseStore:
+    """Load ``EntireBible-DR.json`` on first use and share it afterwards."""
+    return VerseStore.from_file(BIBLE_FILE)